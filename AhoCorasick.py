@@ -0,0 +1,94 @@
+"""
+提供了類別 AhoCorasick，一次搜尋多個 byte pattern
+"""
+import re
+
+
+class AhoCorasick:
+    """
+    以 Aho-Corasick 自動機同時搜尋多個 pattern，每個 byte 只需要查一次表，和 pattern 的數量無關。
+    scan() 會回傳掃描結束時的狀態，下一段資料從這個狀態繼續掃描，因此跨過兩段資料的結果也找得到。
+
+    用法：
+    ```
+    ac = AhoCorasick([b"PK\\x03\\x04", b"\\x7fELF"])
+    state = 0
+    for chunk in chunks:
+        state, hits = ac.scan(chunk, state)   # hits: [(結尾在 chunk 中的位置（不包含）, pattern 的 index), ...]
+    ```
+    """
+    # private members ####################
+    m_patterns: list[bytes]
+    m_delta: list[int]             # DFA 的轉移表：m_delta[state * 256 + byte] 為下一個狀態
+    m_out: list[tuple[int, ...]]   # 到達某個狀態時，結尾在這裡的 pattern
+    m_first: re.Pattern            # 所有 pattern 的第一個 byte。在初始狀態時用來快速跳過不可能的位置
+
+    def __init__(self, patterns: list[bytes]):
+        if len(patterns) == 0 or any(len(p) == 0 for p in patterns):
+            raise ValueError("AhoCorasick - patterns must be non-empty")
+        self.m_patterns = list(patterns)
+
+        # 建 trie
+        goto: list[dict[int, int]] = [dict()]
+        out: list[list[int]] = [list()]
+        for pid, pattern in enumerate(self.m_patterns):
+            state = 0
+            for b in pattern:
+                if b not in goto[state]:
+                    goto.append(dict())
+                    out.append(list())
+                    goto[state][b] = len(goto) - 1
+                state = goto[state][b]
+            out[state].append(pid)
+
+        # 以 BFS 建 failure link，並展開成完整的轉移表
+        fail = [0] * len(goto)
+        self.m_delta = [0] * (len(goto) * 256)
+        for b, nxt in goto[0].items():
+            self.m_delta[b] = nxt
+        queue = list(goto[0].values())
+        for state in queue:
+            out[state].extend(out[fail[state]])
+            for b in range(256):
+                nxt = goto[state].get(b)
+                if nxt is None:
+                    self.m_delta[state * 256 + b] = self.m_delta[fail[state] * 256 + b]
+                else:
+                    fail[nxt] = self.m_delta[fail[state] * 256 + b]
+                    self.m_delta[state * 256 + b] = nxt
+                    queue.append(nxt)
+        self.m_out = [tuple(o) for o in out]
+
+        first = sorted({p[0] for p in self.m_patterns})
+        self.m_first = re.compile(b'[' + b''.join(re.escape(bytes([b])) for b in first) + b']')
+
+    def getPatterns(self) -> list[bytes]:
+        return self.m_patterns
+
+    def scan(self, buf: bytes, state: int = 0) -> tuple[int, list[tuple[int, int]]]:
+        """
+        從 state 開始掃描 buf。
+
+        Return:
+            (掃描結束時的狀態, [(結尾位置（不包含）, pattern 的 index), ...])，依結尾位置排序
+        """
+        delta = self.m_delta
+        out = self.m_out
+        first = self.m_first
+        hits = list()
+
+        i = 0
+        n = len(buf)
+        while i < n:
+            if state == 0:
+                # 初始狀態下，只有 pattern 的第一個 byte 會讓狀態改變
+                m = first.search(buf, i)
+                if m is None:
+                    break
+                i = m.start()
+            state = delta[(state << 8) | buf[i]]
+            i += 1
+            if out[state]:
+                for pid in out[state]:
+                    hits.append((i, pid))
+        return state, hits
@@ -0,0 +1,312 @@
+"""
+效能測試：產生不同大小的測試檔案，量測開檔、換頁、調整大小、換進制、搜尋、插入刪除和存檔所花的時間，結果輸出成 JSON。
+GUI 的部分需要 X server；沒有 DISPLAY 時會嘗試啟動 Xvfb（虛擬的 X server），找不到就跳過。
+
+用法：
+```sh
+python Benchmark.py --sizes 1M,64M,1G -o bench.json
+python Benchmark.py --sizes 1M --compare bench.json      # 和之前的結果比較
+```
+"""
+import argparse
+import json
+import os
+import platform
+import select
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import Search
+from BinaryBuffer import BinaryBuffer
+
+NEEDLE = b"BinaryEditorBenchmarkNeedle"   # 每隔一段距離放一個，讓搜尋有結果
+NEEDLE_INTERVAL = 1 << 20
+_UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parseSize(text: str) -> int:
+    """ 例如 "64M" -> 67108864 """
+    text = text.strip().upper()
+    if text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def generateFile(path: str, size: int, seed: int = 0):
+    """ 產生 size 個 byte 的測試檔案。內容是重複的亂數區塊，每隔 NEEDLE_INTERVAL 放一個 NEEDLE """
+    import random
+    rng = random.Random(seed)
+    block = bytearray(rng.getrandbits(8) for _ in range(NEEDLE_INTERVAL))
+    block[: len(NEEDLE)] = NEEDLE
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            f.write(block[: min(remaining, len(block))])
+            remaining -= len(block)
+
+
+def measure(func, repeat: int) -> list[float]:
+    """ 執行 func repeat 次，回傳每次的秒數 """
+    seconds = list()
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - t)
+    return seconds
+
+
+class Recorder:
+    """ 收集每個測試的結果 """
+    def __init__(self):
+        self.results = list()
+
+    def add(self, name: str, size: int, seconds: list[float]):
+        self.results.append({"name": name, "size": size, "seconds": seconds,
+                             "median": statistics.median(seconds), "min": min(seconds)})
+        print(f"{name:<24} {size:>14,} bytes  median {statistics.median(seconds) * 1000:10.3f} ms")
+
+
+# 不需要 GUI 的部分 #################################################################################
+def flipByte(buffer: BinaryBuffer):
+    """ 將中間的 byte 換成不同的值（每次呼叫都一定會修改資料） """
+    mid = len(buffer) // 2
+    buffer.write(mid, bytes([buffer.read(mid, mid + 1)[0] ^ 0xFF]))
+
+
+def benchCore(rec: Recorder, path: str, size: int, repeat: int, tmp_dir: str):
+    """ 直接測試 BinaryBuffer """
+    rec.add("core.open", size, measure(lambda: BinaryBuffer.open(path).close(), repeat))
+
+    buffer = BinaryBuffer.open(path)
+    try:
+        pattern, length = Search.compilePattern(NEEDLE.decode(), Search.TEXT)
+        rec.add("core.search", size, measure(lambda: buffer.findAll(pattern, length), repeat))
+        rec.add("core.search.parallel", size, measure(lambda: buffer.findAll(pattern, length, parallel=True), repeat))
+
+        def edit():
+            for i in range(1000):
+                buffer.insert((i * 7919) % len(buffer), b"\x00")
+            for i in range(1000):
+                buffer.delete((i * 7919) % len(buffer), (i * 7919) % len(buffer) + 1)
+        rec.add("core.insert_delete x1000", size, measure(edit, repeat))
+
+        out = os.path.join(tmp_dir, "saved.bin")
+        rec.add("core.save", size, measure(lambda: buffer.save(out), repeat))
+
+        # 覆蓋開啟的檔案，長度不變時只寫回修改的 byte（每次都寫入和原本不同的值，否則 write() 不會修改）
+        def save_in_place():
+            saved = BinaryBuffer.open(out)
+            try:
+                flipByte(saved)
+                saved.save(out)
+            finally:
+                saved.close()
+        rec.add("core.save_in_place 1B", size, measure(save_in_place, repeat))
+        os.remove(out)
+
+        # 整個檔案的雜湊值，以及每次改一個 byte 後重新計算（只從修改的 chunk 接著算）
+        hashed = BinaryBuffer.open(path)
+        try:
+            def wait_hashes():
+                while not hashed.hashIndex().isDone():
+                    time.sleep(0.001)
+            rec.add("core.hash", size, measure(lambda: (hashed.hashIndex().reset(hashed.snapshot()), wait_hashes()), repeat))
+            rec.add("core.rehash 1B", size, measure(lambda: (flipByte(hashed), wait_hashes()), repeat))
+        finally:
+            hashed.close()
+    finally:
+        buffer.close()
+
+
+# GUI ###############################################################################################
+XVFB_TIMEOUT = 10   # 等 Xvfb 啟動最多幾秒
+
+
+def startVirtualDisplay():
+    """
+    沒有 DISPLAY 時啟動 Xvfb，確認可以連上後才設定 DISPLAY。回傳 Xvfb 的 process（不需要或無法啟動時為 None）。
+    以 -displayfd 讓 Xvfb 自己挑一個沒被使用的 display，準備好時把編號寫回來
+    """
+    if os.environ.get("DISPLAY") or sys.platform != "linux":
+        return None
+    if shutil.which("Xvfb") is None:
+        return None
+    read_fd, write_fd = os.pipe()
+    try:
+        proc = subprocess.Popen(["Xvfb", "-displayfd", str(write_fd), "-screen", "0", "1920x1080x24"],
+                                pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        os.close(read_fd)
+        os.close(write_fd)
+        return None
+    os.close(write_fd)
+
+    number = b""
+    deadline = time.monotonic() + XVFB_TIMEOUT
+    with os.fdopen(read_fd, "rb") as pipe:
+        while not number.endswith(b"\n") and time.monotonic() < deadline:
+            ready, _, _ = select.select([pipe], [], [], 0.1)
+            if ready:
+                data = os.read(pipe.fileno(), 16)
+                if not data: # Xvfb 結束了
+                    break
+                number += data
+    display = ":" + number.decode(errors="replace").strip()
+    if proc.poll() is not None or not number.strip().isdigit() or not canConnect(display):
+        stopProcess(proc)
+        return None
+    os.environ["DISPLAY"] = display
+    return proc
+
+
+def canConnect(display: str) -> bool:
+    """ 確認 tkinter 可以連上 display """
+    try:
+        import tkinter as tk
+    except ImportError:
+        return False
+    try:
+        tk.Tk(screenName=display).destroy()
+    except tk.TclError as e:
+        print(f"Cannot connect to Xvfb on {display}: {e}")
+        return False
+    return True
+
+
+def stopProcess(proc: subprocess.Popen):
+    if proc.poll() is None:
+        proc.terminate()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def benchGui(rec: Recorder, path: str, size: int, repeat: int, tmp_dir: str):
+    """ 透過 BinTable 測試，每個操作都包含畫面更新（root.update()） """
+    import tkinter as tk
+    import BinTable
+
+    root = tk.Tk()
+    root.geometry("1280x900")
+    table = BinTable.BinTable(root, size=30)
+    table.pack(expand=True, fill=tk.BOTH)
+    root.update()
+
+    def run(func):
+        def wrapper():
+            func()
+            root.update()
+        return wrapper
+
+    buffers = list()
+    def open_file():
+        buffers.append(BinaryBuffer.open(path))
+        table.setData(buffers[-1])
+    rec.add("gui.open", size, measure(run(open_file), repeat))
+
+    def flip():
+        for _ in range(20):
+            table.nextPage()
+        for _ in range(20):
+            table.prevPage()
+    rec.add("gui.page_flip x40", size, measure(run(flip), repeat))
+
+    def jump():
+        for i in range(40):
+            table.gotoPage((i * 7919) % (table.getMaxPage() + 1))
+    rec.add("gui.goto_page x40", size, measure(run(jump), repeat))
+    rec.add("gui.resize", size, measure(run(lambda: (table.resize(100), table.resize(30))), repeat))
+    rec.add("gui.setBase", size, measure(run(lambda: (table.setBase(2), table.setBase(16))), repeat))
+
+    pattern, length = Search.compilePattern(NEEDLE.decode(), Search.TEXT)
+    def search():
+        result = Search.startSearch(table.getSnapshot(), pattern, length)
+        table.setSearchResult(result)
+        result.wait()
+        table.refreshSearch()
+    rec.add("gui.search", size, measure(run(search), repeat))
+    table.clearHighlights()
+
+    def edit():
+        for i in range(20):
+            table.select(i, i)
+            table.insertOneByte(insert_before=True)
+        for i in range(20):
+            table.select(i, i)
+            table.deleteSelectedBytes()
+    rec.add("gui.insert_delete x20", size, measure(run(edit), repeat))
+
+    out = os.path.join(tmp_dir, "saved.bin")
+    rec.add("gui.save", size, measure(lambda: table.getBuffer().save(out), repeat))
+    os.remove(out)
+
+    root.destroy()
+    for buffer in buffers:
+        buffer.close()
+
+
+def compare(results: list[dict], old_path: str):
+    """ 和之前的 JSON 比較 median，印出倍數（> 1 表示變慢） """
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = {(r["name"], r["size"]): r["median"] for r in json.load(f)["results"]}
+    print("\nComparison with", old_path)
+    for r in results:
+        key = (r["name"], r["size"])
+        if key in old and old[key] > 0:
+            print(f"{r['name']:<24} {r['size']:>14,} bytes  x{r['median'] / old[key]:6.2f}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark BinaryEditor on synthetic files.")
+    parser.add_argument("--sizes", default="1M,16M,256M", help="comma separated file sizes, e.g. 1M,1G,4G")
+    parser.add_argument("--repeat", type=int, default=3, help="how many times each operation is measured")
+    parser.add_argument("--no-gui", action="store_true", help="skip the BinTable benchmarks")
+    parser.add_argument("--dir", help="where to put the generated files (default: a temp directory)")
+    parser.add_argument("-o", "--output", default="bench.json", help="JSON output path")
+    parser.add_argument("--compare", help="previous JSON result to compare with")
+    args = parser.parse_args(argv)
+
+    tmp_dir = tempfile.mkdtemp(prefix="binedit-bench-", dir=args.dir)
+    rec = Recorder()
+    xvfb = None if args.no_gui else startVirtualDisplay()
+    gui = not args.no_gui and bool(os.environ.get("DISPLAY") or sys.platform != "linux")
+    if not args.no_gui and not gui:
+        print("No display and no Xvfb: GUI benchmarks are skipped")
+
+    try:
+        for size in map(parseSize, args.sizes.split(",")):
+            path = os.path.join(tmp_dir, f"bench_{size}.bin")
+            generateFile(path, size)
+            benchCore(rec, path, size, args.repeat, tmp_dir)
+            if gui:
+                benchGui(rec, path, size, args.repeat, tmp_dir)
+            os.remove(path)
+    finally:
+        if xvfb is not None:
+            stopProcess(xvfb)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "gui": gui,
+        "results": rec.results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(rec.results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,97 +3,233 @@
 """
 import tkinter as tk
 from tkinter import messagebox
+from tkinter import font as tkfont
 import re
 import math
 from SelectRange import SelectRange
 from ByteNumStr import ByteNumStr
+from BinaryBuffer import BinaryBuffer
+from PieceTable import PieceTable
+from IntervalSet import IntervalSet
+from Search import SearchResult
+from UndoJournal import DEFAULT_MAX_BYTES
+from PageCache import PageCache, PageModel
+from Profiler import PROFILER, timed
 
 DEBUG_MODE = False
+PREFETCH_AHEAD = 3      # 在捲動的方向上預先準備幾頁
+PREFETCH_BEHIND = 1     # 反方向預先準備幾頁
+
+MIN_CELL_PADDING = 8    # 格子寬度至少要比文字寬多少 pixel
+MIN_CELL_HEIGHT_PADDING = 6
+
+# 搜尋結果的顏色，(淺色格子, 深色格子)。多個 pattern 一起搜尋時，第 i 個 pattern 使用 HIT_COLORS[i % len(HIT_COLORS)]
+HIT_COLORS = [("yellow", "#E7E767"), ("#9AF59A", "#80D980"), ("#F5B36B", "#D99A55"),
+              ("#8FE3F0", "#77C7D4"), ("#F59AD8", "#D981BD"), ("#C4A3F5", "#A88AD9")]
+
+
+def _range_diff(old: tuple[int, int] | None, new: tuple[int, int] | None) -> list[tuple[int, int]]:
+    """
+    old、new 是兩個選取範圍（包含兩端點，None 表示沒有選取），回傳只在其中一個範圍內的部分，每段為 [start, end)
+    """
+    if old is None and new is None:
+        return []
+    if old is None or new is None:
+        a, b = old if new is None else new
+        return [(a, b + 1)]
+    if old[1] < new[0] or new[1] < old[0]: # 沒有重疊
+        return [(old[0], old[1] + 1), (new[0], new[1] + 1)]
+    # 有重疊時，只有兩側不同
+    return [(min(old[0], new[0]), max(old[0], new[0])),
+            (min(old[1], new[1]) + 1, max(old[1], new[1]) + 1)]
 
 
 class BinTable(tk.Frame):
     """
-    顯示二進制資料的表格，大小為 size * size，每一個格子都是一個 tk.Entry。
+    顯示二進制資料的表格，大小為 size * size。
+    整個表格畫在同一個 tk.Canvas 上，只有看得到的格子會建立 canvas item；視窗太小時可以用滾輪捲動（Shift + 滾輪為水平）。
     當「表格大小變動」、「換頁」、「data長度變動」時，頁數可能會變，因此產生 <<PageChanged>> virtual event。
 
     用法：
     - 初始化時傳入 data、size （初始化後可用 setData()、resize() 來修改）
+    - data 可以是 bytes 或 BinaryBuffer（資料核心，負責讀寫和存檔），表格只在換頁時讀取需要顯示的資料
     - nextPage()、prevPage()換頁（頁面的範圍 0 ~ getMaxPage()）
+    - gotoPage()、gotoOffset() 直接跳到某一頁 / 某個位置
+    - 讀好、轉成字串的頁面放在 PageCache 中（可以由多個表格共用），並在背景依捲動方向預先準備相鄰的頁面
+    - 右邊的捲軸對應到整個檔案的位置；PageUp / PageDown / Home / End 換頁。
+      連續捲動時只記下要去的頁面，等到 idle 時才畫一次（中間經過的頁面不會被畫出來）
 
     Getter:
-    - getData() : 取得資料
+    - getData() : 取得資料（會將整個檔案讀入記憶體）
+    - getBuffer() : 取得 BinaryBuffer（會先寫回正在編輯的格子）
+    - getDataSize() : 資料長度
+    - iterChunks() : 依序取得一段段的資料
+    - getSnapshot() : 取得資料的唯讀複本（給背景執行緒使用）
     - getMaxPage() : 最大的頁數
     - getPageNum() : 取得頁數
+    - getPageLen() : 每頁有幾個 byte
+    - getSelection() : 選取的範圍
+    - getSelectedRanges() : 所有的選取範圍
 
     Highlight （單純的顏色標記，黃色）:
     - clearHighlights() : 清除所有的標記
     - highlight() : 將「資料」中某段範圍給標記
+    - setSearchResult() : 顯示搜尋結果（只在畫格子時查詢結果，不會一個個標記）
+    - refreshSearch() : 搜尋還在進行時，定期呼叫以顯示新找到的結果
+    - gotoHit() : 跳到下一個 / 上一個搜尋結果
+    - takeSearchResult() : 移除搜尋結果但不取消搜尋
+    搜尋結果要由 getBuffer().search() 取得，修改資料時 BinaryBuffer 會一起更新結果
 
     選擇byte （藍色）:
     - 滑鼠左鍵                 選擇一個byte
     - Shift + 滑鼠左鍵         選擇多個byte
+    - Ctrl + 滑鼠左鍵          保留原本的選取，加入一段新的範圍（再按 Ctrl + Shift + 滑鼠左鍵延伸它）
+    - select()              : 以程式選取 data 中 [start, end] 的範圍
+    - selectRanges()        : 一次選取多段範圍
+    - selectAllHits()       : 選取所有的搜尋結果
     - deleteSelectedBytes() : 將選中的bytes刪掉
+    - fillSelection()       : 以重複的 pattern 填滿選取範圍
+    - pasteBytes()          : 在選取範圍前插入，或取代選取範圍
+    選取多段範圍時，刪除、填滿、貼上會一次套用到每一段（復原時算是同一步）
+    - replaceHits()         : 將所有搜尋結果換成同一段資料
+
+    復原 / 重做:
+    - undo()、redo() : 格子的修改、插入和刪除都可以復原（記錄最多使用 undo_limit 個 byte）
+
+    編輯:
+    - 雙擊格子，或選取後直接輸入數字，會在格子上開啟編輯框
+    - Enter / Tab 確認（Tab 會接著編輯下一格），Escape 取消
     """
     # private members ####################
     m_BNS_convert: ByteNumStr          # 在數字和字串間轉換
-    m_data: bytearray                  # 檔案的資料
-    m_data_hilit: list[bool]           # 記錄檔案中哪些資料被標記（大小和 m_data 一樣大）
+    m_data: BinaryBuffer               # 檔案的資料
+    m_data_hilit: IntervalSet          # 記錄檔案中哪些資料被標記（以區間儲存）
     m_data_select: SelectRange         # 記錄哪些byte被選中
-    m_entries: list[tk.Entry] | None   # 大小為 m_size * m_size，只包含「顯示出來」的格子（以Row Major的方式儲存）
+    m_page_selected: tuple[tuple, bytearray] | None  # 這一頁每個格子有沒有被選取，以及算出它時的 (選取的變化次數, 頁面開頭, 頁面長度)
+    m_search: SearchResult | None      # 搜尋結果（和 m_data_hilit 一樣以黃色顯示）
     m_page: int        # 目前在的頁數（從0開始）
     m_max_page: int    # m_page 的最大值
     m_size: int        # 每頁表格的大小
+    m_undo_limit: int  # 復原記錄最多使用多少記憶體
+    m_page_cache: PageCache            # 讀好的頁面
+    m_scroll_dir: int                  # 上次換頁的方向（1 或 -1），決定預先讀取哪幾頁
+
+    # 畫面 ###############################
+    m_canvas: tk.Canvas
+    m_pos_bar: tk.Scrollbar            # 目前的頁面在整個檔案中的位置
+    m_pending_page: int | None         # 連續捲動時要去的頁面（還沒畫）
+    m_page_job: str | None             # 排定的換頁（after_idle 的 id）
+    m_font: tkfont.Font
+    m_cell_w: float    # 格子的寬
+    m_cell_h: float    # 格子的高
+    m_first_row: int   # 看得到的第一列（頁面太大時可以捲動）
+    m_first_col: int   # 看得到的第一行
+    m_vis_rows: int    # 看得到幾列
+    m_vis_cols: int    # 看得到幾行
+    m_rect_items: list[int]            # 看得到的格子的背景（以Row Major的方式儲存，大小為 m_vis_rows * m_vis_cols）
+    m_text_items: list[int]            # 看得到的格子的文字
+    m_painted: list[tuple | None]      # 每個 canvas 格子上次畫的 (文字, 顏色)，沒變就不重畫
+    m_page_data: bytes                 # 目前這一頁的資料
+    m_page_text: list[str]             # m_page_data 轉成字串的結果（換頁或換進制時一次轉完）
+    m_repaint: set[int]                # 等待重畫的格子（entry index），在 idle 時一次畫完
+    m_repaint_job: str | None          # 排定的重畫（after_idle 的 id）
+    m_editor: tk.Entry                 # 編輯用的輸入框（整個表格共用一個）
+    m_editor_window: int | None        # 輸入框在 canvas 上的 item
+    m_edit_idx: int | None             # 正在編輯的格子（entry index）
 
     def __sanity_check__(self):
         """ 檢查內部資料是否合法 """
-        # 每個 data 都要記錄是否被 hilit
-        assert len(self.m_data) == len(self.m_data_hilit)
+        # 被標記的資料都要在 m_data 的範圍內
+        assert self.m_data_hilit.upperBound() <= len(self.m_data)
         # 檢查 m_page 的範圍
         assert 0 <= self.m_page and self.m_page <= self.m_max_page
-        # 顯示的格子數 == m_size ** 2
-        assert len(self.m_entries) == (self.m_size ** 2)
+        # 每個看得到的格子都有對應的 canvas item
+        assert len(self.m_rect_items) == len(self.m_text_items) == self.m_vis_rows * self.m_vis_cols
         # 到最大頁數為止，可以涵蓋所有 data
-        assert len(self.m_entries) * (self.m_max_page + 1) >= len(self.m_data)
+        assert self.__page_len__() * (self.m_max_page + 1) >= len(self.m_data)
 
-    def __init__(self, parent: tk.Misc, data: bytearray = [], size: int = 10):
+    def __init__(self, parent: tk.Misc, data: bytearray = [], size: int = 10, undo_limit: int = DEFAULT_MAX_BYTES,
+                 page_cache: PageCache | None = None):
         """
-        初始化。父 widget 為 parent，一開始顯示的內容為 data，表格大小為 size * size。
+        初始化。父 widget 為 parent，一開始顯示的內容為 data，表格大小為 size * size，復原記錄最多使用 undo_limit 個 byte。
+        page_cache 為 None 時使用自己的頁面快取
         """
         tk.Frame.__init__(self, parent)
 
         self.m_BNS_convert = ByteNumStr(base=16)
         self.m_BNS_convert.initValidator(self)
-        self.m_data = bytearray(data)
-        self.m_data_hilit = [False for _ in range(len(self.m_data))]
+        self.m_undo_limit = undo_limit
+        self.m_page_cache = PageCache() if page_cache is None else page_cache
+        self.m_scroll_dir = 1
+        self.m_data = BinaryBuffer(bytes(data))
+        self.m_data.enableUndo(undo_limit)
+        self.m_data_hilit = IntervalSet()
         self.m_data_select = SelectRange()
-        self.m_entries = None
+        self.m_page_selected = None
+        self.m_search = None
         self.m_page = 0
         self.m_max_page = 0
         self.m_size = 0
+
+        self.m_font = tkfont.nametofont("TkFixedFont")
+        self.m_pos_bar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.__pos_bar_on_scroll__)
+        self.m_pos_bar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.m_pending_page = None
+        self.m_page_job = None
+        self.m_canvas = tk.Canvas(self, highlightthickness=0, takefocus=True)
+        self.m_canvas.pack(expand=True, fill=tk.BOTH)
+        self.m_cell_w = self.m_cell_h = 1
+        self.m_first_row = self.m_first_col = 0
+        self.m_vis_rows = self.m_vis_cols = 0
+        self.m_rect_items = list()
+        self.m_text_items = list()
+        self.m_painted = list()
+        self.m_page_data = b''
+        self.m_page_text = list()
+        self.m_repaint = set()
+        self.m_repaint_job = None
+
+        self.m_editor = tk.Entry(self.m_canvas, width=4, borderwidth=1, font=self.m_font,
+                                 validate='key', validatecommand=self.m_BNS_convert.getValidator())
+        self.m_editor_window = None
+        self.m_edit_idx = None
+        self.m_editor.bind("<Return>", lambda e: self.__close_editor__(commit=True))
+        self.m_editor.bind("<Tab>", lambda e: self.__edit_next__())
+        self.m_editor.bind("<Escape>", lambda e: self.__close_editor__(commit=False) or "break")
+        self.m_editor.bind("<FocusOut>", lambda e: self.after_idle(self.__editor_on_focus_out__))
+
+        # 格子的點擊、捲動事件
+        self.m_canvas.bind("<Configure>", lambda e: self.__layout__())
+        self.m_canvas.bind("<Button-1>", lambda e: self.__canvas_on_click__(e, False))
+        self.m_canvas.bind("<Shift-Button-1>", lambda e: self.__canvas_on_click__(e, True))
+        self.m_canvas.bind("<Control-Button-1>", lambda e: self.__canvas_on_click__(e, False, add=True))
+        self.m_canvas.bind("<Control-Shift-Button-1>", lambda e: self.__canvas_on_click__(e, True))
+        self.m_canvas.bind("<Double-Button-1>", self.__canvas_on_double_click__)
+        self.m_canvas.bind("<Key>", self.__canvas_on_key__)
+        self.m_canvas.bind("<MouseWheel>", lambda e: self.__scroll__(-1 if e.delta > 0 else 1, e.state & 0x1))
+        self.m_canvas.bind("<Button-4>", lambda e: self.__scroll__(-1, e.state & 0x1))
+        self.m_canvas.bind("<Button-5>", lambda e: self.__scroll__(1, e.state & 0x1))
+        # 換頁的按鍵（連續按住時會合併）
+        self.m_canvas.bind("<Prior>", lambda e: self.requestPage(self.__target_page__() - 1))
+        self.m_canvas.bind("<Next>", lambda e: self.requestPage(self.__target_page__() + 1))
+        self.m_canvas.bind("<Home>", lambda e: self.requestPage(0))
+        self.m_canvas.bind("<End>", lambda e: self.requestPage(self.m_max_page))
+
         self.resize(size)
 
+    @timed("table.write_back")
     def __write_back__(self):
         """
-        將表格的內容寫回m_data
+        將正在編輯的格子寫回m_data（其他格子在編輯結束時就已經寫回了）
         """
-        for entry_idx, entry in enumerate(self.m_entries):
-            # 對應原陣列中的哪個byte
-            data_idx = self.__entry2data__(entry_idx)
-
-            # 超出範圍
-            if data_idx >= len(self.m_data):
-                break
-
-            try:
-                self.m_data[data_idx] = self.m_BNS_convert.toInt(entry.get())
-            except ValueError:
-                self.m_data[data_idx] = 0
+        self.__close_editor__(commit=True)
 
         if DEBUG_MODE:
-            print(self.m_data)
-        
+            print(self.m_data[0:len(self.m_data)])
+
         self.__sanity_check__()
 
+    @timed("table.update_content")
     def __update_content__(self):
         """
         當「m_data」或「table大小」有變動時呼叫
@@ -103,73 +239,336 @@ class BinTable(tk.Frame):
         if len(self.m_data) == 0:
             self.m_max_page = 0
         else:
-            self.m_max_page = (len(self.m_data) - 1) // (self.m_size * self.m_size)
+            self.m_max_page = (len(self.m_data) - 1) // self.__page_len__()
         self.m_page = min(self.m_page, self.m_max_page)
 
-        # 對於每個格子
-        for entry_idx, entry in enumerate(self.m_entries):
-            # 清空內容
-            entry.delete(0, tk.END)
-            
-            # 如果該格子沒有在 m_data 中對應的資料
-            if (data_idx := self.__entry2data__(entry_idx)) >= len(self.m_data):
-                entry.configure(state=tk.DISABLED)
-            else:
-                # 重設背景
-                entry.configure(background=self.__bg__(entry_idx))
-                # 啟用
-                entry.configure(state=tk.NORMAL)
-                # 設置內容
-                txt = self.m_BNS_convert.toString(self.m_data[data_idx])
-                entry.insert(0, txt)      
+        # 只讀取這一頁的資料（已經在快取中時不用再讀、再轉換）
+        model = self.__page_model__(self.m_page)
+        self.m_page_data = model.data
+        self.m_page_text = list(model.text) # 編輯時會修改，不能和快取共用
+        self.__paint__()
+        self.__prefetch__()
+
+        # 捲軸顯示這一頁在整個檔案中的位置
+        self.m_pos_bar.set(self.m_page / (self.m_max_page + 1), (self.m_page + 1) / (self.m_max_page + 1))
 
         self.__sanity_check__()
         self.event_generate("<<PageChanged>>")
 
+    def __page_key__(self, page: int) -> tuple:
+        """ 第 page 頁在 PageCache 中的 key """
+        return (self.m_data.getVersion(), page * self.__page_len__(), self.__page_len__(), self.m_BNS_convert.getBase())
+
+    def __page_model__(self, page: int) -> PageModel:
+        """ 取得第 page 頁的內容，不在快取中時讀取並轉換 """
+        key = self.__page_key__(page)
+        model = self.m_page_cache.get(key)
+        if model is None:
+            page_start = page * self.__page_len__()
+            data = self.m_data[page_start : page_start + self.__page_len__()]
+            model = PageModel(data, self.m_BNS_convert.toStrings(data))
+            PROFILER.count("bytes.formatted", len(data))
+            self.m_page_cache.put(key, model)
+        return model
+
+    def __prefetch__(self):
+        """ 在背景準備捲動方向上接下來的幾頁，以及反方向的一頁 """
+        pages = [self.m_page + self.m_scroll_dir * i for i in range(1, PREFETCH_AHEAD + 1)]
+        pages += [self.m_page - self.m_scroll_dir * i for i in range(1, PREFETCH_BEHIND + 1)]
+        keys = [self.__page_key__(p) for p in pages if 0 <= p <= self.m_max_page]
+        if keys:
+            self.m_page_cache.prefetch(self.m_data.snapshot(), keys)
+
+    # 畫面 ###############################################################################################################
+    @timed("table.layout")
+    def __layout__(self):
+        """
+        canvas 大小、表格大小或進制改變時呼叫，重新計算格子大小並建立看得到的格子
+        """
+        self.__close_editor__(commit=True)
+        width = max(self.m_canvas.winfo_width(), 1)
+        height = max(self.m_canvas.winfo_height(), 1)
+
+        # 格子至少要放得下文字，其他情況下填滿整個 canvas
+        digits = len(self.m_BNS_convert.toString(255))
+        min_w = self.m_font.measure("0" * digits) + MIN_CELL_PADDING
+        min_h = self.m_font.metrics("linespace") + MIN_CELL_HEIGHT_PADDING
+        self.m_cell_w = max(width / self.m_size, min_w)
+        self.m_cell_h = max(height / self.m_size, min_h)
+
+        vis_cols = min(self.m_size, math.ceil(width / self.m_cell_w))
+        vis_rows = min(self.m_size, math.ceil(height / self.m_cell_h))
+        self.m_first_col = min(self.m_first_col, self.m_size - vis_cols)
+        self.m_first_row = min(self.m_first_row, self.m_size - vis_rows)
+
+        # 數量一樣時沿用原本的 item，只移動位置
+        if (vis_rows, vis_cols) != (self.m_vis_rows, self.m_vis_cols):
+            self.m_canvas.delete("cell")
+            self.m_rect_items = list()
+            self.m_text_items = list()
+            for _ in range(vis_rows * vis_cols):
+                self.m_rect_items.append(self.m_canvas.create_rectangle(0, 0, 0, 0, outline="gray60", tags="cell"))
+                self.m_text_items.append(self.m_canvas.create_text(0, 0, font=self.m_font, tags="cell"))
+            self.m_vis_rows, self.m_vis_cols = vis_rows, vis_cols
+
+        for r in range(vis_rows):
+            for c in range(vis_cols):
+                i = r * vis_cols + c
+                x, y = c * self.m_cell_w, r * self.m_cell_h
+                self.m_canvas.coords(self.m_rect_items[i], x, y, x + self.m_cell_w, y + self.m_cell_h)
+                self.m_canvas.coords(self.m_text_items[i], x + self.m_cell_w / 2, y + self.m_cell_h / 2)
+
+        self.m_painted = [None] * (vis_rows * vis_cols)
+        self.__paint__()
+
+    @timed("table.paint")
+    def __paint__(self):
+        """
+        重畫看得到的格子。和上次畫的一樣的格子會被跳過
+        """
+        self.m_repaint.clear()
+        configured = 0
+        for r in range(self.m_vis_rows):
+            for c in range(self.m_vis_cols):
+                configured += self.__paint_cell__(r * self.m_vis_cols + c, (self.m_first_row + r) * self.m_size + self.m_first_col + c)
+        PROFILER.count("widgets.configured", configured)
+
+    def __paint_cell__(self, item_idx: int, entry_idx: int) -> int:
+        """ 將 entry_idx 這個格子畫在第 item_idx 個 canvas 格子上，回傳呼叫了幾次 itemconfigure """
+        if entry_idx < len(self.m_page_data):
+            state = (self.m_page_text[entry_idx], self.__bg__(entry_idx))
+        else: # 沒有對應的資料
+            state = ("", "gray90")
+
+        if self.m_painted[item_idx] == state:
+            return 0
+        configured = 0
+        if self.m_painted[item_idx] is None or self.m_painted[item_idx][0] != state[0]:
+            self.m_canvas.itemconfigure(self.m_text_items[item_idx], text=state[0])
+            configured += 1
+        if self.m_painted[item_idx] is None or self.m_painted[item_idx][1] != state[1]:
+            self.m_canvas.itemconfigure(self.m_rect_items[item_idx], fill=state[1])
+            configured += 1
+        self.m_painted[item_idx] = state
+        return configured
+
+    def __repaint_entry__(self, entry_idx: int) -> int:
+        """ 如果 entry_idx 這個格子看得到，就重畫它。回傳呼叫了幾次 itemconfigure """
+        item_idx = self.__entry2item__(entry_idx)
+        if item_idx is not None:
+            return self.__paint_cell__(item_idx, entry_idx)
+        return 0
+
+    def __invalidate__(self, start: int, end: int):
+        """
+        data 中 [start, end) 的顏色可能改變了。只記下這一頁中受影響的格子，等到 idle 時再一起重畫
+        """
+        first = max(self.__data2entry__(start), 0)
+        last = min(self.__data2entry__(end), len(self.m_page_data))
+        if first >= last:
+            return
+
+        self.m_repaint.update(range(first, last))
+        if self.m_repaint_job is None:
+            self.m_repaint_job = self.after_idle(self.__flush_repaint__)
+
+    @timed("table.repaint")
+    def __flush_repaint__(self):
+        """ 重畫 m_repaint 中的格子 """
+        self.m_repaint_job = None
+        configured = 0
+        for entry_idx in self.m_repaint:
+            configured += self.__repaint_entry__(entry_idx)
+        PROFILER.count("cells.repainted", len(self.m_repaint))
+        PROFILER.count("widgets.configured", configured)
+        self.m_repaint.clear()
+
+    def __scroll__(self, step: int, horizontal: bool):
+        """ 頁面比 canvas 大時，捲動看得到的範圍 """
+        if horizontal:
+            first_col = min(max(self.m_first_col + step, 0), self.m_size - self.m_vis_cols)
+            if first_col == self.m_first_col:
+                return
+            self.m_first_col = first_col
+        else:
+            first_row = min(max(self.m_first_row + step, 0), self.m_size - self.m_vis_rows)
+            if first_row == self.m_first_row:
+                return
+            self.m_first_row = first_row
+        self.__close_editor__(commit=True)
+        self.__paint__()
 
     def __bg__(self, entry_idx: int):
-        """ 取得self.m_entries[entry_idx] 的背景顏色 """
+        """ 取得第 entry_idx 個格子的背景顏色 """
         data_idx = self.__entry2data__(entry_idx) # 該格子對應到 m_data 中的哪個資料
 
-       # 副顏色
-        sub = 0 
-        if self.m_data_select.contain(data_idx):
-            sub = 1
-        elif data_idx < len(self.m_data_hilit) and self.m_data_hilit[data_idx]:
-            sub = 2
-        
         # 主顏色
-        if (entry_idx // self.m_size + entry_idx % self.m_size) % 2:
-            return ["gray81", "#6767E7", "#E7E767"][sub]
-        else:
-            return ["white", "#4444FF", "yellow"][sub]
-        
-    def __entry_on_click__(self, entry_idx: int, shift: bool):
+        dark = (entry_idx // self.m_size + entry_idx % self.m_size) % 2
+
+       # 副顏色
+        if self.__page_selected__()[entry_idx]:
+            return "#6767E7" if dark else "#4444FF"
+        if data_idx in self.m_data_hilit:
+            return HIT_COLORS[0][dark]
+        if self.m_search is not None and (pid := self.m_search.patternAt(data_idx)) is not None:
+            return HIT_COLORS[pid % len(HIT_COLORS)][dark]
+        return "gray81" if dark else "white"
+
+    def __page_selected__(self) -> bytearray:
         """
-        當某個格子被點擊時呼叫。參數：格子的index、有沒有按shift
+        這一頁中每個格子有沒有被選取（1 / 0）。以一次區間查詢算出整頁，選取範圍和頁面都沒變時重複使用
+        """
+        page_start = self.__entry2data__(0)
+        key = (self.m_data_select.getChanges(), page_start, len(self.m_page_data))
+        if self.m_page_selected is None or self.m_page_selected[0] != key:
+            mask = bytearray(len(self.m_page_data))
+            for start, end in self.m_data_select.query(page_start, page_start + len(mask)):
+                mask[start - page_start : end - page_start] = b"\x01" * (end - start)
+            self.m_page_selected = (key, mask)
+        return self.m_page_selected[1]
+
+    def __invalidate_selection__(self):
+        """ 重畫這一頁中被選取的格子（在選取範圍改變前、後各呼叫一次） """
+        page_start = self.__entry2data__(0)
+        for start, end in self.m_data_select.query(page_start, page_start + len(self.m_page_data)):
+            self.__invalidate__(start, end)
+
+    # 事件 ###############################################################################################################
+    def __event2entry__(self, event) -> int | None:
+        """ 滑鼠事件點到哪個格子，沒有點到有資料的格子時回傳 None """
+        col = int(event.x // self.m_cell_w) + self.m_first_col
+        row = int(event.y // self.m_cell_h) + self.m_first_row
+        if not (0 <= col < self.m_size and 0 <= row < self.m_size):
+            return None
+        entry_idx = row * self.m_size + col
+        if entry_idx >= len(self.m_page_data):
+            return None
+        return entry_idx
+
+    def __canvas_on_click__(self, event, shift: bool, add: bool = False):
+        """ canvas 被點擊時呼叫 """
+        self.m_canvas.focus_set()
+        if (entry_idx := self.__event2entry__(event)) is not None:
+            self.__entry_on_click__(entry_idx, shift, add)
+
+    def __canvas_on_double_click__(self, event):
+        """ 雙擊格子時開始編輯 """
+        if (entry_idx := self.__event2entry__(event)) is not None:
+            self.__open_editor__(entry_idx)
+
+    def __canvas_on_key__(self, event):
+        """ 選取格子後直接輸入數字，會開始編輯選取範圍的第一格 """
+        R = self.m_data_select.toTuple()
+        if R is None or not event.char or not self.m_BNS_convert.isDigit(event.char):
+            return
+        entry_idx = self.__data2entry__(R[0])
+        if 0 <= entry_idx < len(self.m_page_data):
+            self.__open_editor__(entry_idx, initial=event.char)
+
+    def __entry_on_click__(self, entry_idx: int, shift: bool, add: bool = False):
+        """
+        當某個格子被點擊時呼叫。參數：格子的index、有沒有按shift、有沒有按ctrl（保留原本的選取）
         """
         data_idx = self.__entry2data__(entry_idx)
+        old = self.m_data_select.toTuple()
 
         if shift:
             self.m_data_select.setEnd(data_idx)
+        elif add:
+            self.m_data_select.addSingle(data_idx)
+            old = None # 原本的範圍還是被選取
         else:
+            self.__invalidate_selection__() # 其他的範圍會被取消
             self.m_data_select.selectSingle(data_idx)
 
-        # 重設背景
-        for entry_idx, entry in enumerate(self.m_entries):
-            entry.configure(background=self.__bg__(entry_idx))
-        
+        # 只重畫選取狀態有改變的格子
+        for start, end in _range_diff(old, self.m_data_select.toTuple()):
+            self.__invalidate__(start, end)
+
+    # 編輯 ###############################################################################################################
+    def __open_editor__(self, entry_idx: int, initial: str | None = None):
+        """ 在第 entry_idx 個格子上開啟輸入框。initial 不是 None 時以它取代原本的內容 """
+        self.__close_editor__(commit=True)
+        item_idx = self.__entry2item__(entry_idx)
+        if item_idx is None or entry_idx >= len(self.m_page_data):
+            return
+
+        x1, y1, x2, y2 = self.m_canvas.coords(self.m_rect_items[item_idx])
+        self.m_edit_idx = entry_idx
+        self.m_editor.configure(validatecommand=self.m_BNS_convert.getValidator())
+        self.m_editor.delete(0, tk.END)
+        self.m_editor.insert(0, self.m_page_text[entry_idx] if initial is None else initial)
+        self.m_editor_window = self.m_canvas.create_window(x1, y1, anchor=tk.NW, window=self.m_editor,
+                                                           width=x2 - x1, height=y2 - y1)
+        self.m_editor.focus_set()
+        if initial is None:
+            self.m_editor.select_range(0, tk.END)
+        self.m_editor.icursor(tk.END)
+
+    def __close_editor__(self, commit: bool):
+        """ 關閉輸入框。commit 為 True 時將內容寫回 m_data """
+        if self.m_edit_idx is None:
+            return
+        entry_idx, self.m_edit_idx = self.m_edit_idx, None
+        data_idx = self.__entry2data__(entry_idx)
+
+        if commit and data_idx < len(self.m_data):
+            try:
+                value = self.m_BNS_convert.toInt(self.m_editor.get())
+            except ValueError:
+                value = 0
+            PROFILER.count("bytes.parsed")
+            self.m_data.write(data_idx, bytes([value]))
+            page_data = bytearray(self.m_page_data)
+            page_data[entry_idx] = value
+            self.m_page_data = bytes(page_data)
+            self.m_page_text[entry_idx] = self.m_BNS_convert.toString(value)
+            self.__sync_search__() # 修改的附近可能多了或少了結果
+
+        self.m_canvas.delete(self.m_editor_window)
+        self.m_editor_window = None
+        self.m_canvas.focus_set()
+        self.__repaint_entry__(entry_idx)
+
+    def __editor_on_focus_out__(self):
+        """ 輸入框失去焦點時確認修改（Tab 換到下一格時焦點會回到新的輸入框，此時不處理） """
+        if self.focus_get() is not self.m_editor:
+            self.__close_editor__(commit=True)
+
+    def __edit_next__(self):
+        """ 確認目前的格子，並編輯下一格（換頁時不會繼續） """
+        entry_idx = self.m_edit_idx
+        self.__close_editor__(commit=True)
+        if entry_idx is not None and entry_idx + 1 < len(self.m_page_data):
+            self.__open_editor__(entry_idx + 1)
+        return "break"
+
+    # index 轉換 #########################################################################################################
+    def __page_len__(self):
+        """ 每頁有幾個格子 """
+        return self.m_size * self.m_size
+
     def __entry2data__(self, entry_idx: int):
         """
-        取得 self.m_entries[entry_idx] 中的格子對應到 m_data 中的哪個 byte
+        取得頁面中第 entry_idx 個格子對應到 m_data 中的哪個 byte
         """
-        return self.m_page * len(self.m_entries) + entry_idx
-    
+        return self.m_page * self.__page_len__() + entry_idx
+
     def __data2entry__(self, data_idx: int):
         """
-        取得 self.m_data[data_idx] 顯示在哪個格子（entry）上
+        取得 self.m_data[data_idx] 顯示在頁面中的哪個格子上
         """
-        return data_idx - self.m_page * len(self.m_entries)
+        return data_idx - self.m_page * self.__page_len__()
+
+    def __entry2item__(self, entry_idx: int) -> int | None:
+        """
+        取得頁面中第 entry_idx 個格子畫在哪個 canvas 格子上，看不到時回傳 None
+        """
+        r = entry_idx // self.m_size - self.m_first_row
+        c = entry_idx % self.m_size - self.m_first_col
+        if 0 <= r < self.m_vis_rows and 0 <= c < self.m_vis_cols:
+            return r * self.m_vis_cols + c
+        return None
 
     def resize(self, new_size: int):
         """
@@ -177,53 +576,25 @@ class BinTable(tk.Frame):
         """
         if self.m_size == new_size: # 大小不變，忽略
             return
-        
-        # 刪掉舊的表格
-        if self.m_entries is not None:
-            self.__write_back__()
-            for entry in self.m_entries:
-                entry.destroy()
-
-        # 建立新的表格，Row Major
-        self.m_entries = list()
-        for row in range(new_size):
-            for col in range(new_size):
-                self.rowconfigure(row, weight=1)     # 自動調整大小
-                self.columnconfigure(col, weight=1)
-
-                # 新的格子
-                entry = tk.Entry(self, width=4, borderwidth=1,
-                                 validate='key', validatecommand=self.m_BNS_convert.getValidator())
-                self.m_entries.append(entry)
-                entry_idx = len(self.m_entries) - 1
-
-                # 顯示
-                entry.grid(row=row, column=col,
-                           sticky=(tk.W, tk.E, tk.S, tk.N))
-                
-                # 格子的點擊事件
-                entry.bind("<Button-1>", 
-                           lambda e, I=entry_idx: self.__entry_on_click__(I, False))
-                entry.bind("<Shift-Button-1>", 
-                           lambda e, I=entry_idx: self.__entry_on_click__(I, True))
-
-        # 變小，將表格外的區域的weight設成0
-        if new_size < self.m_size:
-            for r in range(new_size, self.m_size):
-                self.rowconfigure(r, weight=0)
-
-            for c in range(new_size, self.m_size):
-                self.columnconfigure(c, weight=0)
+        if new_size <= 0:
+            raise ValueError(f"BinTable.resize() - invalid size {new_size}")
 
+        if self.m_size > 0:
+            self.__write_back__()
         self.m_size = new_size
+        self.m_first_row = self.m_first_col = 0
+        self.__layout__()
         self.__update_content__()
 
-    def setData(self, data: bytearray):
+    def setData(self, data: bytes | BinaryBuffer):
         """
-        重新設定data
+        重新設定data。若 data 是 BinaryBuffer 則直接使用，不會複製
         """
-        self.m_data = bytearray(data)
-        self.m_data_hilit = [False for _ in range(len(self.m_data))] # 清空選擇
+        self.__close_editor__(commit=False)
+        self.m_data = data if isinstance(data, BinaryBuffer) else BinaryBuffer(bytes(data))
+        self.m_data.enableUndo(self.m_undo_limit)
+        self.m_data_hilit = IntervalSet() # 清空選擇
+        self.__drop_search__()
         self.m_data_select.unselect()
         self.m_page = 0
         self.__update_content__()
@@ -232,10 +603,10 @@ class BinTable(tk.Frame):
         """ 改變顯示的進制 """
         self.__write_back__()
         self.m_BNS_convert.setBase(newBase)
+        self.m_page_text = self.m_BNS_convert.toStrings(self.m_page_data)
 
-        for entry in self.m_entries:
-            entry.configure(validatecommand=self.m_BNS_convert.getValidator())
-
+        # 文字寬度可能改變
+        self.__layout__()
         self.__update_content__()
 
     # page ##############################################################################################################
@@ -243,39 +614,110 @@ class BinTable(tk.Frame):
         """
         頁數加1
         """
-        if self.m_page == self.m_max_page: # 沒有下一頁
-            return
-        
-        self.__write_back__()
-
-        self.m_page += 1
-        if DEBUG_MODE:
-            print(f'Page: {self.m_page}')
-
-        self.__update_content__()
+        self.gotoPage(self.m_page + 1)
 
     def prevPage(self, *args):
         """
         頁數減1
         """
-        if (self.m_page == 0):
+        self.gotoPage(self.m_page - 1)
+
+    def gotoPage(self, page: int):
+        """
+        直接跳到第 page 頁（超出範圍時跳到第一頁或最後一頁）。只會讀取那一頁的資料
+        """
+        self.__cancel_pending_page__()
+        page = min(max(page, 0), self.m_max_page)
+        if page == self.m_page:
             return
 
         self.__write_back__()
 
-        self.m_page -= 1
+        self.m_scroll_dir = 1 if page > self.m_page else -1
+        self.m_page = page
         if DEBUG_MODE:
             print(f'Page: {self.m_page}')
 
         self.__update_content__()
 
+    def gotoOffset(self, offset: int):
+        """
+        跳到 data 中第 offset 個 byte 所在的頁面，並選取它
+        """
+        if not (0 <= offset < len(self.m_data)):
+            raise IndexError(f"BinTable.gotoOffset() - offset {offset} out of range")
+        self.gotoPage(offset // self.__page_len__())
+        self.select(offset, offset)
+
+    def requestPage(self, page: int):
+        """
+        要求換到第 page 頁，但等到 idle 時才真的換頁。連續呼叫時只有最後一次會被畫出來（捲軸拖曳、按住 PageDown 時使用）
+        """
+        self.m_pending_page = min(max(page, 0), self.m_max_page)
+        if self.m_page_job is None:
+            self.m_page_job = self.after_idle(self.__flush_pending_page__)
+        else: # 上一個要求還沒畫，直接取代它
+            PROFILER.count("page.requests_coalesced")
+
+    def __target_page__(self) -> int:
+        """ 將要顯示的頁面（還有沒畫的換頁時以它為準） """
+        return self.m_page if self.m_pending_page is None else self.m_pending_page
+
+    def __flush_pending_page__(self):
+        self.m_page_job = None
+        if self.m_pending_page is not None:
+            page, self.m_pending_page = self.m_pending_page, None
+            self.gotoPage(page)
+
+    def __cancel_pending_page__(self):
+        self.m_pending_page = None
+        if self.m_page_job is not None:
+            self.after_cancel(self.m_page_job)
+            self.m_page_job = None
+
+    def __pos_bar_on_scroll__(self, action: str, value: str, unit: str | None = None):
+        """ 捲軸被拖曳或點擊 """
+        if action == tk.MOVETO:
+            self.requestPage(int(float(value) * (self.m_max_page + 1)))
+        elif action == tk.SCROLL:
+            # 點擊捲軸的空白處一次跳過約 5% 的檔案
+            step = int(value) * (max(self.m_max_page // 20, 1) if unit == tk.PAGES else 1)
+            self.requestPage(self.__target_page__() + step)
+
     def getData(self) -> bytearray:
         """
-        取得經修改後的資料
+        取得經修改後的資料。會將整份資料讀進記憶體，大檔案請改用 iterChunks()
+        """
+        self.__write_back__()
+        return bytearray(self.m_data[0:len(self.m_data)])
+
+    def getBuffer(self) -> BinaryBuffer:
+        """
+        寫回正在編輯的格子後，回傳 BinaryBuffer
         """
         self.__write_back__()
         return self.m_data
 
+    def getSnapshot(self) -> PieceTable:
+        """
+        取得經修改後的資料的唯讀複本（O(1)），之後的修改不會影響它
+        """
+        self.__write_back__()
+        return self.m_data.snapshot()
+
+    def getDataSize(self) -> int:
+        """
+        取得資料長度
+        """
+        return len(self.m_data)
+
+    def iterChunks(self, chunk_size: int = 1 << 20):
+        """
+        依序取得經修改後的資料，每次 chunk_size 個 byte
+        """
+        self.__write_back__()
+        yield from self.m_data.iterChunks(chunk_size)
+
     def getMaxPage(self):
         """
         回傳最大頁數
@@ -288,43 +730,137 @@ class BinTable(tk.Frame):
         """
         return self.m_page
 
+    def getPageLen(self) -> int:
+        """
+        取得每頁有幾個 byte
+        """
+        return self.__page_len__()
+
+    def getSelection(self) -> tuple[int, int] | None:
+        """
+        取得選取的範圍 [start, end]（包含兩端點），沒有選取時回傳 None
+        """
+        return self.m_data_select.toTuple()
+
+    def getSelectedRanges(self) -> list[tuple[int, int]]:
+        """
+        取得所有的選取範圍，每段為 [start, end)（不包含終點，由小到大，截到資料結尾）
+        """
+        return self.m_data_select.ranges(high=len(self.m_data))
+
     # highlight ######################################################################################################
     def clearHighlights(self, event=None):
         """ 清除所有高亮顯示 """
-        self.m_data_hilit = [False for _ in range(len(self.m_data))]
-        for entry_idx, entry in enumerate(self.m_entries):
-            entry.configure(background=self.__bg__(entry_idx))
+        # 只有這一頁中被標記的格子需要重畫
+        page_start = self.__entry2data__(0)
+        for start, end in self.m_data_hilit.query(page_start, page_start + len(self.m_page_data)):
+            self.__invalidate__(start, end)
+        self.m_data_hilit.clear()
+        self.__drop_search__()
 
     def highlight(self, start: int, end: int):
         """ 將 data 中 [start, end) 的範圍標記起來 """
-        for data_idx in range(start, end):
-            self.m_data_hilit[data_idx] = True
+        self.m_data_hilit.add(start, end)
+        self.__invalidate__(start, end)
+
+    def setSearchResult(self, result: SearchResult):
+        """ 顯示搜尋結果（取代之前的結果） """
+        self.__drop_search__()
+        self.m_search = result
+        self.refreshSearch()
+
+    def refreshSearch(self):
+        """ 重畫這一頁中的搜尋結果 """
+        if self.m_search is None:
+            return
+        page_start = self.__entry2data__(0)
+        for start, end in self.m_search.query(page_start, page_start + len(self.m_page_data)):
+            self.__invalidate__(start, end)
+
+    def takeSearchResult(self) -> SearchResult | None:
+        """ 移除顯示中的搜尋結果但不取消搜尋，回傳它（沒有時為 None）。切換分頁時用來保留還在進行的搜尋 """
+        result = self.m_search
+        if result is None:
+            return None
+        page_start = self.__entry2data__(0)
+        for start, end in result.query(page_start, page_start + len(self.m_page_data)):
+            self.__invalidate__(start, end)
+        self.m_search = None
+        return result
+
+    def __drop_search__(self):
+        """ 取消並移除搜尋結果 """
+        result = self.takeSearchResult()
+        if result is not None:
+            result.cancel()
+
+    def __sync_search__(self):
+        """
+        資料被修改後呼叫。BinaryBuffer 保留的搜尋結果已經被更新（平移並重新搜尋修改的附近），只需要重畫；
+        還沒搜尋完、或不是由 BinaryBuffer 保留的結果已經對不上了，直接移除
+        """
+        if self.m_search is None:
+            return
+        if self.m_search.isComplete() and self.m_data.tracks(self.m_search):
+            # 結果可能增加或減少，重畫整頁（沒變的格子不會真的重畫）
+            page_start = self.__entry2data__(0)
+            self.__invalidate__(page_start, page_start + len(self.m_page_data))
+        else:
+            self.__drop_search__()
 
-            # 如果 m_data[idx] 顯示在目前的頁面
-            entry_idx = self.__data2entry__(data_idx)
-            if 0 <= entry_idx and entry_idx < len(self.m_entries):
-                self.m_entries[entry_idx].configure(background=self.__bg__(entry_idx))
+    def gotoHit(self, forward: bool = True) -> tuple[int, int] | None:
+        """
+        跳到選取位置（沒有選取時為這一頁的開頭）之後 / 之前的下一個搜尋結果，並選取它。沒有結果時回傳 None
+        """
+        if self.m_search is None:
+            return None
+        R = self.m_data_select.toTuple()
+        pos = R[0] if R is not None else self.__entry2data__(0) - (1 if forward else 0)
+        hit = self.m_search.nextHit(pos) if forward else self.m_search.prevHit(pos)
+        if hit is None:
+            return None
+        start, end = hit
+        self.gotoPage(start // self.__page_len__())
+        self.select(start, end - 1)
+        return hit
 
     # select & edit ###########################################################################################
-    def deleteSelectedBytes(self):
-        """ 將選中的bytes（藍色標記）刪除 """
-        R = self.m_data_select.toTuple()
+    def select(self, start: int, end: int):
+        """ 選取 data 中 [start, end] 的範圍（包含兩端點） """
+        old = self.m_data_select.toTuple()
+        if self.m_data_select.count() > 1:
+            self.__invalidate_selection__()
+        self.m_data_select.selectSingle(start)
+        self.m_data_select.setEnd(end)
+        for a, b in _range_diff(old, self.m_data_select.toTuple()):
+            self.__invalidate__(a, b)
+
+    def selectRanges(self, ranges: list[tuple[int, int]]):
+        """ 取代原本的選取，選取 ranges 中的每一段 [start, end)（由小到大排列，第一段成為目前的範圍） """
+        self.__invalidate_selection__()
+        self.m_data_select.selectRanges(ranges)
+        self.__invalidate_selection__()
+
+    def selectAllHits(self) -> int:
+        """ 選取目前所有的搜尋結果（搜尋還在進行時只有已經找到的部分），回傳選取了幾個 """
+        if self.m_search is None:
+            return 0
+        ranges = self.m_search.query(0, len(self.m_data))
+        self.selectRanges(ranges)
+        return len(ranges)
 
-        NoSelect = R is None
-        if not NoSelect:
-            start, end = R
-            end = min(end, len(self.m_data) - 1)
-            if start >= len(self.m_data):
-                NoSelect = True
-        if NoSelect:
-            messagebox.showerror(None, "!!! No byte is selected !!!")
+    def deleteSelectedBytes(self):
+        """ 將選中的bytes（藍色標記）刪除，選取多段範圍時一次全部刪除 """
+        if (ranges := self.__selected_ranges__()) is None:
             return
-        
+
         self.__write_back__()
-        # 刪除
-        del self.m_data[start : end + 1]
-        del self.m_data_hilit[start : end + 1]
-        print(f"{end - start + 1} bytes are deleted")
+        # 刪除（從後面開始刪，前面的 offset 不會移動）
+        self.m_data.replaceAll(ranges, b'')
+        if self.m_data_hilit:
+            for start, end in reversed(ranges):
+                self.m_data_hilit.shift(start, -(end - start))
+        self.__sync_search__()
 
         # 重設
         self.m_data_select.unselect()
@@ -343,20 +879,112 @@ class BinTable(tk.Frame):
         if NoSelect:
             messagebox.showerror(None, "!!! No byte is selected !!!")
             return
-        
+
         self.__write_back__()
         # 插入
         if insert_before:
-            self.m_data.insert(start, 0)
-            self.m_data_hilit.insert(start, True)
+            self.m_data.insert(start, b'\x00')
+            self.m_data_hilit.shift(start, 1)
+            self.__sync_search__()
+            self.m_data_hilit.add(start, start + 1)
 
             # 向後平移
-            self.m_data_select.selectSingle(start + 1)
-            self.m_data_select.setEnd(end + 1)
+            self.m_data_select.shift(start, 1)
         else:
-            self.m_data.insert(end + 1, 0)
-            self.m_data_hilit.insert(end + 1, True)
-        
+            self.m_data.insert(end + 1, b'\x00')
+            self.m_data_hilit.shift(end + 1, 1)
+            self.__sync_search__()
+            self.m_data_hilit.add(end + 1, end + 2)
+            self.m_data_select.shift(end + 1, 1)
+
         # Update
         self.__update_content__()
 
+    # bulk edit ###########################################################################################
+    def __selected_ranges__(self) -> list[tuple[int, int]] | None:
+        """ 所有的選取範圍，每段為 [start, end)（截到資料結尾）。沒有選取時顯示錯誤訊息並回傳 None """
+        ranges = self.getSelectedRanges()
+        if not ranges:
+            messagebox.showerror(None, "!!! No byte is selected !!!")
+            return None
+        return ranges
+
+    def replaceHits(self, data: bytes) -> int:
+        """
+        將目前所有的搜尋結果換成 data（長度可以不同）。一次完成，復原時也是一步。回傳換了幾個結果
+        """
+        if self.m_search is None or not self.m_search.isComplete():
+            raise RuntimeError("BinTable.replaceHits() - no finished search")
+        self.__write_back__()
+        ranges = self.m_search.query(0, len(self.m_data))
+        self.m_data.replaceAll(ranges, data)
+        if self.m_data_hilit:
+            for start, end in reversed(ranges):
+                self.m_data_hilit.shift(start + min(end - start, len(data)), len(data) - (end - start))
+        self.m_data_select.unselect()
+        self.__sync_search__()
+        self.__update_content__()
+        return len(ranges)
+
+    def fillSelection(self, pattern: bytes):
+        """ 以重複的 pattern 填滿選取範圍（每段都從 pattern 的開頭開始） """
+        if (ranges := self.__selected_ranges__()) is None:
+            return
+        self.__write_back__()
+        self.m_data.fillAll(ranges, pattern)
+        self.__sync_search__()
+        self.__update_content__()
+
+    def pasteBytes(self, data: bytes, insert: bool):
+        """
+        貼上 data。insert 為 True 時插入在選取範圍前，否則取代選取範圍（長度可以不同）。
+        選取多段範圍時每一段都貼上一次。貼上的部分會被選取
+        """
+        if (ranges := self.__selected_ranges__()) is None or not data:
+            return
+        self.__write_back__()
+        if insert:
+            ranges = [(start, start) for start, _ in ranges]
+        self.m_data.replaceAll(ranges, data)
+        if self.m_data_hilit:
+            for start, end in reversed(ranges):
+                self.m_data_hilit.shift(start + min(end - start, len(data)), len(data) - (end - start))
+        self.__sync_search__()
+        self.m_data_select.unselect()
+        self.__update_content__()
+
+        # 貼上後每一段的位置：前面每一段的長度改變都會讓它平移
+        pasted = list()
+        delta = 0
+        for start, end in ranges:
+            pasted.append((start + delta, start + delta + len(data)))
+            delta += len(data) - (end - start)
+        self.selectRanges(pasted)
+
+    # undo & redo ###########################################################################################
+    def undo(self, *args):
+        """ 復原上一次修改 """
+        self.__write_back__()
+        self.__apply_changes__(self.m_data.undo())
+
+    def redo(self, *args):
+        """ 重做上一次被復原的修改 """
+        self.__write_back__()
+        self.__apply_changes__(self.m_data.redo())
+
+    def __apply_changes__(self, changes: list[tuple[int, int, int]]):
+        """
+        復原 / 重做之後，依序平移標記和搜尋結果，並切換到第一個改變的位置所在的頁面。
+        changes 中每一項為 (offset, 原本的長度, 新的長度)
+        """
+        if not changes:
+            return
+        for offset, old_len, new_len in changes:
+            self.m_data_hilit.shift(offset + min(old_len, new_len), new_len - old_len)
+        self.__sync_search__()
+
+        self.m_data_select.unselect()
+        first = min(offset for offset, _, _ in changes)
+        if len(self.m_data) > 0:
+            self.m_page = min(first, len(self.m_data) - 1) // self.__page_len__()
+        self.__update_content__()
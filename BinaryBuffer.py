@@ -0,0 +1,472 @@
+"""
+提供了類別 BinaryBuffer：不依賴 tkinter 的資料核心，負責開檔、讀寫、插入刪除、搜尋和存檔。
+BinTable 只是它的顯示介面，命令列工具（BinaryCLI.py）也使用同一個核心。
+"""
+import itertools
+import os
+import re
+import shutil
+import tempfile
+from collections import OrderedDict
+
+import Search
+from Profiler import PROFILER
+from DataSource import MmapSource
+from PieceTable import PieceTable
+from UndoJournal import UndoJournal, DEFAULT_MAX_BYTES
+from Checksum import HashIndex
+from ByteStats import StatsIndex
+
+# 資料的版本號碼，所有 BinaryBuffer 共用同一個遞增的序列，所以不同的 buffer 也不會有相同的版本
+_VERSIONS = itertools.count()
+
+MAX_CACHED_SEARCHES = 8   # 最多保留幾個搜尋結果
+MAX_RESCAN_EDITS = 64     # 一次修改超過這麼多個範圍時，不逐一更新搜尋結果，直接丟掉
+
+# 原地存檔時最多先讀進記憶體多少修改過的資料，超過就改成寫到暫存檔
+MAX_IN_PLACE_BYTES = 64 << 20
+
+
+class BinaryBuffer:
+    """
+    一份二進制資料。從檔案開啟時以 mmap 對應（MmapSource），修改記錄在 PieceTable 中。
+
+    開啟 / 關閉：
+    - BinaryBuffer(data)      : 以記憶體中的 bytes 建立
+    - BinaryBuffer.open(path) : 開啟檔案
+    - close()                 : 關閉檔案
+
+    存取：
+    - len(buffer)、buffer[i]、buffer[a:b]、read()
+    - iterChunks()            : 依序讀出所有資料
+    - snapshot()              : O(1) 取得目前資料的唯讀複本（給背景執行緒使用）
+    - getVersion()            : 資料的版本，每次修改都會改變（用來當快取的 key）
+
+    修改：
+    - write()                 : 覆寫
+    - insert()、delete()、replace()
+    - replaceAll()            : 將多個範圍換成同一段資料
+    - fill()、fillAll()       : 以重複的 pattern 填滿一段 / 多段範圍
+
+    復原 / 重做（需要先呼叫 enableUndo()）：
+    - undo()、redo()          : 回傳改變了哪些範圍
+    - canUndo()、canRedo()
+
+    搜尋 / 存檔：
+    - search()                : 在背景搜尋，回傳 Search.SearchResult（同一個 pattern 會沿用之前的結果）
+    - multiSearch()           : 一次搜尋多個 pattern，回傳 Search.MultiSearchResult
+    - findAll()               : 搜尋並等待結果（不使用快取）
+    保留的搜尋結果在資料被修改時會跟著更新：平移之後只重新搜尋修改的位置附近（還沒搜尋完的直接取消）
+    - save()                  : 存檔（長度沒變時只寫回修改過的部分）
+
+    雜湊值 / 統計：
+    - hashIndex()             : 整份資料的 CRC32 / MD5 / SHA-256（第一次呼叫時開始在背景計算，修改時只重新計算受影響的部分）
+    - statsIndex()            : 每一塊資料的 entropy 和 byte 分布（同上）
+    """
+    # private members ####################
+    m_source: MmapSource | None    # 開啟的檔案（以記憶體中的資料建立時為 None）
+    m_data: PieceTable
+    m_journal: UndoJournal | None  # 復原 / 重做的記錄（沒有開啟時為 None）
+    m_version: int                 # 資料的版本
+    m_searches: OrderedDict        # pattern -> 搜尋結果，最後面是最近用到的
+    m_hashes: HashIndex | None     # 整份資料的雜湊值（還沒用到時為 None）
+    m_stats: StatsIndex | None     # 每一塊資料的統計（還沒用到時為 None）
+
+    def __init__(self, data: bytes = b''):
+        self.m_source = None
+        self.m_data = PieceTable(bytes(data))
+        self.m_journal = None
+        self.m_version = next(_VERSIONS)
+        self.m_searches = OrderedDict()
+        self.m_hashes = None
+        self.m_stats = None
+
+    @classmethod
+    def open(cls, path: str) -> "BinaryBuffer":
+        """ 以 mmap 開啟檔案，所花的時間和檔案大小無關 """
+        buffer = cls()
+        buffer.m_source = MmapSource(path)
+        buffer.m_data = PieceTable(buffer.m_source)
+        return buffer
+
+    def close(self):
+        """ 關閉檔案，之後不能再使用這個 buffer """
+        for index in self.__indexes__():
+            index.close()
+        if self.m_source is not None:
+            self.m_source.close()
+            self.m_source = None
+
+    def getPath(self) -> str | None:
+        """ 開啟的檔案路徑（以記憶體中的資料建立時為 None） """
+        return None if self.m_source is None else self.m_source.getPath()
+
+    # 存取 ############################################################################################
+    def __len__(self):
+        return len(self.m_data)
+
+    def __getitem__(self, key: int | slice):
+        return self.m_data[key]
+
+    def read(self, start: int, end: int) -> bytes:
+        """ 讀取 [start, end) 的資料 """
+        return self.m_data.read(start, end)
+
+    def iterChunks(self, chunk_size: int = 1 << 20):
+        """ 依序讀出所有資料，每次最多 chunk_size 個 byte """
+        yield from self.m_data.iterChunks(chunk_size)
+
+    def snapshot(self) -> PieceTable:
+        """ O(1) 取得目前資料的唯讀複本 """
+        return self.m_data.snapshot()
+
+    def getVersion(self) -> int:
+        """ 資料的版本。內容改變時一定會變（存檔不算修改） """
+        return self.m_version
+
+    # 修改 ############################################################################################
+    def write(self, offset: int, data: bytes):
+        """ 從 offset 開始覆寫 data（不會改變長度，超出結尾的部分會被忽略） """
+        end = min(offset + len(data), len(self.m_data))
+        if offset >= end:
+            return
+        removed = self.m_data.read(offset, end)
+        if removed == data[: end - offset]: # 沒有變
+            return
+        self.m_data.replace(offset, end, data[: end - offset])
+        self.__record__([(offset, removed, end - offset)])
+        self.__update_searches__(offset, end - offset, end - offset)
+        self.__update_indexes__(offset, end - offset, end - offset)
+        self.m_version = next(_VERSIONS)
+
+    def insert(self, offset: int, data: bytes):
+        """ 在 offset 前插入 data """
+        self.replace(offset, offset, data)
+
+    def delete(self, start: int, end: int):
+        """ 刪除 [start, end) """
+        self.replace(start, end, b'')
+
+    def replace(self, start: int, end: int, data: bytes):
+        """ 將 [start, end) 換成 data """
+        if start == end and not data: # 沒有變
+            return
+        record = self.__can_record__(end - start)
+        removed = self.m_data.read(start, end) if record else b''
+        self.m_data.replace(start, end, data)
+        if record:
+            self.__record__([(start, removed, len(data))])
+        self.__update_searches__(start, end - start, len(data))
+        self.__update_indexes__(start, end - start, len(data))
+        self.m_version = next(_VERSIONS)
+
+    def replaceAll(self, ranges: list[tuple[int, int]], data: bytes):
+        """
+        將多個互不重疊、由小到大排列的 [start, end) 都換成 data（復原時算是同一步）。
+        從後面開始換，前面的 offset 就不會因為長度改變而移動
+        """
+        if not ranges:
+            return
+        prev_end = 0
+        for start, end in ranges:
+            if not (prev_end <= start <= end):
+                raise ValueError("BinaryBuffer.replaceAll() - ranges must be sorted and disjoint")
+            prev_end = end
+        record = self.__can_record__(sum(end - start for start, end in ranges), len(ranges))
+        step = list()
+        if record:
+            step = [(start, self.m_data.read(start, end), len(data)) for start, end in reversed(ranges)]
+        if len(ranges) > MAX_RESCAN_EDITS:
+            # 範圍很多時一次重建 piece table（data 只存一份），搜尋結果逐一更新太慢，直接丟掉
+            self.__drop_searches__()
+            self.m_data.replaceRanges(ranges, data)
+            for index in self.__indexes__():
+                index.reset(self.m_data.snapshot())
+        else:
+            for start, end in reversed(ranges):
+                self.m_data.replace(start, end, data)
+                self.__update_searches__(start, end - start, len(data))
+                self.__update_indexes__(start, end - start, len(data))
+        if record:
+            self.__record__(step)
+        self.m_version = next(_VERSIONS)
+
+    def fill(self, start: int, end: int, pattern: bytes):
+        """ 以重複的 pattern 填滿 [start, end)（不會改變長度） """
+        self.fillAll([(start, end)], pattern)
+
+    def fillAll(self, ranges: list[tuple[int, int]], pattern: bytes):
+        """
+        以重複的 pattern 分別填滿多個互不重疊的 [start, end)（不會改變長度，復原時算是同一步）。
+        每段都從 pattern 的開頭開始填
+        """
+        if not pattern:
+            raise ValueError("BinaryBuffer.fill() - empty pattern")
+        ranges = [(start, min(end, len(self.m_data))) for start, end in ranges if start < min(end, len(self.m_data))]
+        record = self.__can_record__(sum(end - start for start, end in ranges), len(ranges))
+        step = list()
+        changed = False
+        for start, end in ranges:
+            length = end - start
+            data = (pattern * (length // len(pattern) + 1))[:length]
+            if record:
+                removed = self.m_data.read(start, end)
+                if removed == data: # 沒有變
+                    continue
+                step.append((start, removed, length))
+            self.m_data.replace(start, end, data)
+            self.__update_searches__(start, length, length)
+            self.__update_indexes__(start, length, length)
+            changed = True
+        if changed:
+            if record:
+                self.__record__(step)
+            self.m_version = next(_VERSIONS)
+
+    # 復原 / 重做 #####################################################################################
+    def enableUndo(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """ 開始記錄修改，最多使用約 max_bytes 的記憶體（超過時丟掉最舊的記錄） """
+        if self.m_journal is None:
+            self.m_journal = UndoJournal(max_bytes)
+        else:
+            self.m_journal.setMaxBytes(max_bytes)
+
+    def __can_record__(self, removed_len: int, count: int = 1) -> bool:
+        """
+        換掉共 removed_len 個 byte 的一步能不能被記錄。超過記錄的上限時清空記錄（之前的步驟已經接不上了），
+        這樣就不需要先把被換掉的資料整個讀進記憶體
+        """
+        if self.m_journal is None:
+            return False
+        if not self.m_journal.canRecord(removed_len, count):
+            self.m_journal.clear()
+            return False
+        return True
+
+    def __record__(self, step: list[tuple[int, bytes, int]]):
+        if self.m_journal is not None:
+            self.m_journal.record(step)
+
+    def canUndo(self) -> bool:
+        return self.m_journal is not None and self.m_journal.canUndo()
+
+    def canRedo(self) -> bool:
+        return self.m_journal is not None and self.m_journal.canRedo()
+
+    def undo(self) -> list[tuple[int, int, int]]:
+        """
+        復原上一步，回傳依序做了哪些改變 [(offset, 原本的長度, 新的長度), ...]（沒有可以復原的步驟時為空的 list）
+        所花的時間和這一步修改的大小有關，和檔案大小無關
+        """
+        if self.m_journal is None:
+            return []
+        step = self.m_journal.popUndo()
+        if step is None:
+            return []
+        inverse, changes = self.__apply_inverse__(step)
+        if inverse is None: # 太大，無法重做（復原記錄不受影響）
+            self.m_journal.clearRedo()
+        else:
+            self.m_journal.pushRedo(inverse)
+        return changes
+
+    def redo(self) -> list[tuple[int, int, int]]:
+        """ 重做上一個被復原的步驟，回傳值和 undo() 相同 """
+        if self.m_journal is None:
+            return []
+        step = self.m_journal.popRedo()
+        if step is None:
+            return []
+        inverse, changes = self.__apply_inverse__(step)
+        if inverse is None: # 太大，無法再復原（可以重做的步驟不受影響）
+            self.m_journal.clearUndo()
+        else:
+            self.m_journal.pushUndo(inverse)
+        return changes
+
+    def __apply_inverse__(self, step: list[tuple[int, bytes, int]]) -> tuple[list | None, list]:
+        """
+        從最後一個差異開始還原 step，回傳 (反向的步驟, 改變的範圍)。
+        反向的步驟超過記錄的上限時為 None，這時不會先把被換掉的資料讀進記憶體
+        """
+        record = self.m_journal.canRecord(sum(inserted_len for _, _, inserted_len in step), len(step))
+        inverse = list()
+        changes = list()
+        for offset, removed, inserted_len in reversed(step):
+            if record:
+                inverse.append((offset, self.m_data.read(offset, offset + inserted_len), len(removed)))
+            self.m_data.replace(offset, offset + inserted_len, removed)
+            self.__update_searches__(offset, inserted_len, len(removed))
+            self.__update_indexes__(offset, inserted_len, len(removed))
+            changes.append((offset, inserted_len, len(removed)))
+        self.m_version = next(_VERSIONS)
+        return (inverse if record else None), changes
+
+    # 搜尋 ############################################################################################
+    def search(self, pattern: re.Pattern, length: int | None, parallel: bool = False) -> Search.SearchResult:
+        """
+        在背景搜尋目前的資料（搜尋的是複本）。之前以同樣的方式搜尋過同一個 pattern，而且結果沒有被取消時，直接回傳之前的結果
+        """
+        key = ("search", pattern.pattern, pattern.flags, length, parallel)
+        return self.__cached_search__(key, lambda: Search.startSearch(self.snapshot(), pattern, length, parallel=parallel))
+
+    def multiSearch(self, patterns: list[tuple[str, bytes]]) -> Search.MultiSearchResult:
+        """ 一次搜尋多個 pattern（由 Search.parsePatternList() 取得），一樣會沿用之前的結果 """
+        key = ("multi", tuple(patterns))
+        return self.__cached_search__(key, lambda: Search.startMultiSearch(self.snapshot(), patterns))
+
+    def __cached_search__(self, key: tuple, start) -> Search.SearchResult:
+        result = self.m_searches.get(key)
+        if result is not None and (result.isComplete() or not result.isCancelled()):
+            self.m_searches.move_to_end(key)
+            PROFILER.count("search.cache_hit")
+            return result
+        result = start()
+        self.m_searches[key] = result
+        while len(self.m_searches) > MAX_CACHED_SEARCHES:
+            self.m_searches.popitem(last=False)[1].cancel()
+        return result
+
+    def tracks(self, result: Search.SearchResult) -> bool:
+        """ result 是否為保留中、修改時會跟著更新的搜尋結果 """
+        return any(r is result for r in self.m_searches.values())
+
+    def __update_searches__(self, start: int, old_len: int, new_len: int):
+        """ [start, start + old_len) 被換成 new_len 個 byte 後，更新保留的搜尋結果 """
+        if not self.m_searches:
+            return
+        data = self.m_data.snapshot()
+        for key, result in list(self.m_searches.items()):
+            if not result.isComplete(): # 還在搜尋舊的資料，結果對不上了
+                result.cancel()
+                del self.m_searches[key]
+                continue
+            result.shift(start + min(old_len, new_len), new_len - old_len)
+            result.rescan(data, start, start + new_len)
+
+    def __drop_searches__(self):
+        """ 取消並丟掉所有保留的搜尋結果 """
+        for result in self.m_searches.values():
+            result.cancel()
+            result.wait()
+        self.m_searches.clear()
+
+    def findAll(self, pattern: re.Pattern, length: int | None, parallel: bool = False) -> list[tuple[int, int]]:
+        """ 搜尋並等待結果，回傳所有的 [start, end)。每次都重新搜尋，結果不會被保留（修改時不需要更新） """
+        result = Search.startSearch(self.snapshot(), pattern, length, parallel=parallel)
+        result.wait()
+        return result.query(0, len(self.m_data))
+
+    # 雜湊值 / 統計 ###################################################################################
+    def hashIndex(self) -> HashIndex:
+        """ 整份資料的雜湊值，第一次呼叫時開始在背景計算 """
+        if self.m_hashes is None:
+            self.m_hashes = HashIndex(self.m_data.snapshot())
+        return self.m_hashes
+
+    def statsIndex(self) -> StatsIndex:
+        """ 每一塊資料的統計，第一次呼叫時開始在背景計算 """
+        if self.m_stats is None:
+            self.m_stats = StatsIndex(self.m_data.snapshot())
+        return self.m_stats
+
+    def __indexes__(self) -> list:
+        """ 已經開始計算的雜湊值 / 統計 """
+        return [index for index in (self.m_hashes, self.m_stats) if index is not None]
+
+    def __update_indexes__(self, start: int, old_len: int, new_len: int):
+        """ [start, start + old_len) 被換成 new_len 個 byte 後，讓雜湊值和統計只重新計算受影響的部分 """
+        for index in self.__indexes__():
+            index.edit(self.m_data.snapshot(), start, old_len, new_len)
+
+    # 存檔 ############################################################################################
+    def save(self, path: str) -> int:
+        """
+        存檔，回傳寫入的 byte 數。
+        - 覆蓋目前開啟的檔案且長度沒變時，只把修改過的範圍寫回原本的檔案（所花的時間和修改的大小有關）
+        - 其他情況先一段段寫到暫存檔，再取代目標檔案，寫到一半失敗時不會破壞原本的檔案
+
+        覆蓋目前開啟的檔案時，會先停下還在讀它的背景工作（搜尋、雜湊值、統計），存好後重新對應存好的檔案。
+        注意：覆蓋時其他人拿到的舊 snapshot 會失效，呼叫前要先停止使用它們的背景工作
+        """
+        with PROFILER.timer("buffer.save"):
+            if self.isBackedBy(path) and len(self.m_data) == len(self.m_source):
+                ranges = self.m_data.dirtyRanges()
+                if sum(end - start for start, end in ranges) <= MAX_IN_PLACE_BYTES:
+                    return self.__save_in_place__(ranges)
+            return self.__save_replace__(path)
+
+    def __save_in_place__(self, ranges: list[tuple[int, int]]) -> int:
+        """ 只寫回 ranges 中的資料（長度和原本的檔案相同） """
+        # 移動過的 piece 可能還是讀原本的檔案，所以要先全部讀出來再寫
+        patches = [(start, self.m_data.read(start, end)) for start, end in ranges]
+        self.__stop_readers__()
+        try:
+            with open(self.m_source.getPath(), 'r+b') as f:
+                for start, data in patches:
+                    f.seek(start)
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # 檔案的內容已經和目前的資料相同，不需要再記錄修改（對應是共用的，會直接看到新的內容）
+            self.m_data = PieceTable(self.m_source)
+        finally:
+            for index in self.__indexes__():
+                index.setData(self.m_data.snapshot())
+        PROFILER.count("buffer.save_in_place")
+        return sum(len(data) for _, data in patches)
+
+    def __save_replace__(self, path: str) -> int:
+        """ 寫到同一個資料夾中的暫存檔（保留原本檔案的權限）後取代 path。失敗時刪掉暫存檔 """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=os.path.basename(path) + ".", suffix=".tmp")
+        written = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in self.iterChunks():
+                    f.write(chunk)
+                    written += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            else: # mkstemp 建立的檔案只有自己能讀寫，改成一般新檔案的權限
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(tmp_path, 0o666 & ~umask)
+
+            if self.isBackedBy(path):
+                self.__stop_readers__()
+                # Windows 不允許取代對應中的檔案，所以要先關掉
+                self.m_source.close()
+                os.replace(tmp_path, path)
+                self.m_source = MmapSource(path)
+                self.m_data = PieceTable(self.m_source)
+                for index in self.__indexes__(): # 內容沒變，算好的結果還是對的
+                    index.setData(self.m_data.snapshot())
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        return written
+
+    def __stop_readers__(self):
+        """
+        覆寫開啟的檔案前，停下還在背景讀它的工作：還沒搜尋完的搜尋被取消（已經搜尋完的結果不受影響），
+        雜湊值和統計暫停到下一次 setData()
+        """
+        for key, result in list(self.m_searches.items()):
+            if not result.isComplete():
+                result.cancel()
+                result.wait()
+                del self.m_searches[key]
+        for index in self.__indexes__():
+            index.pause()
+
+    def isBackedBy(self, path: str) -> bool:
+        """ path 是否為目前開啟（mmap 中）的檔案 """
+        return self.m_source is not None and os.path.abspath(path) == os.path.abspath(self.m_source.getPath())
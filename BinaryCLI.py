@@ -0,0 +1,158 @@
+"""
+命令列工具：不開視窗，以 patch script 批次修改多個檔案（和 BinaryEditor 使用同一個 BinaryBuffer 核心）
+
+Patch script 每行一個指令，offset 可以是十進位或 0x 開頭的十六進位，# 開頭的行是註解：
+```
+write       OFFSET HEX          # 從 OFFSET 開始覆寫
+insert      OFFSET HEX          # 在 OFFSET 前插入
+delete      START END           # 刪除 [START, END)
+replace-all FIND_HEX NEW_HEX    # 將所有 FIND 換成 NEW（長度可以不同）
+```
+
+用法：
+```sh
+python BinaryCLI.py -s patch.txt --in-place a.bin b.bin
+python BinaryCLI.py -e "write 0x10 DEADBEEF" -e "delete 0 4" -o out/ *.bin -j 8
+```
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import Search
+from BinaryBuffer import BinaryBuffer
+
+
+def parseOffset(text: str) -> int:
+    """ 十進位或 0x 開頭的十六進位 """
+    value = int(text, 0)
+    if value < 0:
+        raise ValueError(f"Negative offset: {text}")
+    return value
+
+
+def parseHex(text: str) -> bytes:
+    return bytes.fromhex(text)
+
+
+def parseScript(lines: list[str]) -> list[tuple]:
+    """
+    解析 patch script。
+
+    Return:
+        [(指令名稱, 參數...), ...]
+
+    Raises:
+        ValueError - 格式不合法（訊息包含行號）
+    """
+    commands = list()
+    for line_no, line in enumerate(lines, start=1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        name, *args = line.split()
+        try:
+            if name in ("write", "insert") and len(args) >= 2:
+                commands.append((name, parseOffset(args[0]), parseHex("".join(args[1:]))))
+            elif name == "delete" and len(args) == 2:
+                start, end = parseOffset(args[0]), parseOffset(args[1])
+                if start > end:
+                    raise ValueError("START > END")
+                commands.append((name, start, end))
+            elif name == "replace-all" and len(args) == 2:
+                find = parseHex(args[0])
+                if len(find) == 0:
+                    raise ValueError("Empty pattern")
+                commands.append((name, find, parseHex(args[1])))
+            else:
+                raise ValueError(f"Unknown command: {line}")
+        except ValueError as e:
+            raise ValueError(f"Line {line_no}: {e}")
+    return commands
+
+
+def applyCommands(buffer: BinaryBuffer, commands: list[tuple]):
+    """ 依序對 buffer 執行指令 """
+    for name, *args in commands:
+        if name == "write":
+            offset, data = args
+            if offset + len(data) > len(buffer):
+                raise ValueError(f"write past end of file: 0x{offset:X}")
+            buffer.write(offset, data)
+        elif name == "insert":
+            offset, data = args
+            if offset > len(buffer):
+                raise ValueError(f"insert past end of file: 0x{offset:X}")
+            buffer.insert(offset, data)
+        elif name == "delete":
+            start, end = args
+            if end > len(buffer):
+                raise ValueError(f"delete past end of file: 0x{end:X}")
+            buffer.delete(start, end)
+        elif name == "replace-all":
+            find, new = args
+            pattern, length = Search.compilePattern(find.hex(), Search.HEX)
+            buffer.replaceAll(buffer.findAll(pattern, length), new)
+
+
+def patchFile(path: str, commands: list[tuple], output: str) -> str:
+    """ 修改一個檔案，寫到 output。回傳要顯示的訊息 """
+    buffer = BinaryBuffer.open(path)
+    try:
+        old_size = len(buffer)
+        applyCommands(buffer, commands)
+        buffer.save(output)
+        return f"{path}: {old_size} -> {len(buffer)} bytes, saved to {output}"
+    finally:
+        buffer.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply patch scripts to binary files without the GUI.")
+    parser.add_argument("files", nargs="+", help="files to patch")
+    parser.add_argument("-s", "--script", action="append", default=[], help="patch script file (can be repeated)")
+    parser.add_argument("-e", "--execute", action="append", default=[], help="a single patch command (can be repeated)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-o", "--output-dir", help="write patched files into this directory")
+    group.add_argument("--in-place", action="store_true", help="overwrite the input files")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="number of files to patch in parallel")
+    args = parser.parse_args(argv)
+
+    lines = list()
+    for script in args.script:
+        with open(script, 'r', encoding='utf-8') as f:
+            lines.extend(f.read().splitlines())
+    lines.extend(args.execute)
+    try:
+        commands = parseScript(lines)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    outputs = [path if args.in_place else os.path.join(args.output_dir, os.path.basename(path)) for path in args.files]
+    # 兩個檔案寫到同一個輸出（例如 -o 時檔名相同）會互相覆蓋，直接拒絕
+    seen = dict()
+    for path, output in zip(args.files, outputs):
+        key = os.path.normcase(os.path.abspath(output))
+        if key in seen:
+            print(f"Error: {seen[key]} and {path} would both be saved to {output}", file=sys.stderr)
+            return 2
+        seen[key] = path
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+    with ProcessPoolExecutor(max(args.jobs, 1)) as pool:
+        futures = [pool.submit(patchFile, path, commands, output) for path, output in zip(args.files, outputs)]
+        for path, future in zip(args.files, futures):
+            try:
+                print(future.result())
+            except (OSError, ValueError) as e:
+                print(f"{path}: Error: {e}", file=sys.stderr)
+                failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
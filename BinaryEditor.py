@@ -3,25 +3,101 @@
 """
 import tkinter as tk
 from tkinter import filedialog
+from tkinter import messagebox
 from tkinter import simpledialog
+from tkinter import ttk
 # import binascii
 import os
 import math
 
 import BinTable
+import Search
+from FileLoader import FileLoader
+from DiffView import DiffView
+from HashPanel import HashPanel
+from Minimap import Minimap
+from PageCache import PageCache
+from SearchDialog import SearchDialog, MultiSearchDialog
+from Profiler import PROFILER
+
+
+FIRST_PAGE_BYTES = 100 * 100   # 開檔時先讀的大小（最大的一頁）
+PAGE_CACHE_BYTES = 64 << 20    # 所有分頁（和比較視窗）共用的頁面快取上限
+
+
+def parse_hex(text):
+    # 十六進位的文字轉成 bytes，忽略空白和 0x 前綴
+    return bytes.fromhex("".join(text.replace("0x", "").replace("0X", "").split()))
+
+
+class Document:
+    """
+    一個分頁中的檔案。畫面上只有一個 BinTable，切換分頁時把它換成那個分頁的資料，
+    所以不在畫面上的分頁只保留資料和位置，不保留任何 widget 或畫好的頁面
+    """
+    def __init__(self, frame):
+        self.frame = frame          # 分頁標籤用的空 frame
+        self.file_path = None
+        self.buffer = None          # 開啟的檔案（BinaryBuffer）
+        self.loader = None          # 正在背景開啟的檔案（FileLoader）
+        self.search_result = None   # 目前的搜尋（可能還在背景執行）
+        self.status_text = ""       # 顯示在資訊標籤後面的狀態（例如搜尋進度）
+        self.page = 0               # 不在畫面上時記住的頁數和選取範圍（[(start, end), ...]）
+        self.selection = None
+
+    def title(self):
+        return "Untitled" if self.file_path is None else os.path.basename(self.file_path)
+
+
+def _current(name):
+    # 目前分頁的屬性（self.buffer 等於 self.current.buffer）
+    return property(lambda self: getattr(self.current, name),
+                    lambda self, value: setattr(self.current, name, value))
 
 
 class BinaryEditor:
+    file_path = _current("file_path")
+    buffer = _current("buffer")
+    loader = _current("loader")
+    search_result = _current("search_result")
+    status_text = _current("status_text")
+
+    @property
+    def file_opened(self):
+        return self.current.buffer is not None
+
     def __init__(self, root):
         self.root = root
         self.root.title("Binary Editor")
-        self.file_opened = False  # 新增布林變數以追踪檔案狀態
-        
-        # 修改：原本的text改成table
-        self.table = BinTable.BinTable(self.root)
+
+        # 分頁（只有標籤，內容都顯示在同一個 table 上）
+        self.tabs = ttk.Notebook(self.root)
+        self.tabs.pack(side=tk.TOP, fill=tk.X)
+        self.tabs.enable_traversal()  # Ctrl + Tab 切換分頁
+        self.tabs.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.documents = {}           # 分頁的 frame（字串） -> Document
+        self.current = None
+
+        # 修改：原本的text改成table。所有分頁共用同一個頁面快取
+        self.page_cache = PageCache(PAGE_CACHE_BYTES)
+        self.table = BinTable.BinTable(self.root, page_cache=self.page_cache)
+        # 右邊的縮圖（entropy 和 byte 分布，點擊跳到那一頁）
+        self.minimap = Minimap(self.root, self.table, lambda: self.buffer)
+        self.minimap.pack(side=tk.RIGHT, fill=tk.Y)
         self.table.pack(expand=True, fill=tk.BOTH)
-        # "ESC" 清除標記
-        self.root.bind("<Escape>", self.table.clearHighlights)
+        # F3 / Shift + F3 跳到下一個 / 上一個搜尋結果
+        self.root.bind("<F3>", lambda e: self.goto_hit(forward=True))
+        self.root.bind("<Shift-F3>", lambda e: self.goto_hit(forward=False))
+        # "ESC" 清除標記（並取消搜尋和開檔）
+        self.root.bind("<Escape>", self.on_escape)
+        # 復原 / 重做
+        self.root.bind("<Control-z>", self.table.undo)
+        self.root.bind("<Control-y>", self.table.redo)
+        self.root.bind("<Control-Z>", self.table.redo)
+        # 跳到某個位置
+        self.root.bind("<Control-g>", lambda e: self.go_to())
+        # 關閉分頁
+        self.root.bind("<Control-w>", lambda e: self.close_tab())
 
         self.menu = tk.Menu(self.root)
         self.root.config(menu=self.menu)
@@ -33,12 +109,20 @@ class BinaryEditor:
         self.create_edit_menu()
         # 添加 Display 選單 ############################################################################
         self.create_display_menu()
+        # 添加 Debug 選單 ##############################################################################
+        self.create_debug_menu()
         
         # 添加文件大小顯示的標籤
         self.info_label = tk.Label(
             self.root, text="File Size: 0 bytes      |      Page 1 / 1")
         self.info_label.pack(side=tk.BOTTOM)
 
+        # 計時資訊（Debug 選單中開啟）
+        self.timing_label = tk.Label(self.root, anchor=tk.W, justify=tk.LEFT, font="TkFixedFont")
+        self.show_timing = tk.BooleanVar(value=False)
+        self.profiling = tk.BooleanVar(value=PROFILER.isEnabled())
+        self.last_counters = {}
+
         # 添加上一頁和下一頁的按鈕
         self.prev_button = tk.Button(
             self.root, text="Previous Page", command=self.prev_page)
@@ -48,40 +132,173 @@ class BinaryEditor:
             self.root, text="Next Page", command=self.next_page)
         self.next_button.pack(side=tk.RIGHT)
 
-        # 各種變數
-        self.file_path = None
-        self.file = None
+        # 第一個（空的）分頁
+        self.new_tab()
 
         # 更新按鈕
         self.update_buttons()
         self.table.bind("<<PageChanged>>", 
-                        lambda e: (self.update_buttons(), self.update_info_label(), print("Page Changed"))
+                        lambda e: (self.update_buttons(), self.update_info_label(), PROFILER.count("page.changed")),
+                        add="+"
                     )
 
-    # 打開檔案
+    # 分頁 #######################################################################################
+    def new_tab(self):
+        # 新增一個空的分頁並切換過去
+        frame = tk.Frame(self.tabs, height=0)
+        doc = Document(frame)
+        self.documents[str(frame)] = doc
+        self.tabs.add(frame, text=doc.title())
+        self.tabs.select(frame)
+        self.switch_to(doc)
+        return doc
+
+    def on_tab_changed(self, event=None):
+        doc = self.documents.get(self.tabs.select())
+        if doc is not None and doc is not self.current:
+            self.switch_to(doc)
+
+    def switch_to(self, doc):
+        # 記住目前分頁的位置，再把表格換成 doc 的資料（還在進行的搜尋和開檔不會被取消）
+        old = self.current
+        if old is not None and old is not doc:
+            buffer = self.table.getBuffer()  # 寫回正在編輯的格子
+            if old.buffer is None and len(buffer) > 0:  # 在空的分頁中輸入的資料
+                old.buffer = buffer
+            old.page = self.table.getPageNum()
+            old.selection = self.table.getSelectedRanges()
+            self.table.takeSearchResult()
+        self.current = doc
+        self.table.setData(doc.buffer if doc.buffer is not None else b'')
+        self.table.gotoPage(doc.page)
+        if doc.selection:
+            self.table.selectRanges(doc.selection)
+        if doc.search_result is not None:
+            self.table.setSearchResult(doc.search_result)
+        self.update_title()
+        self.update_buttons()
+        self.update_info_label()
+
+    def close_tab(self):
+        # 關閉目前的分頁（至少保留一個分頁）
+        doc = self.current
+        self.stop_search()
+        self.stop_loading()
+        if len(self.documents) == 1:
+            self.new_tab()
+        else:
+            tabs = self.tabs.tabs()
+            i = tabs.index(str(doc.frame))
+            other = self.documents[tabs[i + 1] if i + 1 < len(tabs) else tabs[i - 1]]
+            self.tabs.select(other.frame)
+            self.switch_to(other)
+        self.tabs.forget(doc.frame)
+        del self.documents[str(doc.frame)]
+        doc.frame.destroy()
+        if doc.buffer is not None:
+            self.page_cache.discard(doc.buffer.getVersion())
+            doc.buffer.close()
+
+    def update_title(self):
+        if self.file_path is None:
+            self.root.title("Binary Editor")
+        else:
+            self.root.title(f"Binary Editor ({os.path.relpath(self.file_path, '.')})")
+
+    # 打開檔案（在新的分頁中，目前的分頁是空的就直接使用）
     def open_file(self):
         PATH = filedialog.askopenfilename(initialdir='.')
         if PATH:
-            # 只有真的有選擇檔案時才更新self.file_path
-            self.file_path = PATH
-            # 改標題
-            self.root.title(
-                f"Binary Editor ({os.path.relpath(self.file_path, '.')})")
-            
-            # 讀檔，然後傳進table中
-            self.file = open(self.file_path, 'rb')
-            binary_data = self.file.read()
-            self.table.setData(binary_data)
-
-            self.file_opened = True
+            doc = self.current
+            if doc.buffer is not None or doc.loader is not None or self.table.getDataSize() > 0:
+                doc = self.new_tab()
+            # 在背景開檔，第一頁讀好就先顯示，視窗不會卡住
+            doc.loader = FileLoader(PATH, first_bytes=FIRST_PAGE_BYTES)
+            self.tabs.tab(doc.frame, text=os.path.basename(PATH))
+            self.set_doc_status(doc, "Opening...")
+            self.poll_loading(doc, doc.loader)
+
+    def poll_loading(self, doc, loader, shown=False):
+        # 定期檢查背景開檔的狀態，直到預先讀取結束（shown: 是否已經顯示這個檔案）。doc 不在畫面上時也會繼續
+        if loader is not doc.loader:
+            return
+        if loader.getError() is not None:
+            doc.loader = None
+            self.set_doc_status(doc, "")
+            self.tabs.tab(doc.frame, text=doc.title())
+            messagebox.showerror("Open", f"Cannot open {loader.getPath()}:\n{loader.getError()}")
+            return
+
+        if loader.isReady() and not shown:
+            self.show_loaded_file(doc, loader)
+            shown = True
+
+        if loader.isDone():
+            doc.loader = None
+            self.set_doc_status(doc, "")
+        else:
+            if loader.isReady():
+                self.set_doc_status(doc, f"Loading {loader.progress():.0%}")
+            self.root.after(50, lambda: self.poll_loading(doc, loader, shown))
+
+    def show_loaded_file(self, doc, loader):
+        # 第一頁已經讀好，換成新的檔案
+        if doc.search_result is not None:
+            doc.search_result.cancel()
+            doc.search_result.wait()
+            doc.search_result = None
+        old_buffer = doc.buffer
+        doc.buffer = loader.takeBuffer()
+        doc.file_path = loader.getPath()
+        doc.page = 0
+        doc.selection = None
+        self.tabs.tab(doc.frame, text=doc.title())
+        if doc is self.current:
+            self.update_title()
+            self.table.setData(doc.buffer)
+        if old_buffer is not None:
+            self.page_cache.discard(old_buffer.getVersion())
+            old_buffer.close()
+
+    # 比較兩個檔案（在另一個視窗中）
+    def compare_files(self):
+        path_a = filedialog.askopenfilename(initialdir='.', title="Compare: first file")
+        if not path_a:
+            return
+        path_b = filedialog.askopenfilename(initialdir='.', title="Compare: second file")
+        if not path_b:
+            return
+        try:
+            DiffView(self.root, path_a, path_b, page_cache=self.page_cache)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Compare", f"Cannot open file:\n{e}")
+
+    def cancel_loading(self):
+        # 取消背景開檔（已經顯示的檔案保留，只停止預先讀取）
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+            self.set_status("")
+
+    def stop_loading(self):
+        # 取消背景開檔，並等待它結束（覆蓋或關閉檔案前呼叫）
+        if self.loader is not None:
+            loader = self.loader
+            self.cancel_loading()
+            loader.wait()
 
     def create_file_menu(self):
         file_menu = tk.Menu(self.menu)
         self.menu.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Open", command=self.open_file)
+        file_menu.add_command(label="New Tab", command=self.new_tab)
+        file_menu.add_command(label="Close Tab", accelerator="Ctrl+W", command=self.close_tab)
+        file_menu.add_command(label="Cancel Loading", command=self.cancel_loading)
         file_menu.add_command(label="Save", command=self.save_file)
         file_menu.add_command(label="Save As", command=self.save_file_as)
         file_menu.add_command(label="Search", command=self.search)
+        file_menu.add_command(label="Multi Search", command=self.multi_search)
+        file_menu.add_command(label="Compare Files...", command=self.compare_files)
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.exit_application)
         
@@ -90,16 +307,30 @@ class BinaryEditor:
         self.menu.add_cascade(label="Page Size", menu=page_size_menu)
 
         # 頁面大小選項
-        for size in [10, 20, 30]:
+        for size in [10, 20, 30, 50, 100]:
             page_size_menu.add_command(
                 label=f"{size} x {size} bytes", command=lambda s=size: self.set_page_size(s))
             
     def create_edit_menu(self):
         edit_menu = tk.Menu(self.menu)
         self.menu.add_cascade(label="Edit", menu=edit_menu)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.table.undo)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.table.redo)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Go To...", accelerator="Ctrl+G", command=self.go_to)
+        edit_menu.add_command(label="Next Hit", accelerator="F3", command=lambda: self.goto_hit(forward=True))
+        edit_menu.add_command(label="Previous Hit", accelerator="Shift+F3", command=lambda: self.goto_hit(forward=False))
+        edit_menu.add_command(label="Select All Hits", command=self.select_all_hits)
+        edit_menu.add_separator()
         edit_menu.add_command(label="Delete Selected Bytes", command=lambda: self.table.deleteSelectedBytes())
         edit_menu.add_command(label="Insert Before", command=lambda: self.table.insertOneByte(insert_before=True))
         edit_menu.add_command(label="Insert After", command=lambda: self.table.insertOneByte(insert_before=False))
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Fill Selection...", command=self.fill_selection)
+        edit_menu.add_command(label="Paste Hex Over Selection", command=lambda: self.paste_hex(insert=False))
+        edit_menu.add_command(label="Paste Hex Before Selection", command=lambda: self.paste_hex(insert=True))
+        edit_menu.add_command(label="Paste File Before Selection...", command=self.paste_file)
+        edit_menu.add_command(label="Replace All Hits...", command=self.replace_all_hits)
 
     def create_display_menu(self):
         display_menu = tk.Menu(self.menu)
@@ -110,6 +341,66 @@ class BinaryEditor:
         display_menu.add_radiobutton(label="Octobor", command=lambda: self.table.setBase(8), value=8, variable=TMP)
         display_menu.add_radiobutton(label="Decimal", command=lambda: self.table.setBase(10), value=10, variable=TMP)
         display_menu.add_radiobutton(label="Hexdecimal", command=lambda: self.table.setBase(16), value=16, variable=TMP)
+        display_menu.add_separator()
+        self.show_minimap = tk.BooleanVar(value=True)
+        display_menu.add_checkbutton(label="Show Minimap", variable=self.show_minimap, command=self.toggle_minimap)
+        display_menu.add_command(label="Hashes...", command=self.show_hashes)
+
+    def toggle_minimap(self):
+        # 隱藏時不會計算統計
+        if self.show_minimap.get():
+            self.minimap.pack(side=tk.RIGHT, fill=tk.Y, before=self.table)
+        else:
+            self.minimap.pack_forget()
+
+    def show_hashes(self):
+        # 整個檔案和選取範圍的 CRC32 / MD5 / SHA-256（在背景計算）
+        HashPanel(self.root, self.table, lambda: self.buffer)
+
+    def create_debug_menu(self):
+        debug_menu = tk.Menu(self.menu)
+        self.menu.add_cascade(label="Debug", menu=debug_menu)
+        debug_menu.add_checkbutton(label="Enable Profiling", variable=self.profiling, command=self.toggle_profiling)
+        debug_menu.add_checkbutton(label="Show Timing", variable=self.show_timing, command=self.toggle_timing)
+        debug_menu.add_command(label="Reset Timing", command=PROFILER.reset)
+        debug_menu.add_command(label="Export Trace...", command=self.export_trace)
+
+    def toggle_profiling(self):
+        # 開啟或關閉計時和計數（關閉時幾乎不花時間）
+        PROFILER.setEnabled(self.profiling.get())
+
+    def toggle_timing(self):
+        # 顯示或隱藏計時資訊（顯示時會順便開啟計時）
+        if self.show_timing.get():
+            self.profiling.set(True)
+            self.toggle_profiling()
+            self.timing_label.pack(side=tk.BOTTOM, fill=tk.X, before=self.info_label)
+            self.update_timing()
+        else:
+            self.timing_label.pack_forget()
+
+    def update_timing(self):
+        # 每 500ms 更新一次：各操作最近一次 / 最久花多少時間，以及這段時間內的計數
+        if not self.show_timing.get():
+            return
+        lines = list()
+        for name, stat in sorted(PROFILER.getStats().items()):
+            lines.append(f"{name:<22} last {stat['last'] * 1000:8.2f} ms   max {stat['max'] * 1000:8.2f} ms   x{stat['count']}")
+        counters = PROFILER.getCounters()
+        deltas = [f"{name} +{value - self.last_counters.get(name, 0)}" for name, value in sorted(counters.items())]
+        self.last_counters = counters
+        if deltas:
+            lines.append("   ".join(deltas))
+        self.timing_label.config(text="\n".join(lines) or "(no data)")
+        self.root.after(500, self.update_timing)
+
+    def export_trace(self):
+        # 匯出 trace 檔，可以用 chrome://tracing 或 https://ui.perfetto.dev 開啟
+        path = filedialog.asksaveasfilename(defaultextension=".json", initialdir='.',
+                                            filetypes=[("Trace files", "*.json"), ("All files", "*.*")])
+        if path:
+            PROFILER.exportTrace(path)
+            print(f"Trace exported to {path}")
 
     def next_page(self):
         self.table.nextPage()
@@ -117,6 +408,87 @@ class BinaryEditor:
     def prev_page(self):
         self.table.prevPage()
 
+    def go_to(self):
+        # 輸入 offset（十進位或 0x 開頭）或 p 開頭的頁數（從 1 開始），直接跳過去
+        text = simpledialog.askstring("Go To", "Offset (e.g. 0x3F000000) or page (e.g. p120):", parent=self.root)
+        if not text:
+            return
+        text = text.strip()
+        try:
+            if text[0] in "pP":
+                self.table.gotoPage(int(text[1:], 0) - 1)
+            else:
+                self.table.gotoOffset(int(text, 0))
+        except (ValueError, IndexError) as e:
+            messagebox.showerror("Go To", f"Invalid position: {text}\n{e}")
+
+    def goto_hit(self, forward):
+        # 跳到下一個 / 上一個搜尋結果
+        if self.search_result is None:
+            return
+        hit = self.table.gotoHit(forward)
+        if hit is None:
+            self.set_status(f"{len(self.search_result)} hits, no {'next' if forward else 'previous'} hit")
+        else:
+            self.set_status(f"{len(self.search_result)} hits, at 0x{hit[0]:X}")
+
+    def select_all_hits(self):
+        # 選取所有的搜尋結果，之後刪除、填滿、貼上會套用到每一個結果
+        if self.search_result is None:
+            return
+        count = self.table.selectAllHits()
+        self.set_status(f"{count} hits selected")
+
+    def ask_hex(self, title, prompt):
+        # 輸入十六進位的 byte（可以有空白），取消或格式錯誤時回傳 None
+        text = simpledialog.askstring(title, prompt, parent=self.root)
+        if not text:
+            return None
+        try:
+            data = parse_hex(text)
+        except ValueError as e:
+            messagebox.showerror(title, f"Invalid hex: {e}")
+            return None
+        return data or None
+
+    def fill_selection(self):
+        pattern = self.ask_hex("Fill Selection", "Byte pattern (hex), repeated to fill the selection:")
+        if pattern is not None:
+            self.table.fillSelection(pattern)
+
+    def paste_hex(self, insert):
+        # 從剪貼簿貼上十六進位文字
+        try:
+            data = parse_hex(self.root.clipboard_get())
+        except (tk.TclError, ValueError) as e:
+            messagebox.showerror("Paste", f"Clipboard does not contain hex bytes: {e}")
+            return
+        self.table.pasteBytes(data, insert=insert)
+
+    def paste_file(self):
+        # 將整個檔案的內容插入在選取範圍前
+        path = filedialog.askopenfilename(initialdir='.')
+        if path:
+            with open(path, 'rb') as f:
+                self.table.pasteBytes(f.read(), insert=True)
+
+    def replace_all_hits(self):
+        if self.search_result is None or not self.search_result.isComplete():
+            messagebox.showerror("Replace All", "Run a search and wait for it to finish first.")
+            return
+        text = simpledialog.askstring("Replace All", f"Replace {len(self.search_result)} hits with "
+                                      "(hex, may be a different length, empty = delete):", parent=self.root)
+        if text is None:
+            return
+        try:
+            data = parse_hex(text)
+        except ValueError as e:
+            messagebox.showerror("Replace All", f"Invalid hex: {e}")
+            return
+        if data or messagebox.askyesno("Replace All", "Delete all hits?"):
+            count = self.table.replaceHits(data)
+            self.set_status(f"{count} hits replaced")
+
     def set_page_size(self, size):
         try:
             self.table.resize(size)
@@ -137,18 +509,36 @@ class BinaryEditor:
 
     def update_info_label(self):
         # 更新資訊標籤
-        self.info_label.config(
-            text=f"File Size: {len(self.table.getData())} bytes      |      Page {self.table.getPageNum()+1} / {self.table.getMaxPage()+1}")
+        text = f"File Size: {self.table.getDataSize()} bytes      |      Page {self.table.getPageNum()+1} / {self.table.getMaxPage()+1}"
+        if self.status_text:
+            text += f"      |      {self.status_text}"
+        self.info_label.config(text=text)
+
+    def set_status(self, text):
+        # 更新資訊標籤後面的狀態
+        self.set_doc_status(self.current, text)
+
+    def set_doc_status(self, doc, text):
+        # 更新 doc 的狀態（在畫面上時才更新資訊標籤）
+        doc.status_text = text
+        if doc is self.current:
+            self.update_info_label()
 
     def write_to_file(self, path):
-        # 打開文件並寫入數據
-        with open(path, 'wb+') as f:
-            f.write(self.table.getData())
-        print(f"File saved successfully to {path}!")
+        buffer = self.table.getBuffer()
+        if buffer.isBackedBy(path):
+            # 覆蓋目前對應的檔案時，背景的搜尋和預先讀取也在讀這個檔案，要先停下來
+            self.stop_search()
+            self.stop_loading()
+        written = buffer.save(path)
+        print(f"File saved successfully to {path}! ({written} bytes written)")
 
     # 儲存
     def save_file(self):
-        if self.file:
+        if self.file_path is None:  # 在空的分頁中輸入的資料
+            if self.buffer is not None or self.table.getDataSize() > 0:
+                self.save_file_as()
+        elif self.buffer is not None:
             self.write_to_file(self.file_path)
 
     # 另存新檔
@@ -160,51 +550,110 @@ class BinaryEditor:
 
     # 搜尋
     def search(self):
-        # 使用 simpledialog 顯示輸入框
+        # 使用 SearchDialog 顯示輸入框
         if self.file_opened:
-            search_term = simpledialog.askstring(
-                "Input", "Enter search term:", parent=self.root)
-
-            if search_term:
-                # 將搜索字符轉換為 bytes
-                search_bytes = search_term.encode('utf-8')
+            dialog = SearchDialog(self.root)
 
-                # 獲取當前的二進制數據
-                binary_data = self.table.getData()
+            if dialog.result:
+                search_term, mode, parallel = dialog.result
+                pattern, length = Search.compilePattern(search_term, mode)
 
                 # 清除之前的標記
-                self.table.clearHighlights()
+                self.clear_search()
 
-                # 查找字符並標記
-                start_index = 0
-                while True:
-                    start_index = binary_data.find(search_bytes, start_index)
-                    if start_index == -1:
-                        break
-
-                    # 標記找到的字元為黃色
-                    self.table.highlight(
-                        start_index, start_index + len(search_bytes))
-                    start_index += len(search_bytes)  # 移動到下一個搜索位置
+                # 在背景搜尋資料的複本，table 畫格子時才查詢結果（搜尋過的 pattern 會直接沿用之前的結果）
+                self.search_result = self.table.getBuffer().search(pattern, length, parallel=parallel)
+                self.table.setSearchResult(self.search_result)
+                self.poll_search(self.current, self.search_result)
 
                 print(f"Searching for: {search_term}")
         else:
-            alert = tk.Toplevel(self.root)
-            alert.title("Alert")
-
-            label = tk.Label(alert, text="No file opened!")
-            label.pack(padx=20, pady=20)
-
-            # 按鈕來關閉警示視窗
-            close_button = tk.Button(
-                alert, text="Close", command=alert.destroy)
-            close_button.pack(side="bottom")
-            self.center_window(alert)
+            self.show_no_file_alert()
+
+    def show_no_file_alert(self):
+        # 顯示「沒有開啟檔案」的警示視窗
+        alert = tk.Toplevel(self.root)
+        alert.title("Alert")
+
+        label = tk.Label(alert, text="No file opened!")
+        label.pack(padx=20, pady=20)
+
+        # 按鈕來關閉警示視窗
+        close_button = tk.Button(
+            alert, text="Close", command=alert.destroy)
+        close_button.pack(side="bottom")
+        self.center_window(alert)
+
+        # 讓alert顯示在上層，https://stackoverflow.com/questions/16803686/how-to-create-a-modal-dialog-in-tkinter
+        alert.wait_visibility()
+        alert.grab_set()
+        alert.transient(self.root)
+
+    # 同時搜尋多個 pattern
+    def multi_search(self):
+        if not self.file_opened:
+            self.show_no_file_alert()
+            return
+
+        dialog = MultiSearchDialog(self.root, "Multi Search")
+        if dialog.result:
+            self.clear_search()
+            self.search_result = self.table.getBuffer().multiSearch(dialog.result)
+            self.table.setSearchResult(self.search_result)
+            self.poll_search(self.current, self.search_result)
+            print(f"Searching for {len(dialog.result)} patterns")
+
+    def show_multi_search_report(self, result):
+        # 列出每個 pattern 找到幾個、在哪裡，顏色和表格中的標記相同
+        report = tk.Toplevel(self.root)
+        report.title("Multi Search Result")
+        text = tk.Text(report, width=70, height=min(len(result.getNames()) * 2, 30))
+        text.pack(expand=True, fill=tk.BOTH)
+        for pid, name in enumerate(result.getNames()):
+            hits = result.getHits(pid)
+            offsets = ", ".join(f"0x{start:X}" for start, _ in hits[:16])
+            if len(hits) > 16:
+                offsets += ", ..."
+            tag = f"pattern{pid}"
+            text.tag_configure(tag, background=BinTable.HIT_COLORS[pid % len(BinTable.HIT_COLORS)][0])
+            text.insert(tk.END, f"{name}: {len(hits)} hits", tag)
+            text.insert(tk.END, f"\n    {offsets}\n")
+        text.configure(state=tk.DISABLED)
+
+    def poll_search(self, doc, result):
+        # 定期顯示新找到的結果和進度，直到搜尋結束（doc 不在畫面上時也會繼續，只是不重畫表格）
+        if result is not doc.search_result:
+            return
+        if doc is self.current:
+            self.table.refreshSearch()
+        if result.isDone():
+            self.set_doc_status(doc, f"{len(result)} hits")
+            if isinstance(result, Search.MultiSearchResult):
+                self.show_multi_search_report(result)
+        else:
+            self.set_doc_status(doc, f"Searching {result.progress():.0%} ({len(result)} hits)")
+            self.root.after(100, lambda: self.poll_search(doc, result))
+
+    def stop_search(self):
+        # 取消背景的搜尋，並等待它結束
+        if self.search_result is not None:
+            self.search_result.cancel()
+            self.search_result.wait()
+
+    def on_escape(self, event=None):
+        # 開檔中就取消開檔，否則清除搜尋
+        if self.loader is not None:
+            self.cancel_loading()
+        else:
+            self.clear_search()
 
-            # 讓alert顯示在上層，https://stackoverflow.com/questions/16803686/how-to-create-a-modal-dialog-in-tkinter
-            alert.wait_visibility()
-            alert.grab_set()
-            alert.transient(self.root)
+    def clear_search(self, event=None):
+        # 取消搜尋並清除所有標記
+        if self.search_result is not None:
+            self.search_result.cancel()
+            self.search_result = None
+            self.set_status("")
+        self.table.clearHighlights()
 
     # 視窗位置
     def center_window(self, window):
@@ -218,8 +667,13 @@ class BinaryEditor:
 
     # 離開
     def exit_application(self):
-        if self.file:  # 如果有打開的文件，先關閉它
-            self.file.close()
+        for doc in self.documents.values():  # 停止每個分頁的背景工作，並關閉打開的文件
+            for job in (doc.search_result, doc.loader):
+                if job is not None:
+                    job.cancel()
+                    job.wait()
+            if doc.buffer is not None:
+                doc.buffer.close()
         self.root.quit()  # 結束主事件循環
         self.root.destroy()  # 銷毀窗口
 
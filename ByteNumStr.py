@@ -4,13 +4,58 @@
 import re
 import tkinter as tk
 
+from Profiler import PROFILER
+
+# 每個 base 下，一個 byte 最多顯示幾位數
+_WIDTH = {2: 8, 8: 3, 10: 3, 16: 2}
+# 預先算好的轉換表，第一次用到某個 base 時才建立。base -> (byte -> 字串, 字串 -> byte)
+_TABLES: dict[int, tuple[list[str], dict[str, int]]] = dict()
+
+
+def _getTables(base: int) -> tuple[list[str], dict[str, int]]:
+    """ 取得 base 的轉換表 """
+    if base not in _TABLES:
+        if base not in _WIDTH:
+            raise RuntimeError(f"Unsupported Base: {base}")
+
+        to_str = list()
+        to_int = dict()
+        for num in range(256):
+            if base == 2:
+                # 顯示8個bit。若不夠，則最高位補0
+                txt = "{:0>8}".format(  bin(num)[2:]  )
+            elif base == 8:
+                txt = "%03o" % num
+            elif base == 10:
+                txt = "%d" % num
+            else:
+                txt = "%02x" % num
+            to_str.append(txt)
+
+            # 使用者輸入時可能不補0，也可能用大寫
+            shortest = txt.lstrip("0") or "0"
+            for width in range(len(shortest), _WIDTH[base] + 1):
+                key = shortest.zfill(width)
+                to_int[key] = num
+                to_int[key.upper()] = num
+        _TABLES[base] = (to_str, to_int)
+    return _TABLES[base]
+
+
 class ByteNumStr:
-    """ 在字串和 byte 間轉換 """
+    """
+    在字串和 byte 間轉換。每個 base 的 256 個結果都預先算好，換 base 時只是換一組表。
+
+    - toString() / toInt()   : 轉換一個值
+    - toStrings()            : 一次轉換一整頁
+    """
     m_bin_tk_validator: tuple | None
     m_oct_tk_validator: tuple | None
     m_dec_tk_validator: tuple | None
     m_hex_tk_validator: tuple | None
     m_base: int
+    m_to_str: list[str]            # byte -> 字串
+    m_to_int: dict[str, int]       # 字串 -> byte
 
     def __init__(self, base = 16):
         """ 初始化，但不初始化 validator """
@@ -18,34 +63,36 @@ class ByteNumStr:
         self.m_oct_tk_validator = None
         self.m_dec_tk_validator = None
         self.m_hex_tk_validator = None
-        self.m_base = base
+        self.setBase(base)
     
     def setBase(self, newBase: int):
-        """ 改變base """
+        """ 改變base（換成該 base 的轉換表） """
+        self.m_to_str, self.m_to_int = _getTables(newBase)
         self.m_base = newBase
 
+    def getBase(self) -> int:
+        return self.m_base
+
     # Convert ##################################################################
     def toString(self, num: int):
-        """ 依據目前的base，將num轉成string """
-        assert type(num) == int
-
-        if self.m_base == 2:
-            # 顯示8個bit。若不夠，則最高位補0
-            return "{:0>8}".format(  bin(num)[2:]  )
-        if self.m_base == 8:
-            return "%03o" % num
-        if self.m_base == 10:
-            return "%d" % num
-        if self.m_base == 16:
-            return "%02x" % num
-        
-        raise RuntimeError(f"Unsupported Base: {self.m_base}")
+        """ 依據目前的base，將num（0 ~ 255）轉成string """
+        return self.m_to_str[num]
         
     def toInt(self, num: str):
         """ 依據目前的base，將num轉int """
-        assert type(num) == str
+        val = self.m_to_int.get(num)
+        if val is None:
+            # 表中沒有的寫法（例如大小寫混用），或不合法的字串（會丟出 ValueError）
+            return int(num, base=self.m_base)
+        return val
+
+    def toStrings(self, data: bytes) -> list[str]:
+        """ 將一整段 data 轉成 string """
+        return list(map(self.m_to_str.__getitem__, data))
 
-        return int(num, base=self.m_base)
+    def isDigit(self, ch: str) -> bool:
+        """ ch 是否為目前的base下合法的一個位數 """
+        return len(ch) == 1 and ch in "0123456789abcdefABCDEF"[: self.m_base + max(self.m_base - 10, 0)]
     
     # Tk ###################################################################################################
     def initValidator(self, TK: tk.Misc):
@@ -53,20 +100,24 @@ class ByteNumStr:
         初始化給`tk.Entry`用的validator（用來確認輸入的格式）
         """
         def isBin(num):
+            PROFILER.count("validator.calls")
             return re.match("^[01]{0,8}$", num) is not None
         self.m_bin_tk_validator = (TK.register(isBin), "%P")
 
         def isOct(num):
+            PROFILER.count("validator.calls")
             if num == "": return True
             return (re.match("^[0-7]{1,3}$", num) is not None) and int(num, base=8) <= 255
         self.m_oct_tk_validator = (TK.register(isOct), "%P")
 
         def isDec(num):
+            PROFILER.count("validator.calls")
             if num == "": return True
             return (re.match("^[0-9]{1,3}$", num) is not None) and int(num, base=10) <= 255
         self.m_dec_tk_validator = (TK.register(isDec), "%P")
 
         def isHex(num):
+            PROFILER.count("validator.calls")
             return re.match("^[0-9a-fA-F]{0,2}$", num) is not None
         self.m_hex_tk_validator = (TK.register(isHex), "%P")
 
@@ -0,0 +1,249 @@
+"""
+提供了類別 StatsIndex：在背景計算每一塊資料的 entropy 和各類 byte（0x00、ASCII、0x80 以上）的比例，給縮圖（Minimap）使用。
+有 NumPy 時以向量化的 bincount 計算整塊的分布，沒有時改為以 Counter 計算取樣的部分
+"""
+import math
+import threading
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from Profiler import PROFILER
+
+MIN_BLOCK_SIZE = 64 << 10   # 每塊至少多大
+MAX_BLOCKS = 4096           # 大檔案時每塊變大，塊數不超過這個數字（修改後可能稍微多一點）
+SAMPLE_SIZE = 16 << 10      # 沒有 NumPy 時，每塊只統計這麼多 byte（平均分散在整塊中，最多 MAX_BLOCKS 塊，所花的時間有上限）
+SAMPLE_PIECES = 16
+
+
+class BlockStats:
+    """ 一塊資料的統計：entropy（0 ~ 8 bits / byte），以及 0x00、可印出的 ASCII、0x80 以上的 byte 各佔多少比例 """
+    __slots__ = ("entropy", "zero", "ascii", "high")
+
+    def __init__(self, entropy: float, zero: float, ascii: float, high: float):
+        self.entropy = entropy
+        self.zero = zero
+        self.ascii = ascii
+        self.high = high
+
+
+def _histogram(block: bytes) -> list[int]:
+    if np is not None:
+        return np.bincount(np.frombuffer(block, dtype=np.uint8), minlength=256).tolist()
+    if len(block) > SAMPLE_SIZE: # 取樣：平均分散的 SAMPLE_PIECES 段
+        piece = SAMPLE_SIZE // SAMPLE_PIECES
+        step = (len(block) - piece) // (SAMPLE_PIECES - 1)
+        block = b"".join(block[i * step : i * step + piece] for i in range(SAMPLE_PIECES))
+    counts = Counter(block)
+    return [counts.get(v, 0) for v in range(256)]
+
+
+_ASCII = [0x09, 0x0A, 0x0D] + list(range(0x20, 0x7F))
+
+
+def computeStats(block: bytes) -> BlockStats:
+    """ 統計一塊資料 """
+    hist = _histogram(block)
+    total = sum(hist)
+    if total == 0:
+        return BlockStats(0.0, 0.0, 0.0, 0.0)
+    if np is not None:
+        p = np.asarray(hist, dtype=np.float64) / total
+        p = p[p > 0]
+        entropy = float(abs((p * np.log2(p)).sum()))
+    else:
+        entropy = abs(sum(c / total * math.log2(c / total) for c in hist if c))
+    return BlockStats(entropy, hist[0] / total, sum(hist[v] for v in _ASCII) / total, sum(hist[0x80:]) / total)
+
+
+class StatsIndex:
+    """
+    每一塊資料的統計（BlockStats），在背景執行緒中計算。
+    塊的位置會跟著修改平移，插入 / 刪除 / 覆寫後只重新計算被改到的塊。
+
+    - edit()          : 資料被修改了（BinaryBuffer 在修改時呼叫）
+    - reset()         : 整份資料都換了，全部重新計算
+    - setData()       : 內容沒變，之後從新的 snapshot 讀取
+    - blocks()        : 所有的塊 [(開頭, 長度, BlockStats 或 None), ...]
+    - query()         : 和 [start, end) 重疊的塊
+    - getChanges()    : 每算好一塊或塊的位置改變時加一（畫面可以用來判斷要不要重畫）
+    - pause()         : 暫停並等正在進行的讀取結束（存檔覆寫檔案前呼叫，setData() 等修改後繼續）
+    - progress()、isDone()、close()
+    """
+    # private members ####################
+    m_lock: threading.Lock
+    m_wakeup: threading.Condition
+    m_data: object                     # 目前資料的唯讀複本
+    m_block_size: int
+    m_starts: list[int]
+    m_lengths: list[int]
+    m_stats: list[BlockStats | None]   # 還沒算好時為 None
+    m_scan: int                        # 前幾塊都算好了
+    m_done: int                        # 算好了幾塊
+    m_changes: int
+    m_paused: bool
+    m_busy: bool                       # 背景執行緒正在讀取 m_data
+    m_closed: bool
+    m_thread: threading.Thread | None
+
+    def __init__(self, data):
+        self.m_lock = threading.Lock()
+        self.m_wakeup = threading.Condition(self.m_lock)
+        self.m_changes = 0
+        self.m_paused = False
+        self.m_busy = False
+        self.m_closed = False
+        self.m_thread = None
+        self.reset(data)
+
+    def close(self):
+        with self.m_lock:
+            self.m_closed = True
+            self.m_wakeup.notify()
+
+    def pause(self):
+        """ 暫停計算，並等正在進行的讀取結束。之後呼叫 reset()、setData() 或 edit() 時繼續 """
+        with self.m_lock:
+            self.m_paused = True
+            while self.m_busy:
+                self.m_wakeup.wait()
+
+    # 修改 ############################################################################################
+    def reset(self, data):
+        with self.m_lock:
+            self.m_paused = False
+            self.m_data = data
+            self.m_block_size = max(MIN_BLOCK_SIZE, -(-len(data) // MAX_BLOCKS))
+            self.m_lengths = self.__split__(len(data))
+            self.m_stats = [None] * len(self.m_lengths)
+            self.__update_starts__()
+            self.m_scan = 0
+            self.m_done = 0
+            self.m_changes += 1
+            self.__start__()
+
+    def setData(self, data):
+        with self.m_lock:
+            self.m_paused = False
+            self.m_data = data
+            self.m_wakeup.notify()
+
+    def edit(self, data, start: int, old_len: int, new_len: int):
+        """ [start, start + old_len) 被換成了 new_len 個 byte，data 為修改後的資料 """
+        with self.m_lock:
+            self.m_paused = False
+            self.m_data = data
+            if not self.m_lengths:
+                self.m_lengths = self.__split__(len(data))
+                self.m_stats = [None] * len(self.m_lengths)
+            else:
+                # 被改到的塊為 [i0, i1]，重新切成差不多大的塊
+                i0 = max(bisect_right(self.m_starts, start) - 1, 0)
+                i1 = max(bisect_right(self.m_starts, start + old_len - 1) - 1, i0)
+                length = self.m_starts[i1] + self.m_lengths[i1] - self.m_starts[i0] + new_len - old_len
+                if length < self.m_block_size // 2 and i1 + 1 < len(self.m_lengths): # 太小的話併入下一塊
+                    i1 += 1
+                    length += self.m_lengths[i1]
+                lengths = self.__split__(length)
+                self.m_done -= sum(stats is not None for stats in self.m_stats[i0 : i1 + 1])
+                self.m_lengths[i0 : i1 + 1] = lengths
+                self.m_stats[i0 : i1 + 1] = [None] * len(lengths)
+                self.m_scan = min(self.m_scan, i0)
+            self.__update_starts__()
+            self.m_changes += 1
+            self.__start__()
+
+    def __split__(self, length: int) -> list[int]:
+        """ 將長度為 length 的範圍切成大小在 m_block_size ~ 2 * m_block_size 之間的塊（太短時只有一塊） """
+        if length <= 0:
+            return []
+        count = max(length // self.m_block_size, 1)
+        size, extra = divmod(length, count)
+        return [size + (1 if i < extra else 0) for i in range(count)]
+
+    def __update_starts__(self):
+        starts = list()
+        pos = 0
+        for length in self.m_lengths:
+            starts.append(pos)
+            pos += length
+        self.m_starts = starts
+
+    # 結果 ############################################################################################
+    def blocks(self) -> list[tuple[int, int, BlockStats | None]]:
+        with self.m_lock:
+            return list(zip(self.m_starts, self.m_lengths, self.m_stats))
+
+    def query(self, start: int, end: int) -> list[tuple[int, int, BlockStats | None]]:
+        """ 和 [start, end) 重疊的塊 """
+        with self.m_lock:
+            i = max(bisect_right(self.m_starts, start) - 1, 0)
+            j = bisect_left(self.m_starts, end)
+            return list(zip(self.m_starts[i:j], self.m_lengths[i:j], self.m_stats[i:j]))
+
+    def getChanges(self) -> int:
+        return self.m_changes
+
+    def progress(self) -> float:
+        return 1.0 if not self.m_lengths else self.m_done / len(self.m_lengths)
+
+    def isDone(self) -> bool:
+        return self.m_done == len(self.m_lengths)
+
+    # 計算（背景執行緒） ##################################################################################
+    def __start__(self):
+        """ 有新的工作時叫醒背景執行緒（呼叫前要先取得 m_lock） """
+        if self.m_thread is None:
+            self.m_thread = threading.Thread(target=self.__run__, daemon=True)
+            self.m_thread.start()
+        self.m_wakeup.notify()
+
+    def __next_job__(self) -> int | None:
+        """ 下一個要算的塊，暫停中時為 None（呼叫前要先取得 m_lock） """
+        if self.m_paused:
+            return None
+        while self.m_scan < len(self.m_stats) and self.m_stats[self.m_scan] is not None:
+            self.m_scan += 1
+        return self.m_scan if self.m_scan < len(self.m_stats) else None
+
+    def __run__(self):
+        while True:
+            with self.m_lock:
+                i = self.__next_job__()
+                while i is None and not self.m_closed:
+                    self.m_wakeup.wait()
+                    i = self.__next_job__()
+                if self.m_closed:
+                    return
+                start, length, data = self.m_starts[i], self.m_lengths[i], self.m_data
+                self.m_busy = True
+
+            try:
+                with PROFILER.timer("stats.block"):
+                    stats = computeStats(self.__read__(data, start, start + length))
+            except (OSError, ValueError): # 檔案已經被關閉，等拿到新的 snapshot 再算一次
+                with self.m_lock:
+                    if self.m_data is data and not self.m_closed:
+                        self.m_wakeup.wait()
+                continue
+
+            with self.m_lock:
+                # 算的時候資料可能又被修改了：塊的位置不同時丟掉結果
+                if i < len(self.m_stats) and self.m_stats[i] is None and self.m_data is data \
+                        and self.m_starts[i] == start and self.m_lengths[i] == length:
+                    self.m_stats[i] = stats
+                    self.m_done += 1
+                    self.m_changes += 1
+
+    def __read__(self, data, start: int, end: int) -> bytes:
+        """ 讀取 data 的 [start, end)，讀完後通知 pause() """
+        try:
+            return data.read(start, end)
+        finally:
+            with self.m_lock:
+                self.m_busy = False
+                self.m_wakeup.notify_all()
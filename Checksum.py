@@ -0,0 +1,361 @@
+"""
+提供了類別 HashIndex：在背景計算整份資料的 CRC32 / MD5 / SHA-256，修改後只重新計算受影響的部分；
+以及 startRangeHash()：在背景計算一段範圍（例如選取範圍）的雜湊值
+"""
+import hashlib
+import threading
+import zlib
+from bisect import bisect_right
+
+from Profiler import PROFILER
+
+CHUNK_SIZE = 1 << 20       # 每個 chunk 的大小（修改後重新切的 chunk 在 CHUNK_SIZE ~ 2 * CHUNK_SIZE 之間）
+HASH_NAMES = ("crc32", "md5", "sha256")
+
+
+# CRC32 合併 ##########################################################################################
+# CRC 是線性的：crc(A + B) = shift(crc(A), len(B)) ^ crc(B)，shift 是在 GF(2) 上的 32x32 矩陣（做法同 zlib 的 crc32_combine）。
+# 預先算好「補上 2^k 個 0 byte」的矩陣，合併時依 len(B) 的 bit 逐一套用
+def _gf2Times(mat: list[int], vec: int) -> int:
+    result = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            result ^= mat[i]
+        vec >>= 1
+        i += 1
+    return result
+
+
+def _gf2Square(mat: list[int]) -> list[int]:
+    return [_gf2Times(mat, mat[n]) for n in range(32)]
+
+
+def _zerosOperators() -> list[list[int]]:
+    """ 第 k 個矩陣表示在資料後面補上 2^k 個 0 byte """
+    op = [0xEDB88320] + [1 << n for n in range(31)]   # 補上 1 個 0 bit
+    for _ in range(3):                                   # 1 個 0 byte = 8 個 0 bit
+        op = _gf2Square(op)
+    ops = [op]
+    for _ in range(63):
+        ops.append(_gf2Square(ops[-1]))
+    return ops
+
+
+_ZEROS_OPS = _zerosOperators()
+
+
+def crc32Combine(crc_a: int, crc_b: int, len_b: int) -> int:
+    """ 已知 crc32(A)、crc32(B)、len(B)，回傳 crc32(A + B) """
+    k = 0
+    while len_b:
+        if len_b & 1:
+            crc_a = _gf2Times(_ZEROS_OPS[k], crc_a)
+        len_b >>= 1
+        k += 1
+    return crc_a ^ crc_b
+
+
+class _Chunk:
+    """
+    資料中連續的一段。crc 為這一段的 CRC32（還沒算時為 None）；
+    md5 / sha256 為從資料開頭到這一段結尾的雜湊狀態（前綴），之後的 chunk 可以從這裡接著算
+    """
+    __slots__ = ("length", "crc", "md5", "sha256")
+
+    def __init__(self, length: int):
+        self.length = length
+        self.crc = None
+        self.md5 = None
+        self.sha256 = None
+
+
+class HashIndex:
+    """
+    整份資料的 CRC32 / MD5 / SHA-256，在背景執行緒中計算。資料被切成一個個 chunk：
+    - 每個 chunk 記錄自己的 CRC32，整份的 CRC32 由各個 chunk 合併而成（crc32Combine()），
+      修改（包含插入 / 刪除）後只需要重新計算被改到的 chunk，後面的 chunk 只是位置平移
+    - MD5 / SHA-256 無法由各段合併（用 Merkle tree 算出的值也會和其他工具不同），
+      因此每個 chunk 保存到它結尾為止的雜湊狀態，修改後從被改到的 chunk 接著算，之前的部分不用重算
+
+    - edit()                    : 資料被修改了（BinaryBuffer 在修改時呼叫）
+    - reset()                   : 整份資料都換了，全部重新計算
+    - setData()                 : 內容沒變，但之後要從新的 snapshot 讀取（例如存檔後重新對應）
+    - crc32() / md5() / sha256(): 目前的結果，還沒算好時為 None
+    - progress()                : MD5 / SHA-256 的進度（0 ~ 1）
+    - pause()                   : 暫停並等正在進行的讀取結束（存檔覆寫檔案前呼叫，setData() 等修改後繼續）
+    - close()                   : 停止背景執行緒
+    """
+    # private members ####################
+    m_lock: threading.Lock
+    m_wakeup: threading.Condition      # 有新的工作
+    m_data: object                     # 目前資料的唯讀複本（PieceTable.snapshot()）
+    m_chunks: list[_Chunk]
+    m_starts: list[int]                # 每個 chunk 的開頭（和 m_chunks 對應）
+    m_valid: int                       # 前幾個 chunk 的 md5 / sha256 是對的
+    m_crc_scan: int                    # 前幾個 chunk 的 crc 都算好了
+    m_crc: int | None                  # 合併好的 CRC32（有 chunk 改變時為 None）
+    m_paused: bool
+    m_busy: bool                       # 背景執行緒正在讀取 m_data
+    m_closed: bool
+    m_thread: threading.Thread | None
+
+    def __init__(self, data):
+        self.m_lock = threading.Lock()
+        self.m_wakeup = threading.Condition(self.m_lock)
+        self.m_paused = False
+        self.m_busy = False
+        self.m_closed = False
+        self.m_thread = None
+        self.reset(data)
+
+    def close(self):
+        with self.m_lock:
+            self.m_closed = True
+            self.m_wakeup.notify()
+
+    def pause(self):
+        """ 暫停計算，並等正在進行的讀取結束。之後呼叫 reset()、setData() 或 edit() 時繼續 """
+        with self.m_lock:
+            self.m_paused = True
+            while self.m_busy:
+                self.m_wakeup.wait()
+
+    # 修改 ############################################################################################
+    def reset(self, data):
+        """ 以 data 重新切 chunk，全部重新計算 """
+        with self.m_lock:
+            self.m_paused = False
+            self.m_data = data
+            self.m_chunks = self.__split__(len(data))
+            self.__update_starts__()
+            self.m_valid = 0
+            self.m_crc_scan = 0
+            self.m_crc = None
+            self.__start__()
+
+    def setData(self, data):
+        """ 資料的內容沒變（已經算好的結果仍然正確），之後從 data 讀取 """
+        with self.m_lock:
+            self.m_paused = False
+            self.m_data = data
+            self.m_wakeup.notify()
+
+    def edit(self, data, start: int, old_len: int, new_len: int):
+        """ [start, start + old_len) 被換成了 new_len 個 byte，data 為修改後的資料 """
+        with self.m_lock:
+            self.m_paused = False
+            self.m_data = data
+            if not self.m_chunks:
+                self.m_chunks = self.__split__(len(data))
+                self.__update_starts__()
+                self.__start__()
+                return
+
+            # 被改到的 chunk 為 [i0, i1]。在結尾插入時算是最後一個 chunk 被改到
+            i0 = max(bisect_right(self.m_starts, start) - 1, 0)
+            i1 = max(bisect_right(self.m_starts, start + old_len - 1) - 1, i0)
+            region_start = self.m_starts[i0]
+            region_end = self.m_starts[i1] + self.m_chunks[i1].length + new_len - old_len
+            # 剩下太小的話併入下一個 chunk，避免刪除後留下很多小 chunk
+            if region_end - region_start < CHUNK_SIZE // 2 and i1 + 1 < len(self.m_chunks):
+                i1 += 1
+                region_end += self.m_chunks[i1].length
+
+            self.m_chunks[i0 : i1 + 1] = self.__split__(region_end - region_start)
+            self.__update_starts__()
+            self.m_valid = min(self.m_valid, i0)
+            self.m_crc_scan = min(self.m_crc_scan, i0)
+            self.m_crc = None
+            PROFILER.count("hash.chunks_invalidated", i1 - i0 + 1)
+            self.__start__()
+
+    @staticmethod
+    def __split__(length: int) -> list[_Chunk]:
+        """ 將長度為 length 的範圍切成大小在 CHUNK_SIZE ~ 2 * CHUNK_SIZE 之間的 chunk（太短時只有一個） """
+        if length <= 0:
+            return []
+        count = max(length // CHUNK_SIZE, 1)
+        size, extra = divmod(length, count)
+        return [_Chunk(size + (1 if i < extra else 0)) for i in range(count)]
+
+    def __update_starts__(self):
+        starts = list()
+        pos = 0
+        for chunk in self.m_chunks:
+            starts.append(pos)
+            pos += chunk.length
+        self.m_starts = starts
+
+    # 結果 ############################################################################################
+    def crc32(self) -> int | None:
+        with self.m_lock:
+            if self.m_crc is None:
+                if any(chunk.crc is None for chunk in self.m_chunks):
+                    return None
+                crc = 0
+                for chunk in self.m_chunks:
+                    crc = crc32Combine(crc, chunk.crc, chunk.length)
+                self.m_crc = crc
+            return self.m_crc
+
+    def md5(self) -> str | None:
+        return self.__digest__("md5")
+
+    def sha256(self) -> str | None:
+        return self.__digest__("sha256")
+
+    def __digest__(self, name: str) -> str | None:
+        with self.m_lock:
+            if not self.m_chunks:
+                return hashlib.new(name).hexdigest()
+            if self.m_valid < len(self.m_chunks):
+                return None
+            return getattr(self.m_chunks[-1], name).hexdigest()
+
+    def progress(self) -> float:
+        with self.m_lock:
+            total = len(self.m_data)
+            if total == 0 or self.m_valid == len(self.m_chunks):
+                return 1.0
+            return self.m_starts[self.m_valid] / total
+
+    def isDone(self) -> bool:
+        with self.m_lock:
+            return self.m_valid == len(self.m_chunks) and self.__next_job__() is None
+
+    # 計算（背景執行緒） ##################################################################################
+    def __start__(self):
+        """ 有新的工作時叫醒背景執行緒（呼叫前要先取得 m_lock） """
+        if self.m_thread is None:
+            self.m_thread = threading.Thread(target=self.__run__, daemon=True)
+            self.m_thread.start()
+        self.m_wakeup.notify()
+
+    def __next_job__(self):
+        """
+        下一個要算的 chunk：先算還沒有 CRC 的（這樣 CRC32 很快就會好），再接著算 MD5 / SHA-256 的前綴。
+        回傳 (chunk, index, 開頭, 資料)，沒有工作（或暫停中）時為 None（呼叫前要先取得 m_lock）
+        """
+        if self.m_paused:
+            return None
+        while self.m_crc_scan < len(self.m_chunks) and self.m_chunks[self.m_crc_scan].crc is not None:
+            self.m_crc_scan += 1
+        if self.m_crc_scan < len(self.m_chunks):
+            i = self.m_crc_scan
+            return self.m_chunks[i], i, self.m_starts[i], self.m_data
+        if self.m_valid < len(self.m_chunks):
+            i = self.m_valid
+            return self.m_chunks[i], i, self.m_starts[i], self.m_data
+        return None
+
+    def __run__(self):
+        while True:
+            with self.m_lock:
+                job = self.__next_job__()
+                while job is None and not self.m_closed:
+                    self.m_wakeup.wait()
+                    job = self.__next_job__()
+                if self.m_closed:
+                    return
+                chunk, i, start, data = job
+                prefix = i == self.m_valid
+                prev = self.m_chunks[i - 1] if prefix and i > 0 else None
+                self.m_busy = True
+
+            try:
+                with PROFILER.timer("hash.chunk"):
+                    block = self.__read__(data, start, start + chunk.length)
+                    crc = zlib.crc32(block) if chunk.crc is None else chunk.crc
+                    if prefix:
+                        md5 = prev.md5.copy() if prev is not None else hashlib.md5()
+                        sha256 = prev.sha256.copy() if prev is not None else hashlib.sha256()
+                        md5.update(block)
+                        sha256.update(block)
+            except (OSError, ValueError):
+                # 讀取的檔案已經被關閉（例如存檔後重新對應），等拿到新的 snapshot 再算一次
+                with self.m_lock:
+                    if self.m_data is data and not self.m_closed:
+                        self.m_wakeup.wait()
+                continue
+            PROFILER.count("hash.bytes", chunk.length)
+
+            with self.m_lock:
+                # 算的時候資料可能又被修改了：chunk 已經被換掉時丟掉結果
+                if i >= len(self.m_chunks) or self.m_chunks[i] is not chunk:
+                    continue
+                chunk.crc = crc
+                if prefix and self.m_valid == i:
+                    chunk.md5, chunk.sha256 = md5, sha256
+                    self.m_valid = i + 1
+
+    def __read__(self, data, start: int, end: int) -> bytes:
+        """ 讀取 data 的 [start, end)，讀完後通知 pause() """
+        try:
+            return data.read(start, end)
+        finally:
+            with self.m_lock:
+                self.m_busy = False
+                self.m_wakeup.notify_all()
+
+
+class RangeHash:
+    """
+    一段範圍的 CRC32 / MD5 / SHA-256（在背景計算）。
+    - getResult() : {名稱: 十六進位字串}，還沒算好時為 None
+    - progress()、isDone()、cancel()、wait()
+    """
+    # private members ####################
+    m_result: dict[str, str] | None
+    m_done: int
+    m_total: int
+    m_finished: threading.Event
+    m_cancel: threading.Event
+
+    def __init__(self, total: int):
+        self.m_result = None
+        self.m_done = 0
+        self.m_total = total
+        self.m_finished = threading.Event()
+        self.m_cancel = threading.Event()
+
+    def getResult(self) -> dict[str, str] | None:
+        return self.m_result
+
+    def progress(self) -> float:
+        return 1.0 if self.m_total == 0 else self.m_done / self.m_total
+
+    def isDone(self) -> bool:
+        return self.m_finished.is_set()
+
+    def cancel(self):
+        self.m_cancel.set()
+
+    def wait(self):
+        self.m_finished.wait()
+
+    def __run__(self, data, start: int, end: int):
+        try:
+            crc = 0
+            md5 = hashlib.md5()
+            sha256 = hashlib.sha256()
+            for pos in range(start, end, CHUNK_SIZE):
+                if self.m_cancel.is_set():
+                    return
+                block = data.read(pos, min(pos + CHUNK_SIZE, end))
+                crc = zlib.crc32(block, crc)
+                md5.update(block)
+                sha256.update(block)
+                self.m_done = pos + len(block) - start
+            self.m_result = {"crc32": f"{crc:08x}", "md5": md5.hexdigest(), "sha256": sha256.hexdigest()}
+        except (OSError, ValueError): # 檔案已經被關閉
+            pass
+        finally:
+            self.m_finished.set()
+
+
+def startRangeHash(data, start: int, end: int) -> RangeHash:
+    """ 在背景計算 data 中 [start, end) 的雜湊值（data 為唯讀複本，例如 PieceTable.snapshot()） """
+    job = RangeHash(end - start)
+    threading.Thread(target=job.__run__, args=(data, start, end), daemon=True).start()
+    return job
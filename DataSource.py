@@ -0,0 +1,64 @@
+"""
+提供了類別 MmapSource，以 mmap 唯讀地對應檔案，讓 BinTable 只在需要時讀取某一頁的資料
+"""
+import mmap
+
+
+class MmapSource:
+    """
+    以 mmap 將檔案唯讀地對應到記憶體。開檔只建立對應，不會讀取內容，因此所花的時間和檔案大小無關。
+    這是 PieceTable 的原始資料，本身不能修改（修改記錄在 PieceTable 中）。
+
+    存取：
+    - len(source)          : 資料長度
+    - source[i]            : 第 i 個 byte（int）
+    - source[a:b]          : [a, b) 範圍內的資料（bytes）
+    - iterChunks()         : 依序取得一段段的資料（存檔時使用，不需要一次讀入整個檔案）
+    - close()              : 關閉檔案
+    """
+    # private members ####################
+    m_path: str
+    m_file: object                 # 開啟的檔案
+    m_map: mmap.mmap | None        # 檔案的對應（空檔案無法 mmap，此時為 None）
+
+    def __init__(self, path: str):
+        self.m_path = path
+        self.m_file = open(path, 'rb')
+        try:
+            self.m_map = mmap.mmap(self.m_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # 空檔案
+            self.m_map = None
+
+    def __len__(self):
+        return 0 if self.m_map is None else len(self.m_map)
+
+    def __getitem__(self, key: int | slice):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("MmapSource - slice step is not supported")
+            if start >= stop:
+                return b''
+            return self.m_map[start:stop]
+
+        if key < 0:
+            key += len(self)
+        if not (0 <= key < len(self)):
+            raise IndexError("MmapSource - index out of range")
+        return self.m_map[key]
+
+    def getPath(self) -> str:
+        """ 對應的檔案路徑 """
+        return self.m_path
+
+    def iterChunks(self, chunk_size: int = 1 << 20):
+        """ 每次回傳 chunk_size 個 byte，直到資料結束 """
+        for start in range(0, len(self), chunk_size):
+            yield self[start : start + chunk_size]
+
+    def close(self):
+        """ 關閉對應和檔案 """
+        if self.m_map is not None:
+            self.m_map.close()
+            self.m_map = None
+        self.m_file.close()
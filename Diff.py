@@ -0,0 +1,241 @@
+"""
+比較兩份資料：在背景執行緒中一段段讀取，相同的部分整段跳過，不同的地方以取樣的 block 重新對齊，
+找出修改、插入和刪除的範圍。記憶體用量只和搜尋窗口的大小有關，和檔案大小無關。
+"""
+import threading
+from bisect import bisect_right
+
+from Search import SearchResult
+from Profiler import PROFILER
+
+CHUNK_SIZE = 1 << 20        # 相同的部分每次比較多少 byte
+WINDOW_SIZE = 4 << 20       # 不同的地方往後找多遠來重新對齊
+BLOCK_SIZE = 32             # 用來對齊的 block 大小
+MIN_MATCH = 64              # 對齊後至少要連續相同這麼多 byte 才算數（避免在填充的 0x00 / 0xFF 上對錯位置）
+
+REPLACE = "replace"         # 兩邊都有，但內容不同
+DELETE = "delete"           # 只有 A 有
+INSERT = "insert"           # 只有 B 有
+
+
+def _firstMismatch(a: bytes, b: bytes) -> int:
+    """ a、b 第一個不同的位置（一樣時回傳較短的長度），以二分法比較，每次比較都在 C 中完成 """
+    n = min(len(a), len(b))
+    if a[:n] == b[:n]:
+        return n
+    lo, hi = 0, n          # 不同的位置在 [lo, hi) 中
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    while a[lo] == b[lo]:
+        lo += 1
+    return lo
+
+
+def _probes(limit: int) -> list[int]:
+    """ 取樣的位置：0, BLOCK_SIZE, 2 * BLOCK_SIZE, 4 * BLOCK_SIZE ...（越遠越稀疏） """
+    probes = [0]
+    step = BLOCK_SIZE
+    while step < limit:
+        probes.append(step)
+        step *= 2
+    return probes
+
+
+class DiffResult:
+    """
+    比較 A、B 兩份資料的結果。比較在背景執行緒中進行，結果會一邊找一邊加入。
+
+    - len(result)            : 目前找到幾個不同的範圍
+    - getCounts()            : 每一種不同各有幾個
+    - getDiffs()             : [(種類, a_start, a_end, b_start, b_end), ...]
+    - getSideA() / getSideB(): 以 SearchResult 表示的、每一邊不同的範圍（可以直接交給 BinTable.setSearchResult()）
+    - mapAtoB() / mapBtoA()  : A 的某個位置對應到 B 的哪裡（同步捲動用）
+    - nextDiff() / prevDiff(): 某個位置之後 / 之前的下一個不同的範圍
+    - progress()、isDone()、cancel()、wait() : 和 SearchResult 相同
+    """
+    # private members ####################
+    m_lock: threading.Lock
+    m_kinds: list[str]
+    m_a_starts: list[int]
+    m_a_ends: list[int]
+    m_b_starts: list[int]
+    m_b_ends: list[int]
+    m_counts: dict[str, int]       # 每一種不同各有幾個
+    m_side_a: SearchResult
+    m_side_b: SearchResult
+    m_scanned: int                 # A 已經比較到哪裡
+    m_total: int
+    m_finished: threading.Event
+    m_cancel: threading.Event
+
+    def __init__(self, len_a: int, len_b: int):
+        self.m_lock = threading.Lock()
+        self.m_kinds = list()
+        self.m_a_starts = list()
+        self.m_a_ends = list()
+        self.m_b_starts = list()
+        self.m_b_ends = list()
+        self.m_counts = {REPLACE: 0, DELETE: 0, INSERT: 0}
+        self.m_side_a = SearchResult(len_a)
+        self.m_side_b = SearchResult(len_b)
+        self.m_scanned = 0
+        self.m_total = len_a
+        self.m_finished = threading.Event()
+        self.m_cancel = threading.Event()
+
+    def __len__(self):
+        return len(self.m_kinds)
+
+    def getDiffs(self) -> list[tuple[str, int, int, int, int]]:
+        with self.m_lock:
+            return list(zip(self.m_kinds, self.m_a_starts, self.m_a_ends, self.m_b_starts, self.m_b_ends))
+
+    def getCounts(self) -> dict[str, int]:
+        """ 每一種不同（REPLACE、DELETE、INSERT）各有幾個 """
+        return dict(self.m_counts)
+
+    def getSideA(self) -> SearchResult:
+        return self.m_side_a
+
+    def getSideB(self) -> SearchResult:
+        return self.m_side_b
+
+    def progress(self) -> float:
+        return 1.0 if self.m_total == 0 else self.m_scanned / self.m_total
+
+    def isDone(self) -> bool:
+        return self.m_finished.is_set()
+
+    def cancel(self):
+        self.m_cancel.set()
+
+    def wait(self):
+        self.m_finished.wait()
+
+    # 對應 ############################################################################################
+    def mapAtoB(self, a: int) -> int:
+        """ A 的位置 a 對應到 B 的位置（在不同的範圍中時，對應到 B 那一邊範圍中的相同位置，超出時截到結尾） """
+        return self.__map__(a, self.m_a_starts, self.m_a_ends, self.m_b_starts, self.m_b_ends)
+
+    def mapBtoA(self, b: int) -> int:
+        return self.__map__(b, self.m_b_starts, self.m_b_ends, self.m_a_starts, self.m_a_ends)
+
+    def __map__(self, pos: int, src_starts: list, src_ends: list, dst_starts: list, dst_ends: list) -> int:
+        with self.m_lock:
+            i = bisect_right(src_starts, pos) - 1
+            if i < 0:
+                return pos
+            if pos >= src_ends[i]: # 在第 i 個範圍之後的相同部分
+                return dst_ends[i] + pos - src_ends[i]
+            return dst_starts[i] + min(pos - src_starts[i], max(dst_ends[i] - dst_starts[i] - 1, 0))
+
+    def nextDiff(self, a: int) -> tuple[str, int, int, int, int] | None:
+        """ A 中起點在 a 之後（不包含 a）的第一個不同的範圍 """
+        with self.m_lock:
+            i = bisect_right(self.m_a_starts, a)
+            if i < len(self.m_kinds):
+                return self.m_kinds[i], self.m_a_starts[i], self.m_a_ends[i], self.m_b_starts[i], self.m_b_ends[i]
+            return None
+
+    def prevDiff(self, a: int) -> tuple[str, int, int, int, int] | None:
+        """ A 中起點在 a 之前（不包含 a）的最後一個不同的範圍 """
+        with self.m_lock:
+            i = bisect_right(self.m_a_starts, a - 1) - 1
+            if i >= 0:
+                return self.m_kinds[i], self.m_a_starts[i], self.m_a_ends[i], self.m_b_starts[i], self.m_b_ends[i]
+            return None
+
+    # 比較（背景執行緒） ##################################################################################
+    def __append_diff__(self, a_start: int, a_end: int, b_start: int, b_end: int):
+        kind = DELETE if b_start == b_end else INSERT if a_start == a_end else REPLACE
+        with self.m_lock:
+            self.m_kinds.append(kind)
+            self.m_a_starts.append(a_start)
+            self.m_a_ends.append(a_end)
+            self.m_b_starts.append(b_start)
+            self.m_b_ends.append(b_end)
+            self.m_counts[kind] += 1
+        # 插入 / 刪除在另一邊沒有範圍
+        if a_start < a_end:
+            self.m_side_a.__append_hit__(a_start, a_end)
+        if b_start < b_end:
+            self.m_side_b.__append_hit__(b_start, b_end)
+
+    def __run__(self, data_a, data_b):
+        try:
+            a, b = 0, 0
+            len_a, len_b = len(data_a), len(data_b)
+            while a < len_a and b < len_b:
+                if self.m_cancel.is_set():
+                    break
+                # 相同的部分整段跳過
+                with PROFILER.timer("diff.chunk"):
+                    same = _firstMismatch(data_a[a : a + CHUNK_SIZE], data_b[b : b + CHUNK_SIZE])
+                a, b = a + same, b + same
+                PROFILER.count("diff.bytes", same)
+                if same < CHUNK_SIZE and a < len_a and b < len_b:
+                    with PROFILER.timer("diff.align"):
+                        new_a, new_b = self.__align__(data_a, data_b, a, b)
+                    self.__append_diff__(a, new_a, b, new_b)
+                    a, b = new_a, new_b
+                self.m_scanned = a
+            # 其中一邊先結束，另一邊剩下的部分
+            if not self.m_cancel.is_set() and (a < len_a or b < len_b):
+                self.__append_diff__(a, len_a, b, len_b)
+                self.m_scanned = len_a
+        finally:
+            complete = not self.m_cancel.is_set()
+            for side in (self.m_side_a, self.m_side_b):
+                side.m_scanned = side.m_total if complete else 0
+                side.m_complete = complete
+                side.m_finished.set()
+            self.m_finished.set()
+
+    def __align__(self, data_a, data_b, a: int, b: int) -> tuple[int, int]:
+        """
+        A[a]、B[b] 不同，找出之後兩邊重新相同的位置 (new_a, new_b)。
+        從兩邊各取樣幾個 block，到另一邊的窗口中找，選擇跳過最少 byte 的結果；窗口中都找不到時整個窗口都算不同
+        """
+        win_a = data_a[a : a + WINDOW_SIZE]
+        win_b = data_b[b : b + WINDOW_SIZE]
+        best = None
+        for src, dst, swap in ((win_a, win_b, False), (win_b, win_a, True)):
+            for k in _probes(len(src) - BLOCK_SIZE + 1):
+                if best is not None and k >= sum(best):
+                    break
+                block = src[k : k + BLOCK_SIZE]
+                j = dst.find(block)
+                while j >= 0 and (best is None or k + j < sum(best)):
+                    i_a, i_b = (j, k) if swap else (k, j)
+                    if self.__matches__(win_a, win_b, i_a, i_b):
+                        best = (i_a, i_b)
+                        break
+                    j = dst.find(block, j + 1)
+        if best is None:
+            return a + len(win_a), b + len(win_b)
+
+        # 往回找相同部分真正的開頭
+        i_a, i_b = best
+        while i_a > 0 and i_b > 0 and win_a[i_a - 1] == win_b[i_b - 1]:
+            i_a -= 1
+            i_b -= 1
+        return a + i_a, b + i_b
+
+    @staticmethod
+    def __matches__(win_a: bytes, win_b: bytes, i_a: int, i_b: int) -> bool:
+        """ 從 (i_a, i_b) 開始是否至少有 MIN_MATCH 個相同的 byte（到資料結尾也算） """
+        n = min(MIN_MATCH, len(win_a) - i_a, len(win_b) - i_b)
+        return win_a[i_a : i_a + n] == win_b[i_b : i_b + n]
+
+
+def startDiff(data_a, data_b) -> DiffResult:
+    """
+    在背景執行緒中比較 data_a、data_b（需支援 len() 和切片，且在比較時不能被修改，例如 PieceTable.snapshot()）
+    """
+    result = DiffResult(len(data_a), len(data_b))
+    threading.Thread(target=result.__run__, args=(data_a, data_b), daemon=True).start()
+    return result
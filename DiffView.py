@@ -0,0 +1,136 @@
+"""
+提供了視窗 DiffView：左右並排比較兩個檔案，兩邊同步捲動，並標記不同的部分
+"""
+import os
+import tkinter as tk
+
+from BinTable import BinTable
+from BinaryBuffer import BinaryBuffer
+from PageCache import PageCache
+from Diff import DiffResult, startDiff
+
+
+class DiffView(tk.Toplevel):
+    """
+    比較 path_a、path_b 兩個檔案。比較在背景進行（見 Diff.startDiff()），找到的不同之處會陸續標記在兩邊的表格上。
+
+    - 捲動其中一邊時，另一邊跳到對應的位置（插入 / 刪除之後的位置也會對齊）
+    - Next / Previous Difference 跳到下一個 / 上一個不同的地方，並在兩邊選取它
+    - 比較的是開啟時的內容，之後在表格上的修改不會重新比較
+    - 兩個表格共用同一個 PageCache（可以由呼叫者傳入，和其他視窗共用），關閉視窗時取消比較並關閉檔案
+    """
+    # private members ####################
+    m_buffers: list[BinaryBuffer]
+    m_tables: list[BinTable]
+    m_page_cache: PageCache
+    m_result: DiffResult
+    m_status: tk.Label
+    m_syncing: bool                    # 正在讓另一邊跟著換頁（避免兩邊互相觸發）
+
+    def __init__(self, parent: tk.Misc, path_a: str, path_b: str, size: int = 16, page_cache: PageCache | None = None):
+        """ 開檔失敗時會丟出 OSError / ValueError（視窗不會被建立） """
+        buffer_a = BinaryBuffer.open(path_a)
+        try:
+            buffer_b = BinaryBuffer.open(path_b)
+        except (OSError, ValueError):
+            buffer_a.close()
+            raise
+
+        tk.Toplevel.__init__(self, parent)
+        self.title(f"Compare {os.path.basename(path_a)} / {os.path.basename(path_b)}")
+        self.m_buffers = [buffer_a, buffer_b]
+        self.m_syncing = False
+
+        # 按鈕和狀態 ###################################################################################
+        bar = tk.Frame(self)
+        bar.pack(side=tk.BOTTOM, fill=tk.X)
+        tk.Button(bar, text="Previous Difference", command=lambda: self.gotoDiff(forward=False)).pack(side=tk.LEFT)
+        tk.Button(bar, text="Next Difference", command=lambda: self.gotoDiff(forward=True)).pack(side=tk.RIGHT)
+        self.m_status = tk.Label(bar)
+        self.m_status.pack(side=tk.BOTTOM)
+
+        # 兩個表格 ####################################################################################
+        cache = PageCache() if page_cache is None else page_cache
+        self.m_page_cache = cache
+        self.m_tables = list()
+        for col, (path, buffer) in enumerate(zip((path_a, path_b), self.m_buffers)):
+            frame = tk.LabelFrame(self, text=path)
+            frame.pack(side=tk.LEFT, expand=True, fill=tk.BOTH)
+            table = BinTable(frame, size=size, page_cache=cache)
+            table.pack(expand=True, fill=tk.BOTH)
+            table.setData(buffer)
+            table.bind("<<PageChanged>>", lambda e, side=col: self.__sync_page__(side))
+            self.m_tables.append(table)
+
+        self.bind("<F3>", lambda e: self.gotoDiff(forward=True))
+        self.bind("<Shift-F3>", lambda e: self.gotoDiff(forward=False))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.m_result = startDiff(buffer_a.snapshot(), buffer_b.snapshot())
+        self.m_tables[0].setSearchResult(self.m_result.getSideA())
+        self.m_tables[1].setSearchResult(self.m_result.getSideB())
+        self.__poll__()
+
+    def getResult(self) -> DiffResult:
+        return self.m_result
+
+    def close(self):
+        """ 取消比較、關閉檔案並關閉視窗 """
+        self.m_result.cancel()
+        self.m_result.wait()
+        self.destroy()
+        for buffer in self.m_buffers:
+            self.m_page_cache.discard(buffer.getVersion())
+            buffer.close()
+
+    def gotoDiff(self, forward: bool = True):
+        """ 跳到左邊選取位置（沒有選取時為這一頁的開頭）之後 / 之前的下一個不同的地方 """
+        table_a, table_b = self.m_tables
+        R = table_a.getSelection()
+        pos = R[0] if R is not None else table_a.getPageNum() * table_a.getPageLen() - (1 if forward else 0)
+        diff = self.m_result.nextDiff(pos) if forward else self.m_result.prevDiff(pos)
+        if diff is None:
+            self.bell()
+            return
+        kind, a_start, a_end, b_start, b_end = diff
+        self.m_syncing = True
+        try:
+            for table, start, end in ((table_a, a_start, a_end), (table_b, b_start, b_end)):
+                if start < table.getDataSize():
+                    table.gotoOffset(start)
+                    # 插入 / 刪除在這一邊沒有範圍，只選取所在位置的那一格
+                    table.select(start, max(end, start + 1) - 1)
+        finally:
+            self.m_syncing = False
+        self.m_status.configure(text=f"{self.__status_text__()}  |  {kind} A[{a_start:#x}, {a_end:#x}) B[{b_start:#x}, {b_end:#x})")
+
+    def __sync_page__(self, side: int):
+        """ 第 side 邊換頁了，讓另一邊跳到對應的頁面 """
+        if self.m_syncing or len(self.m_tables) < 2:
+            return
+        src, dst = self.m_tables[side], self.m_tables[1 - side]
+        start = src.getPageNum() * src.getPageLen()
+        offset = self.m_result.mapAtoB(start) if side == 0 else self.m_result.mapBtoA(start)
+        self.m_syncing = True
+        try:
+            dst.gotoPage(offset // dst.getPageLen())
+        finally:
+            self.m_syncing = False
+
+    def __status_text__(self) -> str:
+        result = self.m_result
+        if result.isDone():
+            summary = ", ".join(f"{n} {kind}" for kind, n in result.getCounts().items())
+            return f"{len(result)} differences ({summary})" if len(result) else "Files are identical"
+        return f"Comparing {result.progress():.0%} ({len(result)} differences)"
+
+    def __poll__(self):
+        """ 定期顯示新找到的不同之處和進度，直到比較結束 """
+        if not self.winfo_exists():
+            return
+        done = self.m_result.isDone() # 先檢查，結束前最後找到的部分也會被畫出來
+        for table in self.m_tables:
+            table.refreshSearch()
+        self.m_status.configure(text=self.__status_text__())
+        if not done:
+            self.after(100, self.__poll__)
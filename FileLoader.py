@@ -0,0 +1,100 @@
+"""
+提供了類別 FileLoader，在背景執行緒中開啟檔案，避免慢速的磁碟或網路路徑卡住視窗
+"""
+import threading
+
+from BinaryBuffer import BinaryBuffer
+from Profiler import PROFILER
+
+PRELOAD_CHUNK_SIZE = 4 << 20
+
+
+class FileLoader:
+    """
+    在背景開啟檔案：
+    1. 開啟並 mmap 檔案，讀取開頭的 first_bytes 個 byte（第一頁），完成後 isReady() 為 True，可以先顯示
+    2. 接著依序讀過整個檔案，讓之後換頁時資料已經在作業系統的快取中（可以用 progress() 取得進度）
+
+    - isReady() / takeBuffer(): 第一頁是否已經可以顯示 / 取得開啟的 BinaryBuffer（之後由呼叫者負責關閉）
+    - getError()              : 開檔失敗時的例外
+    - progress()              : 預先讀取的進度（0 ~ 1）
+    - isDone()                : 背景工作是否已經結束
+    - cancel()                : 取消。還沒呼叫 takeBuffer() 時會關閉這個檔案，否則只停止預先讀取
+    - wait()                  : 等待背景工作結束（關閉或覆蓋檔案前要先呼叫）
+    """
+    # private members ####################
+    m_path: str
+    m_buffer: BinaryBuffer | None
+    m_taken: bool                  # 呼叫者已經取走 m_buffer
+    m_error: Exception | None
+    m_loaded: int
+    m_total: int
+    m_ready: threading.Event
+    m_cancel: threading.Event
+    m_finished: threading.Event
+
+    def __init__(self, path: str, first_bytes: int):
+        self.m_path = path
+        self.m_buffer = None
+        self.m_taken = False
+        self.m_error = None
+        self.m_loaded = 0
+        self.m_total = 0
+        self.m_ready = threading.Event()
+        self.m_cancel = threading.Event()
+        self.m_finished = threading.Event()
+        threading.Thread(target=self.__load__, args=(first_bytes,), daemon=True).start()
+
+    def __load__(self, first_bytes: int):
+        try:
+            with PROFILER.timer("loader.open"):
+                buffer = BinaryBuffer.open(self.m_path)
+                buffer.read(0, first_bytes)
+            self.m_total = len(buffer)
+            self.m_buffer = buffer
+            self.m_ready.set()
+
+            # 預先讀取剩下的部分（讀的是複本，不受之後的修改影響）
+            data = buffer.snapshot()
+            for start in range(0, len(data), PRELOAD_CHUNK_SIZE):
+                if self.m_cancel.is_set():
+                    break
+                with PROFILER.timer("loader.preload_chunk"):
+                    data.read(start, start + PRELOAD_CHUNK_SIZE)
+                self.m_loaded = min(start + PRELOAD_CHUNK_SIZE, len(data))
+        except (OSError, ValueError) as e:
+            self.m_error = e
+        finally:
+            # 被取消且沒有人取走，就關掉（cancel() 和 takeBuffer() 都在主執行緒呼叫，不會同時發生）
+            if self.m_cancel.is_set() and not self.m_taken and self.m_buffer is not None:
+                self.m_buffer.close()
+                self.m_buffer = None
+            self.m_finished.set()
+
+    def getPath(self) -> str:
+        return self.m_path
+
+    def isReady(self) -> bool:
+        return self.m_ready.is_set()
+
+    def takeBuffer(self) -> BinaryBuffer | None:
+        """ 取得開啟的檔案，之後由呼叫者負責關閉 """
+        if self.m_cancel.is_set() or not self.isReady():
+            return None
+        self.m_taken = True
+        return self.m_buffer
+
+    def getError(self) -> Exception | None:
+        return self.m_error
+
+    def progress(self) -> float:
+        return 1.0 if self.m_total == 0 else self.m_loaded / self.m_total
+
+    def isDone(self) -> bool:
+        return self.m_finished.is_set()
+
+    def cancel(self):
+        self.m_cancel.set()
+
+    def wait(self):
+        self.m_finished.wait()
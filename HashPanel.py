@@ -0,0 +1,103 @@
+"""
+提供了視窗 HashPanel：顯示整個檔案和選取範圍的 CRC32 / MD5 / SHA-256
+"""
+import tkinter as tk
+
+from BinTable import BinTable
+from Checksum import HASH_NAMES, RangeHash, startRangeHash
+
+POLL_INTERVAL = 200   # 多久更新一次（ms）
+
+
+class HashPanel(tk.Toplevel):
+    """
+    整個檔案的雜湊值由 BinaryBuffer.hashIndex() 在背景計算，修改後只重新計算受影響的部分；
+    選取範圍的雜湊值在選取改變（或資料被修改）後在背景重新計算。
+    數值顯示在唯讀的輸入框中，可以直接選取複製。
+    """
+    # private members ####################
+    m_table: BinTable
+    m_get_buffer: object               # 回傳目前的 BinaryBuffer（沒有開檔時為 None）
+    m_file_vars: dict[str, tk.StringVar]
+    m_sel_vars: dict[str, tk.StringVar]
+    m_sel_label: tk.Label
+    m_sel_job: RangeHash | None        # 選取範圍的計算
+    m_sel_key: tuple | None            # m_sel_job 對應的 (buffer, 版本, 選取範圍)
+
+    def __init__(self, parent: tk.Misc, table: BinTable, get_buffer):
+        """ get_buffer() 回傳目前開啟的 BinaryBuffer（不能用 table.getBuffer()，它會結束正在進行的編輯） """
+        tk.Toplevel.__init__(self, parent)
+        self.title("Hashes")
+        self.m_table = table
+        self.m_get_buffer = get_buffer
+        self.m_sel_job = None
+        self.m_sel_key = None
+
+        tk.Label(self, text="File", font="TkHeadingFont").grid(row=0, column=0, columnspan=2, sticky=tk.W)
+        self.m_file_vars = self.__add_rows__(1)
+        self.m_sel_label = tk.Label(self, text="Selection", font="TkHeadingFont")
+        self.m_sel_label.grid(row=1 + len(HASH_NAMES), column=0, columnspan=2, sticky=tk.W)
+        self.m_sel_vars = self.__add_rows__(2 + len(HASH_NAMES))
+        self.columnconfigure(1, weight=1)
+
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.__poll__()
+
+    def __add_rows__(self, first_row: int) -> dict[str, tk.StringVar]:
+        variables = dict()
+        for i, name in enumerate(HASH_NAMES):
+            tk.Label(self, text=name.upper()).grid(row=first_row + i, column=0, sticky=tk.W, padx=(12, 4))
+            var = tk.StringVar(self)
+            tk.Entry(self, textvariable=var, state="readonly", width=66, font="TkFixedFont").grid(
+                row=first_row + i, column=1, sticky=(tk.W, tk.E))
+            variables[name] = var
+        return variables
+
+    def close(self):
+        if self.m_sel_job is not None:
+            self.m_sel_job.cancel()
+        self.destroy()
+
+    def __poll__(self):
+        if not self.winfo_exists():
+            return
+        buffer = self.m_get_buffer()
+        self.__update_file__(buffer)
+        self.__update_selection__(buffer)
+        self.after(POLL_INTERVAL, self.__poll__)
+
+    def __update_file__(self, buffer):
+        if buffer is None:
+            for var in self.m_file_vars.values():
+                var.set("")
+            return
+        index = buffer.hashIndex()
+        crc = index.crc32()
+        pending = f"computing {index.progress():.0%}..."
+        self.m_file_vars["crc32"].set("computing..." if crc is None else f"{crc:08x}")
+        self.m_file_vars["md5"].set(index.md5() or pending)
+        self.m_file_vars["sha256"].set(index.sha256() or pending)
+
+    def __update_selection__(self, buffer):
+        R = self.m_table.getSelection() if buffer is not None else None
+        if R is not None:
+            R = (R[0], min(R[1] + 1, len(buffer)))
+        key = None if R is None or R[0] >= R[1] else (id(buffer), buffer.getVersion(), R)
+        if key != self.m_sel_key:
+            # 選取範圍或資料改變了，重新計算
+            if self.m_sel_job is not None:
+                self.m_sel_job.cancel()
+            self.m_sel_key = key
+            self.m_sel_job = None if key is None else startRangeHash(buffer.snapshot(), *R)
+
+        job = self.m_sel_job
+        if job is None:
+            self.m_sel_label.configure(text="Selection (none)")
+            for var in self.m_sel_vars.values():
+                var.set("")
+            return
+        start, end = key[2]
+        self.m_sel_label.configure(text=f"Selection [{start:#x}, {end:#x})  {end - start} bytes")
+        result = job.getResult()
+        for name, var in self.m_sel_vars.items():
+            var.set(result[name] if result is not None else f"computing {job.progress():.0%}...")
@@ -0,0 +1,138 @@
+"""
+提供了類別 IntervalSet，以排序過的區間記錄一群 index（例如被標記的資料）
+"""
+from bisect import bisect_left, bisect_right
+
+
+class IntervalSet:
+    """
+    以互不重疊、由小到大排列的區間 [start, end) 記錄一群 index，記憶體用量只和區間數量有關。
+    相鄰或重疊的區間會自動合併。
+
+    修改：
+    - add()        : 加入 [start, end)
+    - remove()     : 移除 [start, end)
+    - clear()      : 全部移除
+    - shift()      : 在某個位置插入或刪除資料後，平移後面的區間
+
+    存取：
+    - idx in s     : O(log n) 確認 idx 有沒有在某個區間內
+    - len(s)       : 有幾個區間
+    - countTouching() : O(log n) 計算和 [start, end) 重疊或相鄰的區間數
+    - query()      : 和 [start, end) 重疊的區間
+    - upperBound() : 最後一個區間的終點（沒有區間時為 0）
+    """
+    # private members ####################
+    m_starts: list[int]    # 每個區間的起點（由小到大）
+    m_ends: list[int]      # 每個區間的終點（不包含）
+
+    def __init__(self):
+        self.m_starts = list()
+        self.m_ends = list()
+
+    def __sanity_check__(self):
+        """ 檢查區間是否排序好且互不相鄰 """
+        assert len(self.m_starts) == len(self.m_ends)
+        for i in range(len(self.m_starts)):
+            assert self.m_starts[i] < self.m_ends[i]
+            if i > 0:
+                assert self.m_ends[i - 1] < self.m_starts[i]
+
+    def __contains__(self, idx: int) -> bool:
+        i = bisect_right(self.m_starts, idx) - 1
+        return i >= 0 and idx < self.m_ends[i]
+
+    def __len__(self):
+        return len(self.m_starts)
+
+    def __bool__(self):
+        return len(self.m_starts) > 0
+
+    def __iter__(self):
+        """ 依序回傳每個區間 (start, end) """
+        return zip(self.m_starts, self.m_ends)
+
+    # 修改 ############################################################################################
+    def add(self, start: int, end: int):
+        """ 加入 [start, end) """
+        if start >= end:
+            return
+        # 和 [start, end) 重疊或相鄰的區間是 m_starts[lo:hi]
+        lo = bisect_left(self.m_ends, start)
+        hi = bisect_right(self.m_starts, end)
+        if lo < hi:
+            start = min(start, self.m_starts[lo])
+            end = max(end, self.m_ends[hi - 1])
+        self.m_starts[lo:hi] = [start]
+        self.m_ends[lo:hi] = [end]
+
+    def remove(self, start: int, end: int):
+        """ 移除 [start, end) """
+        if start >= end:
+            return
+        # 和 [start, end) 重疊的區間是 m_starts[lo:hi]
+        lo = bisect_right(self.m_ends, start)
+        hi = bisect_left(self.m_starts, end)
+        if lo >= hi:
+            return
+
+        # 保留頭尾超出範圍的部分
+        new_starts, new_ends = list(), list()
+        if self.m_starts[lo] < start:
+            new_starts.append(self.m_starts[lo])
+            new_ends.append(start)
+        if self.m_ends[hi - 1] > end:
+            new_starts.append(end)
+            new_ends.append(self.m_ends[hi - 1])
+        self.m_starts[lo:hi] = new_starts
+        self.m_ends[lo:hi] = new_ends
+
+    def clear(self):
+        """ 全部移除 """
+        self.m_starts.clear()
+        self.m_ends.clear()
+
+    def shift(self, pos: int, delta: int):
+        """
+        在 pos 插入 delta 個（delta > 0）或刪除 -delta 個（delta < 0）index 後，平移 pos 之後的區間。
+        插入的部分不會被加入；跨過 pos 的區間會被切成兩段
+        """
+        if delta == 0:
+            return
+        if delta < 0:
+            self.remove(pos, pos - delta)
+            moved_from = pos - delta
+        else:
+            # 切開跨過 pos 的區間
+            i = bisect_right(self.m_starts, pos) - 1
+            if i >= 0 and self.m_starts[i] < pos < self.m_ends[i]:
+                self.m_starts.insert(i + 1, pos)
+                self.m_ends.insert(i + 1, self.m_ends[i])
+                self.m_ends[i] = pos
+            moved_from = pos
+
+        i = bisect_left(self.m_starts, moved_from)
+        for j in range(i, len(self.m_starts)):
+            self.m_starts[j] += delta
+            self.m_ends[j] += delta
+
+        # 刪除後，前後兩個區間可能接在一起
+        if delta < 0 and 0 < i < len(self.m_starts) and self.m_ends[i - 1] == self.m_starts[i]:
+            self.m_ends[i - 1] = self.m_ends[i]
+            del self.m_starts[i]
+            del self.m_ends[i]
+
+    # 存取 ############################################################################################
+    def query(self, start: int, end: int) -> list[tuple[int, int]]:
+        """ 回傳和 [start, end) 重疊的區間，並截到 [start, end) 的範圍內 """
+        lo = bisect_right(self.m_ends, start)
+        hi = bisect_left(self.m_starts, end)
+        return [(max(self.m_starts[i], start), min(self.m_ends[i], end)) for i in range(lo, hi)]
+
+    def countTouching(self, start: int, end: int) -> int:
+        """ 和 [start, end) 重疊或相鄰（加入 [start, end) 時會被合併）的區間數 """
+        return max(bisect_right(self.m_starts, end) - bisect_left(self.m_ends, start), 0)
+
+    def upperBound(self) -> int:
+        """ 最後一個區間的終點，沒有區間時為 0 """
+        return self.m_ends[-1] if self.m_ends else 0
@@ -0,0 +1,139 @@
+"""
+提供了 Minimap：整個檔案的縮圖，顯示每個位置的 entropy 和 byte 分布，點擊後跳到那一頁
+"""
+import tkinter as tk
+
+from BinTable import BinTable
+
+POLL_INTERVAL = 250          # 多久檢查一次統計有沒有更新（ms）
+ENTROPY_WIDTH = 14           # 左半邊：entropy
+CLASS_WIDTH = 14             # 右半邊：各類 byte 的比例
+PENDING_COLOR = "#808080"    # 還沒算好的部分
+
+# entropy（0 ~ 8）對應的顏色：低（重複的資料）為深藍，中間（程式碼、文字）為綠 / 黃，接近 8（壓縮、加密）為紅
+ENTROPY_STOPS = [(0.0, (16, 16, 64)), (4.4, (32, 160, 96)), (6.8, (224, 192, 32)), (8.0, (224, 32, 32))]
+# 右半邊由左到右：0x00、可印出的 ASCII、0x80 以上、其他
+CLASS_COLORS = ("#000000", "#40C040", "#E08020", "#A0A0A0")
+
+
+def _entropyColor(entropy: float) -> str:
+    for (x0, c0), (x1, c1) in zip(ENTROPY_STOPS, ENTROPY_STOPS[1:]):
+        if entropy <= x1:
+            t = max(entropy - x0, 0) / (x1 - x0)
+            return "#%02x%02x%02x" % tuple(round(a + (b - a) * t) for a, b in zip(c0, c1))
+    return "#%02x%02x%02x" % ENTROPY_STOPS[-1][1]
+
+
+class Minimap(tk.Canvas):
+    """
+    垂直的縮圖，由上到下對應整個檔案。統計由 BinaryBuffer.statsIndex() 在背景計算，
+    算好新的部分或資料被修改時才重畫（畫在一張 PhotoImage 上，每個 pixel 列合併它涵蓋的塊：entropy 取最大值，比例取平均）。
+    方框為目前的頁面；點擊或拖曳時跳到那個位置。隱藏時不會更新（也不會開始計算統計）。
+    """
+    # private members ####################
+    m_table: BinTable
+    m_get_buffer: object               # 回傳目前的 BinaryBuffer（沒有開檔時為 None）
+    m_image: tk.PhotoImage
+    m_image_item: int
+    m_marker: int                      # 目前頁面的方框
+    m_drawn: tuple | None              # 上次畫的 (統計, 統計的變化次數, 高度)
+
+    def __init__(self, parent: tk.Misc, table: BinTable, get_buffer):
+        """ get_buffer() 回傳目前開啟的 BinaryBuffer（不能用 table.getBuffer()，它會結束正在進行的編輯） """
+        tk.Canvas.__init__(self, parent, width=ENTROPY_WIDTH + CLASS_WIDTH, highlightthickness=0, background=PENDING_COLOR)
+        self.m_table = table
+        self.m_get_buffer = get_buffer
+        self.m_image = tk.PhotoImage(master=self, width=1, height=1)
+        self.m_image_item = self.create_image(0, 0, image=self.m_image, anchor=tk.NW)
+        self.m_marker = self.create_rectangle(0, 0, 0, 0, outline="white", width=2)
+        self.m_drawn = None
+
+        self.bind("<Button-1>", self.__on_click__)
+        self.bind("<B1-Motion>", self.__on_click__)
+        self.bind("<Configure>", lambda e: self.refresh())
+        table.bind("<<PageChanged>>", lambda e: self.__update_marker__(), add="+")
+        self.__poll__()
+
+    def refresh(self):
+        """ 需要時重畫縮圖，並更新方框的位置 """
+        buffer = self.m_get_buffer()
+        height = self.winfo_height()
+        if buffer is None or len(buffer) == 0 or height <= 1:
+            self.m_drawn = None
+            self.itemconfigure(self.m_image_item, state=tk.HIDDEN)
+            self.coords(self.m_marker, 0, 0, 0, 0)
+            return
+        index = buffer.statsIndex()
+        key = (index, index.getChanges(), height)
+        if key != self.m_drawn:
+            self.__draw__(index, len(buffer), height)
+            self.m_drawn = key
+        self.__update_marker__()
+
+    def __poll__(self):
+        if not self.winfo_exists():
+            return
+        if self.winfo_ismapped(): # 隱藏時不需要統計
+            self.refresh()
+        self.after(POLL_INTERVAL, self.__poll__)
+
+    def __draw__(self, index, total: int, height: int):
+        """ 每個 pixel 列合併它涵蓋的塊，整張圖以一次 put() 畫完 """
+        blocks = index.blocks()
+        rows = list()
+        i = 0
+        for y in range(height):
+            row_start, row_end = total * y // height, max(total * (y + 1) // height, total * y // height + 1)
+            while i + 1 < len(blocks) and blocks[i][0] + blocks[i][1] <= row_start:
+                i += 1
+            # 這一列涵蓋的塊為 blocks[i:j]
+            j = i
+            covered = list()
+            while j < len(blocks) and blocks[j][0] < row_end:
+                covered.append(blocks[j][2])
+                j += 1
+            rows.append(self.__row_colors__(covered))
+
+        self.m_image = tk.PhotoImage(master=self, width=ENTROPY_WIDTH + CLASS_WIDTH, height=height)
+        self.m_image.put(" ".join("{" + " ".join(row) + "}" for row in rows))
+        self.itemconfigure(self.m_image_item, image=self.m_image, state=tk.NORMAL)
+        self.tag_raise(self.m_marker)
+
+    @staticmethod
+    def __row_colors__(covered: list) -> list[str]:
+        """ 一個 pixel 列的顏色 """
+        if not covered or any(stats is None for stats in covered):
+            return [PENDING_COLOR] * (ENTROPY_WIDTH + CLASS_WIDTH)
+        n = len(covered)
+        entropy = max(stats.entropy for stats in covered)
+        zero = sum(stats.zero for stats in covered) / n
+        ascii = sum(stats.ascii for stats in covered) / n
+        high = sum(stats.high for stats in covered) / n
+
+        colors = [_entropyColor(entropy)] * ENTROPY_WIDTH
+        # 依比例分配右半邊的 pixel（累計後再取整，總寬度不變）
+        edges = [round(x * CLASS_WIDTH) for x in (0, zero, zero + ascii, zero + ascii + high, 1)]
+        for color, a, b in zip(CLASS_COLORS, edges, edges[1:]):
+            colors += [color] * max(b - a, 0)
+        return colors[: ENTROPY_WIDTH + CLASS_WIDTH]
+
+    def __update_marker__(self):
+        """ 方框移到目前的頁面 """
+        total = self.m_table.getDataSize()
+        height = self.winfo_height()
+        if total == 0 or self.m_drawn is None:
+            return
+        page_len = self.m_table.getPageLen()
+        start = self.m_table.getPageNum() * page_len
+        y0 = start * height / total
+        y1 = max(min(start + page_len, total) * height / total, y0 + 3)
+        self.coords(self.m_marker, 1, y0, ENTROPY_WIDTH + CLASS_WIDTH - 1, y1)
+
+    def __on_click__(self, event):
+        """ 跳到點擊的位置（拖曳時只畫最後一個位置） """
+        total = self.m_table.getDataSize()
+        height = self.winfo_height()
+        if total == 0 or height <= 0:
+            return
+        offset = min(max(event.y, 0) * total // height, total - 1)
+        self.m_table.requestPage(offset // self.m_table.getPageLen())
@@ -0,0 +1,143 @@
+"""
+提供了類別 PageCache：快取已經讀好、轉成字串的頁面，並在背景預先準備接下來會看到的頁面
+"""
+import threading
+from collections import OrderedDict
+
+from ByteNumStr import ByteNumStr
+from Profiler import PROFILER
+
+DEFAULT_MAX_BYTES = 32 << 20   # 預設最多使用多少記憶體
+PAGE_OVERHEAD = 256            # 每頁額外估算的記憶體
+
+
+class PageModel:
+    """ 一頁的內容：資料和每個 byte 轉成的字串 """
+    __slots__ = ("data", "text", "cost")
+
+    def __init__(self, data: bytes, text: list[str]):
+        self.data = data
+        self.text = text
+        # 字串來自 ByteNumStr 的轉換表，是共用的，list 中只有參考（每個 8 byte）
+        self.cost = len(data) * 9 + PAGE_OVERHEAD
+
+
+class PageCache:
+    """
+    以 LRU 淘汰的頁面快取，總量不超過 max_bytes。可以由多個 BinTable 共用。
+
+    key 為 (資料的版本, 頁面開頭, 頁面長度, base)，資料的版本來自 BinaryBuffer.getVersion()，
+    資料被修改後版本就不同，舊的頁面不會再被用到，之後自然會被淘汰。
+
+    - get() / put()     : 取得 / 放入一頁
+    - prefetch()        : 在背景準備一些頁面（取代之前還沒做的要求）
+    - setMaxBytes()     : 改變記憶體上限
+    - discard()         : 丟掉某個版本的頁面
+    - clear()
+    """
+    # private members ####################
+    m_lock: threading.Lock
+    m_pages: OrderedDict               # key -> PageModel，最後面是最近用到的
+    m_bytes: int
+    m_max_bytes: int
+    m_wakeup: threading.Condition      # 有新的預先讀取要求
+    m_requests: list                   # 等待預先讀取的 (key, snapshot)，先放入的先做
+    m_thread: threading.Thread | None
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.m_lock = threading.Lock()
+        self.m_pages = OrderedDict()
+        self.m_bytes = 0
+        self.m_max_bytes = max_bytes
+        self.m_wakeup = threading.Condition(self.m_lock)
+        self.m_requests = list()
+        self.m_thread = None
+
+    def setMaxBytes(self, max_bytes: int):
+        with self.m_lock:
+            self.m_max_bytes = max_bytes
+            self.__evict__()
+
+    def getBytes(self) -> int:
+        """ 目前使用的記憶體（估算） """
+        return self.m_bytes
+
+    def clear(self):
+        with self.m_lock:
+            self.m_pages.clear()
+            self.m_bytes = 0
+            self.m_requests.clear()
+
+    def discard(self, version: int):
+        """ 丟掉某個版本的所有頁面和還沒做的預先讀取（關閉檔案時使用） """
+        with self.m_lock:
+            for key in [key for key in self.m_pages if key[0] == version]:
+                self.m_bytes -= self.m_pages.pop(key).cost
+            self.m_requests = [(key, snapshot) for key, snapshot in self.m_requests if key[0] != version]
+
+    # 存取 ############################################################################################
+    def get(self, key: tuple) -> PageModel | None:
+        with self.m_lock:
+            model = self.m_pages.get(key)
+            if model is None:
+                PROFILER.count("page_cache.miss")
+                return None
+            self.m_pages.move_to_end(key)
+        PROFILER.count("page_cache.hit")
+        return model
+
+    def put(self, key: tuple, model: PageModel):
+        with self.m_lock:
+            self.__put__(key, model)
+
+    def __put__(self, key: tuple, model: PageModel):
+        """ 放入一頁（呼叫前要先取得 m_lock） """
+        old = self.m_pages.pop(key, None)
+        if old is not None:
+            self.m_bytes -= old.cost
+        self.m_pages[key] = model
+        self.m_bytes += model.cost
+        self.__evict__()
+
+    def __evict__(self):
+        """ 超過上限時淘汰最久沒用到的頁面（呼叫前要先取得 m_lock） """
+        while self.m_bytes > self.m_max_bytes and self.m_pages:
+            _, model = self.m_pages.popitem(last=False)
+            self.m_bytes -= model.cost
+            PROFILER.count("page_cache.evicted")
+
+    # 預先讀取 #########################################################################################
+    def prefetch(self, snapshot, keys: list[tuple]):
+        """
+        在背景讀取並轉換 keys 中的頁面（已經在快取中的會被跳過）。snapshot 是資料的唯讀複本（PieceTable.snapshot()）。
+        新的要求會取代之前還沒做的要求（捲動方向改變時，舊的要求就不需要了）
+        """
+        with self.m_lock:
+            self.m_requests = [(key, snapshot) for key in keys if key not in self.m_pages]
+            if self.m_thread is None:
+                self.m_thread = threading.Thread(target=self.__run__, daemon=True)
+                self.m_thread.start()
+            self.m_wakeup.notify()
+
+    def __run__(self):
+        converters = dict()        # base -> ByteNumStr（不和 BinTable 共用，換 base 不會影響這裡）
+        while True:
+            with self.m_lock:
+                while not self.m_requests:
+                    self.m_wakeup.wait()
+                key, snapshot = self.m_requests.pop(0)
+                if key in self.m_pages:
+                    continue
+
+            _, start, length, base = key
+            try:
+                with PROFILER.timer("page_cache.prefetch"):
+                    data = snapshot.read(start, start + length)
+                    if base not in converters:
+                        converters[base] = ByteNumStr(base)
+                    model = PageModel(data, converters[base].toStrings(data))
+            except (OSError, ValueError): # 檔案已經被關閉（例如存檔後重新對應），放棄這一頁
+                continue
+            with self.m_lock:
+                self.__put__(key, model)
+            PROFILER.count("page_cache.prefetched")
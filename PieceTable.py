@@ -0,0 +1,331 @@
+"""
+提供了類別 PieceTable，以 piece table 記錄對資料的插入、刪除和修改
+"""
+import random
+
+ORIGINAL = 0   # piece 的資料來自原本的檔案
+ADDED = 1      # piece 的資料來自 m_added
+
+
+class _Piece:
+    """
+    Treap 的節點，代表「某個 buffer 中的一段連續資料」。
+    節點建立後就不會再修改（split/merge 都會產生新的節點），因此舊的樹可以當作 snapshot 使用。
+    """
+    __slots__ = ("buf", "start", "length", "prio", "left", "right", "size")
+
+    def __init__(self, buf: int, start: int, length: int, prio: float,
+                 left: "_Piece | None" = None, right: "_Piece | None" = None):
+        self.buf = buf
+        self.start = start
+        self.length = length
+        self.prio = prio
+        self.left = left
+        self.right = right
+        # 子樹中所有 piece 的總長度
+        self.size = length + _size(left) + _size(right)
+
+    def withChildren(self, left: "_Piece | None", right: "_Piece | None") -> "_Piece":
+        """ 同一段資料，換成不同的子樹 """
+        return _Piece(self.buf, self.start, self.length, self.prio, left, right)
+
+
+def _size(node: _Piece | None) -> int:
+    return 0 if node is None else node.size
+
+
+def _merge(a: _Piece | None, b: _Piece | None) -> _Piece | None:
+    """ 將 a、b 兩棵樹依序接起來 """
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if a.prio > b.prio:
+        return a.withChildren(a.left, _merge(a.right, b))
+    return b.withChildren(_merge(a, b.left), b.right)
+
+
+def _split(node: _Piece | None, k: int) -> tuple[_Piece | None, _Piece | None]:
+    """ 將 node 切成兩棵樹，左邊是前 k 個 byte，右邊是剩下的部分（必要時將 piece 切開） """
+    if node is None:
+        return None, None
+    left_size = _size(node.left)
+
+    if k <= left_size:
+        L, R = _split(node.left, k)
+        return L, node.withChildren(R, node.right)
+
+    if k >= left_size + node.length:
+        L, R = _split(node.right, k - left_size - node.length)
+        return node.withChildren(node.left, L), R
+
+    # k 落在這個 piece 中間，切成兩半
+    cut = k - left_size
+    head = _Piece(node.buf, node.start, cut, node.prio, node.left, None)
+    tail = _Piece(node.buf, node.start + cut, node.length - cut, random.random())
+    return head, _merge(tail, node.right)
+
+
+def _build(pieces: list[tuple[int, int, int]]) -> _Piece | None:
+    """
+    以 O(n) 將依序排列的 (buf, start, length) 建成 treap（以 stack 建 Cartesian tree，priority 大的在上面）。
+    節點只在建立的過程中被修改，回傳之後就和其他節點一樣不會再變
+    """
+    stack: list[_Piece] = list()   # 目前最右邊的一條路徑
+    for buf, start, length in pieces:
+        node = _Piece(buf, start, length, random.random())
+        last = None
+        while stack and stack[-1].prio < node.prio:
+            last = stack.pop()
+        # 被彈出的節點（priority 比較小）變成新節點的左子樹
+        node.left = last
+        if stack:
+            stack[-1].right = node
+        stack.append(node)
+    if not stack:
+        return None
+
+    # 由下往上計算 size：以前序走訪的反向處理，子節點一定先算好
+    root = stack[0]
+    preorder = list()
+    todo = [root]
+    while todo:
+        node = todo.pop()
+        preorder.append(node)
+        if node.left is not None:
+            todo.append(node.left)
+        if node.right is not None:
+            todo.append(node.right)
+    for node in reversed(preorder):
+        node.size = node.length + _size(node.left) + _size(node.right)
+    return root
+
+
+class PieceTable:
+    """
+    以 piece table 表示的資料：原本的檔案（唯讀）加上一個只會往後附加的 buffer（m_added）。
+    所有 piece 依序存在一棵 treap 中，插入、刪除都只需要 O(log pieces)，不會搬動後面的資料。
+
+    修改：
+    - table[i] = v            : 修改一個 byte
+    - insert()                : 插入資料
+    - delete()                : 刪除一段資料
+    - replaceRanges()         : 將很多段資料換成同一段資料（一次重建，不用逐一 split / merge）
+
+    存取：
+    - len(table)              : 資料長度
+    - table[i]、table[a:b]    : 讀取一個 byte（int）或一段資料（bytes），只會讀到需要的 piece
+    - iterChunks()            : 依序讀出所有資料（存檔用）
+    - snapshot()              : O(1) 取得目前資料的唯讀複本（節點不會被修改，新舊版本共用）
+    - dirtyRanges()           : 和原本的資料不同的範圍（存檔時只寫這些部分）
+    """
+    # private members ####################
+    m_buffers: tuple           # (原本的資料, m_added)
+    m_added: bytearray         # 插入、修改時新增的資料
+    m_root: _Piece | None      # treap 的根
+
+    def __init__(self, original=b''):
+        """
+        original 是唯讀的原始資料（bytes 或 MmapSource，只需要支援 len() 和切片）
+        """
+        self.m_added = bytearray()
+        self.m_buffers = (original, self.m_added)
+        self.m_root = None
+        if len(original) > 0:
+            self.m_root = _Piece(ORIGINAL, 0, len(original), random.random())
+
+    def __len__(self):
+        return _size(self.m_root)
+
+    # 存取 ############################################################################################
+    def __getitem__(self, key: int | slice):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("PieceTable - slice step is not supported")
+            return self.read(start, stop)
+
+        if key < 0:
+            key += len(self)
+        if not (0 <= key < len(self)):
+            raise IndexError("PieceTable - index out of range")
+
+        node = self.m_root
+        while True:
+            left_size = _size(node.left)
+            if key < left_size:
+                node = node.left
+            elif key < left_size + node.length:
+                return self.m_buffers[node.buf][node.start + key - left_size]
+            else:
+                key -= left_size + node.length
+                node = node.right
+
+    def read(self, start: int, end: int) -> bytes:
+        """ 讀取 [start, end) 的資料 """
+        parts = list()
+        self.__collect__(self.m_root, max(start, 0), min(end, len(self)), parts)
+        return b''.join(parts)
+
+    def __collect__(self, node: _Piece | None, start: int, end: int, parts: list):
+        """ 將 node 這棵子樹中 [start, end) 的資料依序放進 parts """
+        if node is None or start >= end:
+            return
+        left_size = _size(node.left)
+        if start < left_size:
+            self.__collect__(node.left, start, min(end, left_size), parts)
+
+        # 這個 piece 本身
+        a = max(start - left_size, 0)
+        b = min(end - left_size, node.length)
+        if a < b:
+            parts.append(bytes(self.m_buffers[node.buf][node.start + a : node.start + b]))
+
+        offset = left_size + node.length
+        if end > offset:
+            self.__collect__(node.right, max(start - offset, 0), end - offset, parts)
+
+    def snapshot(self) -> "PieceTable":
+        """
+        取得目前資料的唯讀複本（O(1)）。之後對這個 PieceTable 的修改不會影響複本，因此可以交給其他執行緒讀取
+        """
+        copy = PieceTable.__new__(PieceTable)
+        copy.m_added = self.m_added
+        copy.m_buffers = self.m_buffers
+        copy.m_root = self.m_root
+        return copy
+
+    def getOriginalPath(self) -> str | None:
+        """
+        資料和原本的檔案完全相同（沒有任何修改）時，回傳檔案路徑，否則回傳 None
+        """
+        original = self.m_buffers[ORIGINAL]
+        if not hasattr(original, "getPath"):
+            return None
+        root = self.m_root
+        if root is None:
+            return original.getPath() if len(original) == 0 else None
+        if root.left is None and root.right is None and root.buf == ORIGINAL \
+                and root.start == 0 and root.length == len(original):
+            return original.getPath()
+        return None
+
+    def iterPieces(self):
+        """ 依序回傳每個 piece：(buffer, start, length) """
+        stack = list()
+        node = self.m_root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield self.m_buffers[node.buf], node.start, node.length
+            node = node.right
+
+    def iterChunks(self, chunk_size: int = 1 << 20):
+        """ 依序讀出所有資料，每次最多 chunk_size 個 byte """
+        for buf, start, length in self.iterPieces():
+            for offset in range(start, start + length, chunk_size):
+                yield bytes(buf[offset : min(offset + chunk_size, start + length)])
+
+    def __iter_nodes__(self):
+        """ 依序回傳每個 piece 的 (buf, start, length)，buf 是 ORIGINAL 或 ADDED """
+        stack = list()
+        node = self.m_root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.buf, node.start, node.length
+            node = node.right
+
+    def dirtyRanges(self) -> list[tuple[int, int]]:
+        """
+        回傳所有可能和原本的資料不同的 [start, end)，由小到大排列、互不相鄰。
+        來自原本資料、而且位置沒有移動的 piece 一定沒變，其他的 piece 都算在內（只走過 piece，不比較內容）
+        """
+        ranges = list()
+        offset = 0
+        for buf, start, length in self.iterPieces():
+            if not (buf is self.m_buffers[ORIGINAL] and start == offset):
+                if ranges and ranges[-1][1] == offset:
+                    ranges[-1] = (ranges[-1][0], offset + length)
+                else:
+                    ranges.append((offset, offset + length))
+            offset += length
+        return ranges
+
+    # 修改 ############################################################################################
+    def __setitem__(self, idx: int, val: int):
+        if not (0 <= idx < len(self)):
+            raise IndexError("PieceTable - index out of range")
+        if self[idx] == val: # 沒有變，不用產生新的 piece
+            return
+        self.replace(idx, idx + 1, bytes([val]))
+
+    def insert(self, idx: int, data: bytes):
+        """ 在 idx 前插入 data """
+        self.replace(idx, idx, data)
+
+    def delete(self, start: int, end: int):
+        """ 刪除 [start, end) 的資料 """
+        self.replace(start, end, b'')
+
+    def replace(self, start: int, end: int, data: bytes):
+        """ 將 [start, end) 的資料換成 data """
+        if not (0 <= start <= end <= len(self)):
+            raise IndexError("PieceTable - range out of bound")
+
+        L, rest = _split(self.m_root, start)
+        _, R = _split(rest, end - start)
+        if len(data) > 0:
+            piece = _Piece(ADDED, len(self.m_added), len(data), random.random())
+            self.m_added += data
+            L = _merge(L, piece)
+        self.m_root = _merge(L, R)
+
+    def replaceRanges(self, ranges: list[tuple[int, int]], data: bytes):
+        """
+        將多個互不重疊、由小到大排列的 [start, end) 都換成 data。
+        data 只加入 m_added 一次，所有新的 piece 共用它；走過所有 piece 一次後重建 treap，
+        所花的時間和 piece 數量、範圍數量成正比，和檔案大小無關
+        """
+        if not ranges:
+            return
+        prev_end = 0
+        for start, end in ranges:
+            if not (prev_end <= start <= end):
+                raise ValueError("PieceTable.replaceRanges() - ranges must be sorted and disjoint")
+            prev_end = end
+        if prev_end > len(self):
+            raise IndexError("PieceTable - range out of bound")
+
+        added_start = len(self.m_added)
+        self.m_added += data
+        nodes = list(self.__iter_nodes__())
+        pieces = list()
+        idx = 0                    # 目前的 piece
+        node_offset = 0            # 目前的 piece 在資料中的位置
+
+        def keep(a: int, b: int):
+            """ 保留 [a, b) 的資料（每次呼叫的範圍都在上一次之後，所以只需要往後走） """
+            nonlocal idx, node_offset
+            while a < b:
+                buf, start, length = nodes[idx]
+                if node_offset + length <= a:
+                    node_offset += length
+                    idx += 1
+                    continue
+                lo, hi = a - node_offset, min(b - node_offset, length)
+                pieces.append((buf, start + lo, hi - lo))
+                a = node_offset + hi
+
+        prev_end = 0
+        for start, end in ranges:
+            keep(prev_end, start)
+            if len(data) > 0:
+                pieces.append((ADDED, added_start, len(data)))
+            prev_end = end
+        keep(prev_end, len(self))
+        self.m_root = _build(pieces)
@@ -0,0 +1,166 @@
+"""
+效能量測：記錄各個操作花了多少時間、做了多少事（例如重畫了幾個格子），並可以匯出成 trace 檔離線分析。
+
+用法：
+```
+from Profiler import PROFILER, timed
+
+with PROFILER.timer("table.paint"):
+    ...
+PROFILER.count("cells.painted", 10)
+
+@timed("table.update_content")
+def __update_content__(self): ...
+```
+預設是關閉的（timer() 和 count() 幾乎不花時間），可以從 Debug 選單或設定環境變數 BINEDIT_PROFILE=1 開啟。
+匯出的 trace 檔是 Chrome trace event 格式，可以用 chrome://tracing 或 https://ui.perfetto.dev 開啟。
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_EVENTS = 100000     # 最多保留幾個事件（舊的會被丟掉）
+ENV_ENABLE = "BINEDIT_PROFILE"  # 設成 1 時一開始就開啟
+
+
+class _Timer:
+    """ PROFILER.timer() 回傳的 context manager """
+    __slots__ = ("m_profiler", "m_name", "m_start")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self.m_profiler = profiler
+        self.m_name = name
+        self.m_start = 0.0
+
+    def __enter__(self):
+        self.m_start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.m_profiler.__record__(self.m_name, self.m_start, time.perf_counter())
+        return False
+
+
+class _NullTimer:
+    """ 關閉時 PROFILER.timer() 回傳的 context manager，什麼都不做（所有人共用一個） """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Profiler:
+    """
+    記錄計時和計數。可以從多個執行緒使用。
+
+    - timer()        : 計時
+    - count()        : 計數
+    - getStats()     : 每個計時項目的 {count, total, max, last}（秒）
+    - getCounters()  : 每個計數項目的累計值
+    - reset()        : 清除所有記錄
+    - exportTrace()  : 匯出成 trace 檔
+    - setEnabled()   : 關閉後 timer() 和 count() 幾乎不花時間（預設關閉）
+    - isEnabled()    : 是否開啟
+    """
+    # private members ####################
+    m_lock: threading.Lock
+    m_enabled: bool
+    m_origin: float                        # 時間的起點（trace 中的時間從這裡開始算）
+    m_stats: dict[str, list]               # 名稱 -> [count, total, max, last]
+    m_counters: dict[str, int]
+    m_events: deque                        # (名稱, 開始, 結束, thread id)
+
+    def __init__(self, enabled: bool = False):
+        self.m_lock = threading.Lock()
+        self.m_enabled = enabled
+        self.m_origin = time.perf_counter()
+        self.m_stats = dict()
+        self.m_counters = dict()
+        self.m_events = deque(maxlen=MAX_EVENTS)
+
+    def setEnabled(self, enabled: bool):
+        self.m_enabled = enabled
+
+    def isEnabled(self) -> bool:
+        return self.m_enabled
+
+    def timer(self, name: str) -> "_Timer | _NullTimer":
+        """ 以 with 計時（關閉時回傳共用的空 context manager，不會配置新物件） """
+        if not self.m_enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def count(self, name: str, n: int = 1):
+        """ 將計數項目 name 加上 n """
+        if not self.m_enabled:
+            return
+        with self.m_lock:
+            self.m_counters[name] = self.m_counters.get(name, 0) + n
+
+    def __record__(self, name: str, start: float, end: float):
+        if not self.m_enabled:
+            return
+        duration = end - start
+        with self.m_lock:
+            stat = self.m_stats.get(name)
+            if stat is None:
+                self.m_stats[name] = [1, duration, duration, duration]
+            else:
+                stat[0] += 1
+                stat[1] += duration
+                stat[2] = max(stat[2], duration)
+                stat[3] = duration
+            self.m_events.append((name, start, end, threading.get_ident()))
+
+    # 存取 ############################################################################################
+    def getStats(self) -> dict[str, dict[str, float]]:
+        with self.m_lock:
+            return {name: {"count": c, "total": t, "max": m, "last": l} for name, (c, t, m, l) in self.m_stats.items()}
+
+    def getCounters(self) -> dict[str, int]:
+        with self.m_lock:
+            return dict(self.m_counters)
+
+    def reset(self):
+        with self.m_lock:
+            self.m_stats.clear()
+            self.m_counters.clear()
+            self.m_events.clear()
+
+    def exportTrace(self, path: str):
+        """ 匯出成 Chrome trace event 格式（時間單位為微秒） """
+        with self.m_lock:
+            events = list(self.m_events)
+            counters = dict(self.m_counters)
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "pid": pid, "tid": tid,
+                  "ts": (start - self.m_origin) * 1e6, "dur": (end - start) * 1e6}
+                 for name, start, end, tid in events]
+        now = (time.perf_counter() - self.m_origin) * 1e6
+        trace += [{"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": now, "args": {"value": value}}
+                  for name, value in counters.items()]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+PROFILER = Profiler(os.environ.get(ENV_ENABLE, "") not in ("", "0"))
+
+
+def timed(name: str):
+    """ 替函式計時的 decorator """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with PROFILER.timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,501 @@
+"""
+搜尋功能：將輸入轉成 pattern、在背景執行緒中一段段搜尋資料，並把結果存成排序好的 index。
+沒有被修改過的大檔案可以交給多個 process 平行搜尋，每個 process 各自 mmap 同一個檔案，不需要傳送資料。
+"""
+import re
+import os
+import mmap
+import heapq
+import threading
+import multiprocessing
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+from AhoCorasick import AhoCorasick
+from Profiler import PROFILER
+
+TEXT = "text"     # 一般文字（UTF-8）
+HEX = "hex"       # 十六進位的 byte，例如 "DE AD ?? EF"，?? 代表任意 byte
+REGEX = "regex"   # Python 的 re（bytes）
+
+CHUNK_SIZE = 4 << 20        # 每次搜尋多少 byte
+REGEX_OVERLAP = 4096        # regex 的長度無法預先知道，跨 chunk 時最多只能找到這麼長的結果
+PARALLEL_CHUNK_SIZE = 16 << 20  # 平行搜尋時，每個工作的大小
+PARALLEL_THRESHOLD = 64 << 20   # 比這個小的檔案，啟動 process 的成本比搜尋本身還高，不平行搜尋
+RESCAN_BLOCK = 64 << 10         # 修改後重新搜尋附近時，每次讀多少 byte
+
+
+def compilePattern(text: str, mode: str) -> tuple[re.Pattern, int | None]:
+    """
+    將使用者的輸入轉成 bytes 的 regex。
+
+    Return:
+        (pattern, length) - length 是結果的長度，regex 模式下為 None（長度不固定）
+
+    Raises:
+        ValueError - 輸入的格式不合法
+    """
+    if mode == TEXT:
+        data = text.encode('utf-8')
+        if len(data) == 0:
+            raise ValueError("Empty pattern")
+        return re.compile(re.escape(data), re.DOTALL), len(data)
+
+    if mode == HEX:
+        digits = "".join(text.split())
+        if len(digits) == 0 or len(digits) % 2:
+            raise ValueError("Hex pattern must contain whole bytes")
+        parts = list()
+        for i in range(0, len(digits), 2):
+            byte = digits[i : i + 2]
+            if byte == "??":
+                parts.append(b'.')
+            elif re.fullmatch("[0-9a-fA-F]{2}", byte):
+                parts.append(re.escape(bytes([int(byte, 16)])))
+            else:
+                raise ValueError(f"Invalid byte: {byte}")
+        return re.compile(b''.join(parts), re.DOTALL), len(parts)
+
+    if mode == REGEX:
+        try:
+            return re.compile(text.encode('utf-8'), re.DOTALL), None
+        except re.error as e:
+            raise ValueError(str(e))
+
+    raise ValueError(f"Unsupported mode: {mode}")
+
+
+def parsePatternList(text: str) -> list[tuple[str, bytes]]:
+    """
+    解析多個 pattern，每行一個，格式為「名稱 = 十六進位的 byte」或只有十六進位的 byte。
+    空行和 # 開頭的行會被忽略。例如：
+    ```
+    # 常見的檔頭
+    PNG = 89 50 4E 47 0D 0A 1A 0A
+    7F 45 4C 46
+    ```
+
+    Return:
+        [(名稱, pattern), ...] - 沒有名稱時以 hex 字串當作名稱
+
+    Raises:
+        ValueError - 格式不合法
+    """
+    patterns = list()
+    for line_no, line in enumerate(text.splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        name, _, hex_part = line.rpartition("=")
+        digits = "".join(hex_part.split())
+        if len(digits) == 0 or len(digits) % 2 or not re.fullmatch("[0-9a-fA-F]*", digits):
+            raise ValueError(f"Line {line_no}: invalid hex bytes")
+        patterns.append((name.strip() or hex_part.strip(), bytes.fromhex(digits)))
+    if len(patterns) == 0:
+        raise ValueError("No pattern")
+    return patterns
+
+
+class SearchResult:
+    """
+    搜尋的結果：由小到大、互不重疊的 [start, end)。搜尋在背景執行緒中進行，結果會一邊找一邊加入。
+
+    存取（主執行緒）：
+    - idx in result  : O(log n) 確認 idx 有沒有在某個結果內
+    - query()        : 和 [start, end) 重疊的結果
+    - len(result)    : 目前找到幾個
+    - progress()     : 已經搜尋的比例（0 ~ 1）
+    - isDone()       : 搜尋是否已經結束（完成或被取消）
+    - isComplete()   : 搜尋是否已經完整地找過所有資料（沒有被取消）
+    - isCancelled()  : 是否被取消過
+    - cancel()       : 取消搜尋
+    - wait()         : 等待搜尋結束
+    - shift()        : 資料被插入或刪除後，平移結果
+    - rescan()       : 資料被修改後，只重新搜尋修改的位置附近
+    - nextHit() / prevHit() : 某個位置之後 / 之前的結果
+    - patternAt()    : idx 屬於哪個 pattern 的結果（單一 pattern 時為 0）
+    """
+    # private members ####################
+    m_lock: threading.Lock
+    m_starts: list[int]
+    m_ends: list[int]
+    m_scanned: int                 # 已經搜尋了多少 byte
+    m_total: int                   # 總共要搜尋多少 byte
+    m_complete: bool               # 搜尋完所有資料（沒有被取消）
+    m_finished: threading.Event    # 搜尋結束（完成或被取消）
+    m_cancel: threading.Event
+    m_pattern: re.Pattern | None   # 搜尋的 pattern（rescan() 使用）
+    m_length: int | None           # 結果的固定長度（None 表示長度不固定）
+
+    def __init__(self, total: int, pattern: re.Pattern | None = None, length: int | None = None):
+        self.m_lock = threading.Lock()
+        self.m_starts = list()
+        self.m_ends = list()
+        self.m_scanned = 0
+        self.m_total = total
+        self.m_complete = False
+        self.m_finished = threading.Event()
+        self.m_cancel = threading.Event()
+        self.m_pattern = pattern
+        self.m_length = length
+
+    def __len__(self):
+        return len(self.m_starts)
+
+    def __contains__(self, idx: int) -> bool:
+        with self.m_lock:
+            i = bisect_right(self.m_starts, idx) - 1
+            return i >= 0 and idx < self.m_ends[i]
+
+    def query(self, start: int, end: int) -> list[tuple[int, int]]:
+        """ 回傳和 [start, end) 重疊的結果（不截斷） """
+        with self.m_lock:
+            lo = bisect_right(self.m_ends, start)
+            hi = bisect_left(self.m_starts, end)
+            return list(zip(self.m_starts[lo:hi], self.m_ends[lo:hi]))
+
+    def patternAt(self, idx: int) -> int | None:
+        """ idx 屬於第幾個 pattern 的結果，不屬於任何結果時回傳 None """
+        return 0 if idx in self else None
+
+    def progress(self) -> float:
+        return 1.0 if self.m_total == 0 else self.m_scanned / self.m_total
+
+    def isDone(self) -> bool:
+        return self.m_finished.is_set()
+
+    def isComplete(self) -> bool:
+        return self.m_finished.is_set() and self.m_complete
+
+    def isCancelled(self) -> bool:
+        return self.m_cancel.is_set()
+
+    def cancel(self):
+        self.m_cancel.set()
+
+    def nextHit(self, pos: int) -> tuple[int, int] | None:
+        """ 起點在 pos 之後（不包含 pos）的第一個結果 """
+        with self.m_lock:
+            i = bisect_right(self.m_starts, pos)
+            return (self.m_starts[i], self.m_ends[i]) if i < len(self.m_starts) else None
+
+    def prevHit(self, pos: int) -> tuple[int, int] | None:
+        """ 起點在 pos 之前（不包含 pos）的最後一個結果 """
+        with self.m_lock:
+            i = bisect_left(self.m_starts, pos) - 1
+            return (self.m_starts[i], self.m_ends[i]) if i >= 0 else None
+
+    def wait(self):
+        self.m_finished.wait()
+
+    def shift(self, pos: int, delta: int):
+        """
+        在 pos 插入 delta 個（delta > 0）或刪除 -delta 個（delta < 0）byte 後，平移結果。
+        被改到的結果已經不一定相符，因此移除
+        """
+        with self.m_lock:
+            # 受影響的範圍：[pos, pos + 刪除的長度)，插入時只有跨過 pos 的結果受影響
+            affected_end = pos + max(-delta, 0)
+            lo = bisect_right(self.m_ends, pos)
+            hi = bisect_left(self.m_starts, affected_end) if delta < 0 else bisect_left(self.m_starts, pos)
+            del self.m_starts[lo:hi]
+            del self.m_ends[lo:hi]
+            if delta == 0: # 覆寫，後面的結果不用平移
+                return
+            for i in range(lo, len(self.m_starts)):
+                self.m_starts[i] += delta
+                self.m_ends[i] += delta
+            self.m_total += delta
+            self.m_scanned = max(self.m_scanned + delta, 0) if self.m_scanned > pos else self.m_scanned
+
+    def rescan(self, data, start: int, end: int):
+        """
+        data（修改後的資料）中 [start, end) 被換掉之後呼叫（要先呼叫 shift()）。只重新搜尋修改的位置附近：
+        從可能碰到修改的第一個結果開始找，直到某個位置之後新舊結果一定相同為止
+        （該位置在修改之後、不在任何結果中間，且新的搜尋已經確認在它之前沒有其他結果），之後的結果保持不變。
+        """
+        if self.m_pattern is None:
+            raise RuntimeError("SearchResult.rescan() - unknown pattern")
+        overlap = REGEX_OVERLAP if self.m_length is None else max(self.m_length - 1, 0)
+        # 長度固定時，碰不到修改的結果不會變；長度不固定時，前面的結果可能變長，要多往前找
+        cut = start if self.m_length is not None else max(start - overlap, 0)
+
+        with self.m_lock:
+            i = bisect_right(self.m_ends, cut)
+            prev_end = self.m_ends[i - 1] if i > 0 else 0
+            first_start = self.m_starts[i] if i < len(self.m_starts) else start
+            old_starts = self.m_starts[i:]
+            old_ends = self.m_ends[i:]
+
+        pos = max(prev_end, min(max(start - overlap, 0), first_start))
+        new_hits = list()
+        last_end = pos
+        block_start = pos
+        sync = None
+        j = 0                                          # 第一個結尾在 sync 位置之後的舊結果
+        with PROFILER.timer("search.rescan"):
+            while block_start < len(data):
+                block_end = min(block_start + RESCAN_BLOCK, len(data))
+                buf = data[block_start : block_end + overlap]
+                for m in self.m_pattern.finditer(buf, max(last_end - block_start, 0)):
+                    if block_start + m.start() >= block_end:
+                        break
+                    if m.end() == m.start():
+                        continue
+                    new_hits.append((block_start + m.start(), block_start + m.end()))
+                    last_end = block_start + m.end()
+
+                # 找同步的位置：在修改之後、新的結果之後，而且不在任何舊的結果中間
+                candidate = max(end, last_end)
+                while j < len(old_starts) and old_ends[j] <= candidate:
+                    j += 1
+                while j < len(old_starts) and old_starts[j] < candidate < old_ends[j]:
+                    candidate = old_ends[j]
+                    j += 1
+                if candidate <= block_end:
+                    sync = candidate
+                    break
+                block_start = block_end
+
+        with self.m_lock:
+            # 起點在 sync 之前的舊結果換成新的結果
+            k = len(old_starts) if sync is None else bisect_left(old_starts, sync)
+            self.m_starts[i:] = [s for s, _ in new_hits] + old_starts[k:]
+            self.m_ends[i:] = [e for _, e in new_hits] + old_ends[k:]
+
+    # 搜尋（背景執行緒） ##################################################################################
+    def __append_hit__(self, start: int, end: int):
+        with self.m_lock:
+            self.m_starts.append(start)
+            self.m_ends.append(end)
+
+    def __scan__(self, data, pattern: re.Pattern, overlap: int, chunk_size: int):
+        """
+        一段段搜尋 data。每段多讀 overlap 個 byte，讓跨過兩段的結果也能被找到；
+        起點落在多讀的部分的結果留給下一段處理
+        """
+        try:
+            last_end = 0
+            for chunk_start in range(0, len(data), chunk_size):
+                if self.m_cancel.is_set():
+                    break
+                chunk_end = min(chunk_start + chunk_size, len(data))
+                with PROFILER.timer("search.chunk"):
+                    buf = data[chunk_start : chunk_end + overlap]
+
+                    # 從上一段最後一個結果的結尾開始找，避免找到重疊的結果
+                    for m in pattern.finditer(buf, max(last_end - chunk_start, 0)):
+                        start = chunk_start + m.start()
+                        if start >= chunk_end:
+                            break
+                        if m.end() == m.start(): # 空字串
+                            continue
+                        last_end = chunk_start + m.end()
+                        self.__append_hit__(start, last_end)
+
+                PROFILER.count("search.bytes", chunk_end - chunk_start)
+                self.m_scanned = chunk_end
+        finally:
+            self.m_complete = self.m_scanned == self.m_total
+            self.m_finished.set()
+
+    def __scan_parallel__(self, data, path: str, pattern: re.Pattern, overlap: int, workers: int | None):
+        """
+        將檔案切成多段交給 process pool 搜尋，再依序合併結果。
+        每段的結果是獨立找的，開頭可能和上一段最後一個結果重疊，這時從上一段的結尾重新找
+        """
+        try:
+            total = len(data)
+            bounds = [(s, min(s + PARALLEL_CHUNK_SIZE, total)) for s in range(0, total, PARALLEL_CHUNK_SIZE)]
+            # 用 spawn 而不是 fork：主程式有 Tk 和其他執行緒，fork 出來的 process 可能會卡住
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=_initWorker, initargs=(path,)) as pool:
+                futures = [pool.submit(_scanChunk, pattern.pattern, pattern.flags, s, e, overlap) for s, e in bounds]
+                last_end = 0
+                for (_, chunk_end), future in zip(bounds, futures):
+                    if self.m_cancel.is_set():
+                        pool.shutdown(cancel_futures=True)
+                        break
+                    with PROFILER.timer("search.parallel_wait"):
+                        hits = future.result()
+                    PROFILER.count("search.bytes", chunk_end - self.m_scanned)
+                    if hits and hits[0][0] < last_end:
+                        hits = _resync(data, pattern, hits, last_end, chunk_end, overlap)
+                    for start, end in hits:
+                        self.__append_hit__(start, end)
+                        last_end = end
+                    self.m_scanned = chunk_end
+        finally:
+            self.m_complete = self.m_scanned == self.m_total
+            self.m_finished.set()
+
+
+class MultiSearchResult(SearchResult):
+    """
+    多個 pattern 一起搜尋的結果。每個 pattern 的結果各自存在一個 SearchResult（m_parts）中，
+    同一個 pattern 的結果互不重疊，不同 pattern 的結果可以重疊。進度和取消則由這個物件統一管理。
+    """
+    # private members ####################
+    m_names: list[str]
+    m_parts: list[SearchResult]
+
+    def __init__(self, total: int, patterns: list[tuple[str, bytes]]):
+        SearchResult.__init__(self, total)
+        self.m_names = [name for name, _ in patterns]
+        # 同一個 pattern 的結果和以 re 從左到右找的結果相同，修改後可以各自 rescan()
+        self.m_parts = [SearchResult(total, re.compile(re.escape(pattern), re.DOTALL), len(pattern))
+                        for _, pattern in patterns]
+
+    def __len__(self):
+        return sum(len(part) for part in self.m_parts)
+
+    def __contains__(self, idx: int) -> bool:
+        return self.patternAt(idx) is not None
+
+    def patternAt(self, idx: int) -> int | None:
+        """ idx 屬於第幾個 pattern 的結果（有多個時回傳最前面的） """
+        for pid, part in enumerate(self.m_parts):
+            if idx in part:
+                return pid
+        return None
+
+    def query(self, start: int, end: int) -> list[tuple[int, int]]:
+        """
+        所有 pattern 中和 [start, end) 重疊的結果，由小到大排列。
+        不同 pattern 的結果重疊時合併成一段，所以和單一 pattern 的結果一樣互不重疊（可以直接交給 BinaryBuffer.replaceAll()）
+        """
+        merged = list()
+        for hit_start, hit_end in heapq.merge(*(part.query(start, end) for part in self.m_parts)):
+            if merged and hit_start < merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], hit_end))
+            else:
+                merged.append((hit_start, hit_end))
+        return merged
+
+    def shift(self, pos: int, delta: int):
+        for part in self.m_parts:
+            part.shift(pos, delta)
+        self.m_total += delta
+        self.m_scanned = max(self.m_scanned + delta, 0) if self.m_scanned > pos else self.m_scanned
+
+    def rescan(self, data, start: int, end: int):
+        for part in self.m_parts:
+            part.rescan(data, start, end)
+
+    def nextHit(self, pos: int) -> tuple[int, int] | None:
+        hits = [hit for part in self.m_parts if (hit := part.nextHit(pos)) is not None]
+        return min(hits) if hits else None
+
+    def prevHit(self, pos: int) -> tuple[int, int] | None:
+        hits = [hit for part in self.m_parts if (hit := part.prevHit(pos)) is not None]
+        return max(hits) if hits else None
+
+    def getNames(self) -> list[str]:
+        return self.m_names
+
+    def getHits(self, pid: int) -> list[tuple[int, int]]:
+        """ 第 pid 個 pattern 的所有結果 """
+        part = self.m_parts[pid]
+        with part.m_lock:
+            return list(zip(part.m_starts, part.m_ends))
+
+    def __scan_multi__(self, data, automaton: AhoCorasick, chunk_size: int):
+        """ 一段段地將 data 交給自動機，自動機的狀態會接到下一段，不需要多讀重疊的部分 """
+        try:
+            lengths = [len(p) for p in automaton.getPatterns()]
+            last_end = [0] * len(lengths)
+            state = 0
+            for chunk_start in range(0, len(data), chunk_size):
+                if self.m_cancel.is_set():
+                    break
+                chunk_end = min(chunk_start + chunk_size, len(data))
+                with PROFILER.timer("search.multi_chunk"):
+                    state, hits = automaton.scan(data[chunk_start : chunk_end], state)
+                PROFILER.count("search.bytes", chunk_end - chunk_start)
+                for end, pid in hits:
+                    end += chunk_start
+                    start = end - lengths[pid]
+                    if start >= last_end[pid]: # 同一個 pattern 的結果不重疊
+                        self.m_parts[pid].__append_hit__(start, end)
+                        last_end[pid] = end
+                self.m_scanned = chunk_end
+        finally:
+            self.m_complete = self.m_scanned == self.m_total
+            for part in self.m_parts:
+                part.m_complete = self.m_complete
+                part.m_finished.set()
+            self.m_finished.set()
+
+
+# 平行搜尋（在 worker process 中執行） ####################################################################
+_worker_file = None
+_worker_map = None
+
+
+def _initWorker(path: str):
+    """ 每個 worker 開始時 mmap 一次檔案，之後的工作都直接讀它 """
+    global _worker_file, _worker_map
+    _worker_file = open(path, 'rb')
+    _worker_map = mmap.mmap(_worker_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _scanChunk(pattern_src: bytes, flags: int, start: int, end: int, overlap: int) -> list[tuple[int, int]]:
+    """ 找出起點在 [start, end) 中的結果（re 會快取編譯好的 pattern） """
+    pattern = re.compile(pattern_src, flags)
+    hits = list()
+    for m in pattern.finditer(_worker_map, start, min(end + overlap, len(_worker_map))):
+        if m.start() >= end:
+            break
+        if m.end() > m.start():
+            hits.append((m.start(), m.end()))
+    return hits
+
+
+def _resync(data, pattern: re.Pattern, hits: list, last_end: int, chunk_end: int, overlap: int) -> list[tuple[int, int]]:
+    """
+    hits 的開頭和上一段的結果重疊。從 last_end 重新找，直到找到和 hits 中相同起點的結果，之後的部分就和 hits 一樣
+    """
+    index = {start: i for i, (start, _) in enumerate(hits)}
+    fixed = list()
+    buf = data[last_end : chunk_end + overlap]
+    for m in pattern.finditer(buf):
+        start = last_end + m.start()
+        if start >= chunk_end:
+            break
+        if m.end() == m.start():
+            continue
+        fixed.append((start, last_end + m.end()))
+        if start in index:
+            return fixed + hits[index[start] + 1 :]
+    return fixed
+
+
+def startSearch(data, pattern: re.Pattern, length: int | None, chunk_size: int = CHUNK_SIZE,
+                parallel: bool = False, workers: int | None = None) -> SearchResult:
+    """
+    在背景執行緒中搜尋 data（需支援 len() 和切片，且在搜尋時不能被修改，例如 PieceTable.snapshot()）。
+    length 是結果的固定長度（None 表示長度不固定）。回傳的 SearchResult 會在搜尋過程中持續更新。
+
+    parallel 為 True，且 data 是沒被修改過的大檔案（PieceTable.getOriginalPath() 不是 None）時，
+    改用 workers 個 process 平行搜尋（預設為 CPU 的數量）
+    """
+    result = SearchResult(len(data), pattern, length)
+    overlap = REGEX_OVERLAP if length is None else max(length - 1, 0)
+
+    path = data.getOriginalPath() if hasattr(data, "getOriginalPath") else None
+    if parallel and path is not None and len(data) >= PARALLEL_THRESHOLD and (workers or os.cpu_count() or 1) > 1:
+        target, args = result.__scan_parallel__, (data, path, pattern, overlap, workers)
+    else:
+        target, args = result.__scan__, (data, pattern, overlap, chunk_size)
+    threading.Thread(target=target, args=args, daemon=True).start()
+    return result
+
+
+def startMultiSearch(data, patterns: list[tuple[str, bytes]], chunk_size: int = CHUNK_SIZE) -> MultiSearchResult:
+    """
+    在背景執行緒中，以 Aho-Corasick 自動機一次搜尋多個 pattern（由 parsePatternList() 取得）
+    """
+    result = MultiSearchResult(len(data), patterns)
+    automaton = AhoCorasick([pattern for _, pattern in patterns])
+    threading.Thread(target=result.__scan_multi__, args=(data, automaton, chunk_size), daemon=True).start()
+    return result
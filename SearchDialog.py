@@ -0,0 +1,86 @@
+"""
+提供了搜尋用的對話框 SearchDialog（單一 pattern）和 MultiSearchDialog（多個 pattern）
+"""
+import tkinter as tk
+from tkinter import simpledialog
+from tkinter import messagebox
+from tkinter import filedialog
+
+import Search
+
+
+class SearchDialog(simpledialog.Dialog):
+    """
+    輸入要搜尋的內容，並選擇格式（文字、十六進位、regex）。
+    按下 OK 後 result 為 (輸入的內容, 模式, 是否平行搜尋)，取消時為 None。
+    """
+    # private members ####################
+    m_entry: tk.Entry
+    m_mode: tk.StringVar
+    m_parallel: tk.BooleanVar
+
+    def __init__(self, parent: tk.Misc, title: str = "Search"):
+        self.m_mode = tk.StringVar(parent, value=Search.TEXT)
+        self.m_parallel = tk.BooleanVar(parent, value=True)
+        simpledialog.Dialog.__init__(self, parent, title)
+
+    def body(self, master):
+        tk.Label(master, text="Enter search term:").grid(row=0, column=0, columnspan=3, sticky=tk.W)
+        self.m_entry = tk.Entry(master, width=40)
+        self.m_entry.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E))
+
+        for col, (label, mode) in enumerate([("Text", Search.TEXT), ("Hex (?? = any)", Search.HEX), ("Regex", Search.REGEX)]):
+            tk.Radiobutton(master, text=label, value=mode, variable=self.m_mode).grid(row=2, column=col, sticky=tk.W)
+
+        # 只對沒被修改過的大檔案有效，其他情況會自動改用單一執行緒
+        tk.Checkbutton(master, text="Use all CPU cores (large unmodified files)",
+                       variable=self.m_parallel).grid(row=3, column=0, columnspan=3, sticky=tk.W)
+        return self.m_entry
+
+    def validate(self):
+        try:
+            Search.compilePattern(self.m_entry.get(), self.m_mode.get())
+        except ValueError as e:
+            messagebox.showerror("Search", str(e), parent=self)
+            return False
+        return True
+
+    def apply(self):
+        self.result = (self.m_entry.get(), self.m_mode.get(), self.m_parallel.get())
+
+
+class MultiSearchDialog(simpledialog.Dialog):
+    """
+    輸入多個要一起搜尋的 pattern（格式見 Search.parsePatternList()），也可以從檔案載入。
+    按下 OK 後 result 為 [(名稱, pattern), ...]，取消時為 None。
+    """
+    # private members ####################
+    m_text: tk.Text
+
+    def body(self, master):
+        tk.Label(master, text="One pattern per line:  NAME = HEX BYTES  (# for comments)").pack(anchor=tk.W)
+        self.m_text = tk.Text(master, width=50, height=12)
+        self.m_text.pack(expand=True, fill=tk.BOTH)
+        tk.Button(master, text="Load from file...", command=self.__load__).pack(anchor=tk.E)
+        return self.m_text
+
+    def __load__(self):
+        """ 從文字檔載入 pattern """
+        path = filedialog.askopenfilename(parent=self, initialdir='.',
+                                          filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if path:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.m_text.delete("1.0", tk.END)
+                self.m_text.insert("1.0", f.read())
+
+    def validate(self):
+        try:
+            self.result = Search.parsePatternList(self.m_text.get("1.0", tk.END))
+        except ValueError as e:
+            messagebox.showerror("Multi Search", str(e), parent=self)
+            self.result = None
+            return False
+        return True
+
+    def apply(self):
+        pass # result 已經在 validate() 中設定
@@ -2,71 +2,116 @@
 這個模組提供了class SelectRange，以記錄選取的範圍
 """
 import math
+from IntervalSet import IntervalSet
 
 class SelectRange:
     """
-    這個class用了兩個變數來記錄選取的範圍（start和end）。
-    選取的範圍包含了兩個端點。
-    
+    記錄選取的範圍，可以同時選取多段互不相連的範圍。
+    目前的範圍（primary）用兩個變數來記錄（start和end），包含了兩個端點，Shift + 點擊時改變它的終點；
+    其他的範圍（例如 Ctrl + 點擊加入的、或一次選取所有搜尋結果）存在 IntervalSet 中，以 O(log n) 查詢。
+
     選取：
-    - selectSingle() : 選擇單一個點
-    - setEnd()       : 設定選擇範圍的終點
-    - unselect()     : 將選擇範圍設成None
+    - selectSingle() : 選擇單一個點（其他範圍會被取消）
+    - setEnd()       : 設定目前範圍的終點
+    - addSingle()    : 保留原本的範圍，從單一個點開始一個新的範圍
+    - selectRanges() : 一次選取多個 [start, end) 的範圍
+    - unselect()     : 取消所有選取
+    - shift()        : 插入資料後平移後面的範圍
 
     存取：
     - contain()      : 確認範圍內有沒有特定的點
-    - toTuple()      : 將選取範圍轉成一個有序數組（ordered tuple）
+    - toTuple()      : 將目前的範圍轉成一個有序數組（ordered tuple）
+    - query()        : 和 [start, end) 重疊的選取範圍（合併過、由小到大），畫一整頁時只需要查詢一次
+    - ranges()       : 所有的選取範圍
+    - count()        : 有幾段選取範圍
+    - getChanges()   : 每次選取改變時加一
     """
     # private member #################
     m_start: int | None
     m_end: int | None
+    m_others: IntervalSet    # 目前的範圍以外的選取範圍 [start, end)（可能和目前的範圍重疊）
+    m_changes: int
 
     def __init__(self):
         self.m_start = None
         self.m_end = None
+        self.m_others = IntervalSet()
+        self.m_changes = 0
 
     # 選取 ################################################################################################
     def selectSingle(self, idx: int):
         """
         將選取範圍限縮在單一個點上
         """
+        self.m_others.clear()
         self.m_start = self.m_end = idx
-        print(f"Select: {self.toTuple()}")
+        self.m_changes += 1
 
     def setEnd(self, idx: int):
         """
-        設定選取範圍的終點（如果原本沒有選取任何東西則和selectSingle一樣）
+        設定目前範圍的終點（如果原本沒有選取任何東西則和selectSingle一樣）
         """
         if self.m_start is None:
             self.m_start = idx
         self.m_end = idx
-        print(f"Select: {self.toTuple()}")
+        self.m_changes += 1
+
+    def addSingle(self, idx: int):
+        """
+        保留原本選取的範圍，以單一個點開始一個新的目前範圍
+        """
+        if self.m_start is not None:
+            a, b = self.toTuple()
+            self.m_others.add(a, b + 1)
+        self.m_start = self.m_end = idx
+        self.m_changes += 1
+
+    def selectRanges(self, ranges: list[tuple[int, int]]):
+        """
+        取代原本的選取，選取 ranges 中每個 [start, end)（由小到大排列）。第一段成為目前的範圍
+        """
+        self.unselect()
+        ranges = [(start, end) for start, end in ranges if start < end]
+        if not ranges:
+            return
+        self.m_start, self.m_end = ranges[0][0], ranges[0][1] - 1
+        for start, end in ranges[1:]:
+            self.m_others.add(start, end)
 
     def unselect(self):
         """
         取消選取
         """
         self.m_start = self.m_end = None
+        self.m_others.clear()
+        self.m_changes += 1
+
+    def shift(self, pos: int, count: int):
+        """
+        在 pos 插入 count 個點後，將 pos 之後的範圍向後平移（插入的點不會被選取，除非插在目前的範圍中間）
+        """
+        if self.m_start is None or count <= 0:
+            return
+        if self.m_start >= pos:
+            self.m_start += count
+        if self.m_end >= pos:
+            self.m_end += count
+        self.m_others.shift(pos, count)
+        self.m_changes += 1
 
     # 存取 ###########################################################################################
-    def contain(self, idx: int):
+    def contain(self, idx: int) -> bool:
         """
         確認 idx 有沒有在選取範圍內
         """
         if self.m_start is None:
-            return
-        
-        # 從起點到終點的向量
-        L = self.m_end - self.m_start
-        # 從起點到 idx 的向量
-        D = idx        - self.m_start
-
-        # 如果            L 和 D 同方向，且 L 比 D 長
-        return D == 0 or (math.copysign(L, D) == L and abs(D) <= abs(L))
+            return False
+        a, b = (self.m_start, self.m_end) if self.m_start <= self.m_end else (self.m_end, self.m_start)
+        return a <= idx <= b or idx in self.m_others
 
     def toTuple(self, low=0, high=math.inf) -> tuple[int, int] | None:
         """
-        將選取範圍轉成一個有序數組（ordered tuple）。
+        將目前的範圍轉成一個有序數組（ordered tuple）。
         參數 low, high 用來將回傳值給 clamp 到 [low, high] 的範圍。
 
         Return:
@@ -84,7 +129,7 @@ class SelectRange:
             raise ValueError("SelectRange.toTuple() - low > high is not allowed")
         if self.m_start is None:
             return None
-        
+
         a = min(self.m_start, self.m_end)
         b = max(self.m_start, self.m_end)
 
@@ -94,4 +139,44 @@ class SelectRange:
 
         return (a, b)
 
+    def query(self, start: int, end: int) -> list[tuple[int, int]]:
+        """
+        回傳和 [start, end) 重疊的選取範圍（互不相連、由小到大，每段為 [start, end) 並截到查詢的範圍內）
+        """
+        if self.m_start is None or start >= end:
+            return []
+        result = self.m_others.query(start, end)
+        a, b = self.toTuple()
+        a, b = max(a, start), min(b + 1, end)
+        if a >= b:
+            return result
+
+        # 將目前的範圍併入 result
+        merged = list()
+        for s, e in result:
+            if e < a or b < s: # 不相連
+                merged.append((s, e))
+            else:
+                a, b = min(a, s), max(b, e)
+        merged.append((a, b))
+        merged.sort()
+        return merged
+
+    def ranges(self, low=0, high=math.inf) -> list[tuple[int, int]]:
+        """
+        回傳所有的選取範圍（格式和 query() 相同），並截到 [low, high) 的範圍內
+        """
+        return self.query(low, high)
+
+    def count(self) -> int:
+        """
+        有幾段互不相連的選取範圍（O(log n)）
+        """
+        if self.m_start is None:
+            return 0
+        a, b = self.toTuple()
+        # 和目前的範圍重疊或相鄰的其他範圍會和它合併成一段
+        return len(self.m_others) - self.m_others.countTouching(a, b + 1) + 1
 
+    def getChanges(self) -> int:
+        return self.m_changes
@@ -0,0 +1,120 @@
+"""
+提供了類別 UndoJournal，以很小的差異記錄修改，讓 BinaryBuffer 可以復原 / 重做
+"""
+from collections import deque
+
+DEFAULT_MAX_BYTES = 64 << 20   # 預設最多記錄多少 byte
+STEP_OVERHEAD = 64             # 每個差異額外估算的記憶體（物件本身）
+
+
+class UndoJournal:
+    """
+    復原 / 重做的記錄。每一步是一組差異 [(offset, removed, inserted_len), ...]，依照修改的順序排列：
+    從 offset 開始的 removed 被換成了 inserted_len 個 byte。
+    只保存被換掉的資料（removed），換上去的資料在復原時才從 buffer 中讀出來，變成重做時的 removed，
+    因此插入只花 O(1)，刪除一大段也只保存那一段（和檔案大小無關）。
+
+    - record()            : 記錄新的一步（會清空重做）
+    - popUndo() / popRedo(): 取出要復原 / 重做的一步
+    - pushUndo() / pushRedo(): 放回復原 / 重做後產生的反向步驟
+    - canUndo() / canRedo()
+    - canRecord()         : 一步的大小會不會超過上限（在讀出被換掉的資料前先確認）
+    - clear() / clearUndo() / clearRedo()
+
+    記錄的總量超過 max_bytes 時，從最舊的步驟開始丟掉（放入重做步驟時只丟重做步驟，不會為了它丟掉復原記錄）；
+    單獨一步就超過時，丟掉這一步和它要放入的那一邊（那一邊之前的步驟已經接不上了），另一邊保持不變
+    """
+    # private members ####################
+    m_max_bytes: int
+    m_undo: deque                  # 可以復原的步驟，右邊是最新的
+    m_redo: list                   # 可以重做的步驟，最後一個是下一個要重做的
+    m_bytes: int                   # 目前記錄的總量（估算）
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.m_max_bytes = max_bytes
+        self.m_undo = deque()
+        self.m_redo = list()
+        self.m_bytes = 0
+
+    @staticmethod
+    def __cost__(step: list) -> int:
+        return sum(len(removed) + STEP_OVERHEAD for _, removed, _ in step)
+
+    def setMaxBytes(self, max_bytes: int):
+        self.m_max_bytes = max_bytes
+        self.__evict__()
+
+    def getBytes(self) -> int:
+        """ 目前記錄的總量（估算） """
+        return self.m_bytes
+
+    def canUndo(self) -> bool:
+        return bool(self.m_undo)
+
+    def canRedo(self) -> bool:
+        return bool(self.m_redo)
+
+    def canRecord(self, removed_len: int, count: int = 1) -> bool:
+        """ 換掉共 removed_len 個 byte（count 個差異）的一步能不能被記錄 """
+        return removed_len + count * STEP_OVERHEAD <= self.m_max_bytes
+
+    def clear(self):
+        self.m_undo.clear()
+        self.m_redo.clear()
+        self.m_bytes = 0
+
+    def clearUndo(self):
+        for step in self.m_undo:
+            self.m_bytes -= self.__cost__(step)
+        self.m_undo.clear()
+
+    def clearRedo(self):
+        for step in self.m_redo:
+            self.m_bytes -= self.__cost__(step)
+        self.m_redo.clear()
+
+    def record(self, step: list[tuple[int, bytes, int]]):
+        """ 記錄一次新的修改，之後就不能重做了 """
+        if not step:
+            return
+        self.clearRedo()
+        self.pushUndo(step)
+
+    def pushUndo(self, step: list[tuple[int, bytes, int]]):
+        if self.__cost__(step) > self.m_max_bytes:
+            self.clearUndo()
+            return
+        self.m_undo.append(step)
+        self.m_bytes += self.__cost__(step)
+        self.__evict__()
+
+    def pushRedo(self, step: list[tuple[int, bytes, int]]):
+        if self.__cost__(step) > self.m_max_bytes:
+            self.clearRedo()
+            return
+        self.m_redo.append(step)
+        self.m_bytes += self.__cost__(step)
+        # 只丟最遠的重做步驟（必要時包含這一步），不丟復原記錄
+        while self.m_bytes > self.m_max_bytes and self.m_redo:
+            self.m_bytes -= self.__cost__(self.m_redo.pop(0))
+
+    def popUndo(self) -> list[tuple[int, bytes, int]] | None:
+        if not self.m_undo:
+            return None
+        step = self.m_undo.pop()
+        self.m_bytes -= self.__cost__(step)
+        return step
+
+    def popRedo(self) -> list[tuple[int, bytes, int]] | None:
+        if not self.m_redo:
+            return None
+        step = self.m_redo.pop()
+        self.m_bytes -= self.__cost__(step)
+        return step
+
+    def __evict__(self):
+        """ 超過上限時，先丟掉最舊的復原步驟，再丟掉最遠的重做步驟 """
+        while self.m_bytes > self.m_max_bytes and self.m_undo:
+            self.m_bytes -= self.__cost__(self.m_undo.popleft())
+        while self.m_bytes > self.m_max_bytes and self.m_redo:
+            self.m_bytes -= self.__cost__(self.m_redo.pop(0))
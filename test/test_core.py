@@ -0,0 +1,462 @@
+"""
+不需要 GUI 的核心（BinaryBuffer 和它用到的資料結構）的測試，每項都和簡單的參考實作比較。
+
+```sh
+python -m pytest -q test
+python -m unittest discover -s test
+```
+"""
+import hashlib
+import os
+import random
+import stat
+import sys
+import tempfile
+import time
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import BinaryCLI
+import Search
+from BinaryBuffer import BinaryBuffer
+from Checksum import CHUNK_SIZE, crc32Combine
+from IntervalSet import IntervalSet
+from PieceTable import PieceTable
+from Profiler import Profiler
+from SelectRange import SelectRange
+from UndoJournal import STEP_OVERHEAD
+
+
+def _replace_reference(data: bytes, ranges: list[tuple[int, int]], new: bytes) -> bytes:
+    """ 將互不重疊、由小到大的 ranges 都換成 new """
+    out, pos = bytearray(), 0
+    for start, end in ranges:
+        out += data[pos:start] + new
+        pos = end
+    return bytes(out + data[pos:])
+
+
+def _merge_overlaps(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """ 排序並合併重疊（不包含相鄰）的範圍 """
+    merged = list()
+    for start, end in sorted(ranges):
+        if merged and start < merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _find_all(data: bytes, pattern: bytes) -> list[tuple[int, int]]:
+    """ 從左到右找出互不重疊的 pattern """
+    hits, pos = list(), data.find(pattern)
+    while pos >= 0:
+        hits.append((pos, pos + len(pattern)))
+        pos = data.find(pattern, pos + len(pattern))
+    return hits
+
+
+def _wait_hashes(test: unittest.TestCase, index) -> tuple:
+    """ 等 HashIndex 算完，回傳 (crc32, md5, sha256) """
+    deadline = time.monotonic() + 30
+    while not index.isDone() or index.crc32() is None:
+        test.assertLess(time.monotonic(), deadline)
+        time.sleep(0.01)
+    return index.crc32(), index.md5(), index.sha256()
+
+
+class TestReplaceMultiSearchHits(unittest.TestCase):
+    """ 多個 pattern 的結果可以重疊，取代所有結果時不能弄亂資料 """
+
+    def check(self, data: bytes, patterns: list[bytes], new: bytes):
+        buffer = BinaryBuffer(data)
+        buffer.enableUndo()
+        result = buffer.multiSearch([(p.hex(), p) for p in patterns])
+        result.wait()
+        hits = result.query(0, len(buffer))
+        expected_hits = _merge_overlaps([hit for p in patterns for hit in _find_all(data, p)])
+        self.assertEqual(hits, expected_hits)
+
+        buffer.replaceAll(hits, new)
+        self.assertEqual(buffer.read(0, len(buffer)), _replace_reference(data, expected_hits, new))
+        buffer.undo()
+        self.assertEqual(buffer.read(0, len(buffer)), data)
+
+    def test_overlapping_patterns(self):
+        self.check(b"ABCD____AB", [b"BCD", b"ABC", b"AB"], b"XX")
+
+    def test_many_overlapping_hits(self):
+        # 超過 MAX_RESCAN_EDITS 個範圍時，PieceTable.replaceRanges() 會檢查範圍是否排序好
+        rng = random.Random(20)
+        data = bytes(rng.choice(b"ABC_") for _ in range(4000))
+        self.check(data, [b"AB", b"BC", b"ABC", b"C_"], b"")
+
+    def test_unsorted_ranges_are_rejected(self):
+        buffer = BinaryBuffer(b"0123456789")
+        with self.assertRaises(ValueError):
+            buffer.replaceAll([(5, 7), (1, 3)], b"")
+        with self.assertRaises(ValueError):
+            buffer.replaceAll([(1, 4), (3, 6)], b"")
+        self.assertEqual(buffer.read(0, len(buffer)), b"0123456789")
+
+
+class TestPieceTable(unittest.TestCase):
+    def test_random_edits(self):
+        rng = random.Random(1)
+        original = bytes(rng.randrange(256) for _ in range(5000))
+        table, ref = PieceTable(original), bytearray(original)
+        for i in range(600):
+            start = rng.randrange(len(ref) + 1)
+            end = min(start + rng.randrange(50), len(ref))
+            data = bytes(rng.randrange(256) for _ in range(rng.randrange(20)))
+            snapshot, before = table.snapshot(), bytes(ref)
+            table.replace(start, end, data)
+            ref[start:end] = data
+            self.assertEqual(len(table), len(ref))
+            self.assertEqual(snapshot.read(0, len(snapshot)), before) # 複本不會跟著改變
+            a = rng.randrange(len(ref) + 1)
+            b = rng.randrange(a, len(ref) + 1)
+            self.assertEqual(table.read(a, b), bytes(ref[a:b]))
+        self.assertEqual(b"".join(table.iterChunks(777)), bytes(ref))
+
+    def test_replace_ranges(self):
+        rng = random.Random(2)
+        for _ in range(50):
+            data = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 400)))
+            table = PieceTable(data)
+            table.insert(rng.randrange(len(data) + 1), b"inserted") # 先切成幾個 piece
+            current = table.read(0, len(table))
+            ranges, pos = list(), 0
+            while True:
+                pos += rng.randrange(0, 30)
+                end = pos + rng.randrange(0, 10)
+                if end > len(current):
+                    break
+                ranges.append((pos, end))
+                pos = end
+            new = bytes(rng.randrange(256) for _ in range(rng.randrange(5)))
+            table.replaceRanges(ranges, new)
+            self.assertEqual(table.read(0, len(table)), _replace_reference(current, ranges, new))
+
+
+class TestIntervalSet(unittest.TestCase):
+    def test_random_operations(self):
+        rng = random.Random(3)
+        intervals, ref = IntervalSet(), set()
+        for _ in range(2000):
+            start = rng.randrange(300)
+            end = start + rng.randrange(20)
+            op = rng.random()
+            if op < 0.4:
+                intervals.add(start, end)
+                ref |= set(range(start, end))
+            elif op < 0.7:
+                intervals.remove(start, end)
+                ref -= set(range(start, end))
+            elif op < 0.85:
+                count = rng.randrange(1, 10)
+                intervals.shift(start, count)
+                ref = {x + count if x >= start else x for x in ref}
+            else:
+                count = rng.randrange(1, 10)
+                intervals.shift(start, -count)
+                ref = {x - count if x >= start + count else x for x in ref if not start <= x < start + count}
+            intervals.__sanity_check__()
+            self.assertEqual({x for a, b in intervals for x in range(a, b)}, ref)
+            self.assertEqual([x in intervals for x in range(350)], [x in ref for x in range(350)])
+            a = rng.randrange(350)
+            b = a + rng.randrange(50)
+            self.assertEqual({x for s, e in intervals.query(a, b) for x in range(s, e)},
+                             {x for x in ref if a <= x < b})
+
+    def test_select_range_count(self):
+        rng = random.Random(5)
+        select = SelectRange()
+        for _ in range(1000):
+            op = rng.random()
+            idx = rng.randrange(300)
+            if op < 0.1:
+                select.selectSingle(idx)
+            elif op < 0.4:
+                select.setEnd(idx)
+            elif op < 0.8:
+                select.addSingle(idx)
+            elif op < 0.95:
+                select.shift(idx, rng.randrange(1, 10))
+            else:
+                select.unselect()
+            self.assertEqual(select.count(), len(select.ranges()))
+
+
+class TestIncrementalSearch(unittest.TestCase):
+    """ 修改後平移並重新搜尋附近的結果，要和重新搜尋整份資料的結果相同 """
+
+    def check(self, text: str, mode: str, alphabet: bytes):
+        rng = random.Random(4)
+        buffer = BinaryBuffer(bytes(rng.choice(alphabet) for _ in range(3000)))
+        pattern, length = Search.compilePattern(text, mode)
+        result = buffer.search(pattern, length)
+        result.wait()
+        for _ in range(200):
+            start = rng.randrange(len(buffer))
+            end = min(start + rng.randrange(6), len(buffer))
+            data = bytes(rng.choice(alphabet) for _ in range(rng.randrange(6)))
+            if rng.random() < 0.3:
+                buffer.write(start, data)
+            else:
+                buffer.replace(start, end, data)
+            self.assertTrue(buffer.tracks(result))
+            self.assertEqual(result.query(0, len(buffer)), buffer.findAll(pattern, length))
+
+    def test_fixed_length(self):
+        self.check("ABA", Search.TEXT, b"AB_")
+
+    def test_regex(self):
+        self.check("A+B", Search.REGEX, b"AB_")
+
+    def test_cache_key_includes_parallel(self):
+        buffer = BinaryBuffer(b"xyz" * 100)
+        pattern, length = Search.compilePattern("yz", Search.TEXT)
+        serial = buffer.search(pattern, length)
+        self.assertIs(buffer.search(pattern, length), serial)
+        self.assertIsNot(buffer.search(pattern, length, parallel=True), serial)
+
+
+class TestUndoJournal(unittest.TestCase):
+    def test_undo_redo_within_cap(self):
+        rng = random.Random(5)
+        limit = 4000
+        buffer = BinaryBuffer(bytes(rng.randrange(256) for _ in range(3000)))
+        buffer.enableUndo(limit)
+        states = [buffer.read(0, len(buffer))]
+        for _ in range(100):
+            start = rng.randrange(len(buffer))
+            end = min(start + rng.randrange(300), len(buffer))
+            version = buffer.getVersion()
+            op = rng.random()
+            if op < 0.4:
+                buffer.replace(start, end, bytes(rng.randrange(256) for _ in range(rng.randrange(50))))
+            elif op < 0.7:
+                buffer.fillAll([(start, end), (end + 10, end + 40)], b"\xAA\x55")
+            else:
+                buffer.replaceAll([(start, (start + end) // 2), (end, end)], b"Q")
+            if buffer.getVersion() != version: # 沒有改變的操作不會被記錄
+                states.append(buffer.read(0, len(buffer)))
+            self.assertLessEqual(buffer.m_journal.getBytes(), limit)
+
+        undone = 0
+        while buffer.canUndo():
+            buffer.undo()
+            undone += 1
+            self.assertEqual(buffer.read(0, len(buffer)), states[-1 - undone])
+        self.assertGreater(undone, 0)
+        while buffer.canRedo():
+            buffer.redo()
+            undone -= 1
+            self.assertEqual(buffer.read(0, len(buffer)), states[-1 - undone])
+        self.assertEqual(undone, 0)
+
+    def test_step_over_cap_clears_journal(self):
+        buffer = BinaryBuffer(bytes(10000))
+        buffer.enableUndo(1000)
+        buffer.write(0, b"\x01")
+        self.assertTrue(buffer.canUndo())
+        buffer.delete(100, 100 + 1000 - STEP_OVERHEAD + 1)
+        self.assertFalse(buffer.canUndo())
+        self.assertEqual(buffer.m_journal.getBytes(), 0)
+
+    def test_oversized_inverse_keeps_older_steps(self):
+        # 復原一大段插入時，重做步驟放不下，但之前的復原記錄要保留
+        buffer = BinaryBuffer(bytes(2000))
+        buffer.enableUndo(1000)
+        buffer.write(0, b"\x01")
+        buffer.write(1, b"\x02")
+        buffer.insert(5, b"z" * 900)
+        buffer.undo()
+        self.assertEqual(len(buffer), 2000)
+        self.assertTrue(buffer.canUndo())
+        buffer.undo()
+        buffer.undo()
+        self.assertEqual(buffer.read(0, 2), b"\x00\x00")
+        self.assertFalse(buffer.canUndo())
+        self.assertLessEqual(buffer.m_journal.getBytes(), 1000)
+
+
+class TestSave(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "data.bin")
+        self.original = random.Random(8).randbytes(3 * CHUNK_SIZE)
+        with open(self.path, "wb") as f:
+            f.write(self.original)
+        os.chmod(self.path, 0o640)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def read_file(self) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_save_in_place(self):
+        buffer = BinaryBuffer.open(self.path)
+        try:
+            index = buffer.hashIndex() # 存檔時背景還在讀檔案
+            buffer.write(10, b"\x01\x02")
+            buffer.replace(CHUNK_SIZE, CHUNK_SIZE + 3, b"abc")
+            expected = buffer.read(0, len(buffer))
+            self.assertEqual(buffer.save(self.path), 5)
+            self.assertEqual(self.read_file(), expected)
+            self.assertEqual(buffer.read(0, len(buffer)), expected)
+            self.assertEqual(buffer.m_data.dirtyRanges(), [])
+            self.assertEqual(_wait_hashes(self, index)[0], zlib.crc32(expected))
+        finally:
+            buffer.close()
+
+    def test_save_replace(self):
+        buffer = BinaryBuffer.open(self.path)
+        try:
+            index = buffer.hashIndex()
+            buffer.insert(5, b"inserted")
+            buffer.delete(CHUNK_SIZE, CHUNK_SIZE + 100)
+            expected = buffer.read(0, len(buffer))
+            self.assertEqual(buffer.save(self.path), len(expected))
+            self.assertEqual(self.read_file(), expected)
+            self.assertEqual(buffer.read(0, len(buffer)), expected)
+            self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640) # 保留權限
+            self.assertEqual(os.listdir(self.dir.name), ["data.bin"])           # 沒有留下暫存檔
+            self.assertEqual(_wait_hashes(self, index)[0], zlib.crc32(expected))
+        finally:
+            buffer.close()
+
+    def test_failed_save_keeps_target(self):
+        buffer = BinaryBuffer.open(self.path)
+        try:
+            buffer.insert(0, b"new")
+            def broken_chunks(chunk_size=1 << 20):
+                yield buffer.read(0, 10)
+                raise OSError("disk full")
+            buffer.iterChunks = broken_chunks
+            with self.assertRaises(OSError):
+                buffer.save(self.path)
+            self.assertEqual(self.read_file(), self.original)
+            self.assertEqual(os.listdir(self.dir.name), ["data.bin"])
+        finally:
+            buffer.close()
+
+    def test_existing_tmp_name_is_untouched(self):
+        other = self.path + ".tmp"
+        with open(other, "wb") as f:
+            f.write(b"keep me")
+        buffer = BinaryBuffer(b"hello")
+        buffer.save(self.path)
+        self.assertEqual(self.read_file(), b"hello")
+        with open(other, "rb") as f:
+            self.assertEqual(f.read(), b"keep me")
+
+
+class TestBinaryCLI(unittest.TestCase):
+    def setUp(self):
+        self.m_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.m_dir.cleanup)
+
+    def makeFile(self, relpath: str, data: bytes) -> str:
+        path = os.path.join(self.m_dir.name, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def readFile(self, path: str) -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_parse_script(self):
+        commands = BinaryCLI.parseScript(["# comment", "write 0x10 DE AD", "insert 3 00", "delete 0 4  # tail",
+                                          "replace-all AB CDEF"])
+        self.assertEqual(commands, [("write", 16, b"\xDE\xAD"), ("insert", 3, b"\x00"), ("delete", 0, 4),
+                                    ("replace-all", b"\xAB", b"\xCD\xEF")])
+        for line in ("delete 4 0", "replace-all  00", "move 0 1", "write -1 00", "insert 0 0G"):
+            with self.assertRaises(ValueError):
+                BinaryCLI.parseScript([line])
+
+    def test_script_and_commands_in_place(self):
+        a = self.makeFile("a.bin", b"0123456789ABAB")
+        b = self.makeFile("b.bin", b"xyzAB")
+        script = self.makeFile("patch.txt", b"write 0 4142\nreplace-all 4142 21\n")
+        code = BinaryCLI.main(["-s", script, "-e", "insert 1 FF", "--in-place", a, b, "-j", "2"])
+        self.assertEqual(code, 0)
+        self.assertEqual(self.readFile(a), b"!\xFF23456789!!")
+        self.assertEqual(self.readFile(b), b"!\xFFz!")
+
+    def test_output_dir(self):
+        a = self.makeFile("a.bin", b"0123456789")
+        out = os.path.join(self.m_dir.name, "out")
+        self.assertEqual(BinaryCLI.main(["-e", "delete 0 4", "-o", out, a]), 0)
+        self.assertEqual(self.readFile(os.path.join(out, "a.bin")), b"456789")
+        self.assertEqual(self.readFile(a), b"0123456789")
+
+    def test_failed_patch_keeps_file(self):
+        a = self.makeFile("a.bin", b"0123")
+        self.assertEqual(BinaryCLI.main(["-e", "write 3 0000", "--in-place", a]), 1)
+        self.assertEqual(self.readFile(a), b"0123")
+
+    def test_duplicate_output_names_are_rejected(self):
+        a = self.makeFile(os.path.join("x", "same.bin"), b"aaaa")
+        b = self.makeFile(os.path.join("y", "same.bin"), b"bbbb")
+        out = os.path.join(self.m_dir.name, "out")
+        self.assertEqual(BinaryCLI.main(["-e", "delete 0 1", "-o", out, a, b]), 2)
+        self.assertFalse(os.path.exists(out))
+        self.assertEqual(BinaryCLI.main(["-e", "delete 0 1", "--in-place", a, a]), 2)
+        self.assertEqual(self.readFile(a), b"aaaa")
+
+
+class TestProfiler(unittest.TestCase):
+    def test_disabled_by_default(self):
+        profiler = Profiler()
+        self.assertFalse(profiler.isEnabled())
+        self.assertIs(profiler.timer("a"), profiler.timer("b")) # 共用同一個空的 context manager
+        with profiler.timer("a"):
+            profiler.count("n")
+        self.assertEqual(profiler.getStats(), {})
+        self.assertEqual(profiler.getCounters(), {})
+
+    def test_enabled(self):
+        profiler = Profiler()
+        profiler.setEnabled(True)
+        for _ in range(3):
+            with profiler.timer("a"):
+                profiler.count("n", 2)
+        self.assertEqual(profiler.getStats()["a"]["count"], 3)
+        self.assertEqual(profiler.getCounters(), {"n": 6})
+
+
+class TestHashIndex(unittest.TestCase):
+    def test_crc32_combine(self):
+        rng = random.Random(6)
+        for _ in range(100):
+            a = bytes(rng.randrange(256) for _ in range(rng.randrange(100)))
+            b = bytes(rng.randrange(256) for _ in range(rng.randrange(100)))
+            self.assertEqual(crc32Combine(zlib.crc32(a), zlib.crc32(b), len(b)), zlib.crc32(a + b))
+
+    def test_incremental_hashes(self):
+        rng = random.Random(7)
+        buffer = BinaryBuffer(rng.randbytes(3 * CHUNK_SIZE + 12345))
+        index = buffer.hashIndex()
+        try:
+            for _ in range(10):
+                _wait_hashes(self, index)
+                start = rng.randrange(len(buffer))
+                end = min(start + rng.randrange(2 * CHUNK_SIZE), len(buffer))
+                buffer.replace(start, end, rng.randbytes(rng.randrange(1000)))
+                data = buffer.read(0, len(buffer))
+                self.assertEqual(_wait_hashes(self, index), (zlib.crc32(data), hashlib.md5(data).hexdigest(),
+                                                                hashlib.sha256(data).hexdigest()))
+        finally:
+            buffer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()